@@ -1,5 +1,9 @@
 import os
 import sys
+import time
+
+# Process start, for the time-to-ready measurement
+started_at = time.time()
 
 import discord
 
@@ -8,24 +12,34 @@ current_dir = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(current_dir, ".."))  # two directories above
 
 from src.bot import BotClient
-from src.commands import utility_cmd
-from src.commands.botworld import botworld_cmd
-from src.commands.genshin import genshin_general_cmd, genshin_mine_cmd
+from src.commands.manifest import COMMAND_MANIFEST
 from src.data.environment import DISCORD_TOKEN
 
-print("Hello (happy) world!")
-# Create intent
-intent = discord.Intents.default()
-intent.members = True
-intent.message_content = True
 
-# Create and start the client
-bot = BotClient(intents=intent)
+def create_bot(client_class=BotClient, **options):
+    """
+    Create a bot with all commands & intents registered
+
+    Args:
+        client_class (type): BotClient or one of its subclasses
+        **options: options of the client
+
+    Returns:
+        (BotClient) bot, ready to run
+    """
+    # Create intent
+    intent = discord.Intents.default()
+    intent.members = True
+    intent.message_content = True
+
+    # Create the client
+    bot = client_class(intents=intent, **options)
+
+    # Register commands & intents, their modules are imported lazily
+    bot.register_command_manifest(COMMAND_MANIFEST)
+    return bot
 
-# Register commands & intents
-utility_cmd.register_all(bot)
-genshin_general_cmd.register_all(bot)
-genshin_mine_cmd.register_all(bot)
-botworld_cmd.register_all(bot)
 
-bot.run(DISCORD_TOKEN)
+if __name__ == "__main__":
+    print("Hello (happy) world!")
+    create_bot(started_at=started_at).run(DISCORD_TOKEN)
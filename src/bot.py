@@ -4,26 +4,59 @@ import discord
 
 import src.utils.log_util as log
 from src.data import settings, emojis
+from src.utils.coalesce_util import Coalescer
+from src.utils.command_loader import CommandLoader
+from src.utils.command_registry import CommandRegistry
+from src.utils import async_sql_util, http_util, journal_util, metrics_util, shared_state
+from src.utils.executor_util import BlockingExecutor
+from src.utils.outbound_util import OutboundQueue, count_library_rate_limits
+from src.utils.rate_limit_util import RateLimiter
+from src.utils.reaction_registry import ReactionRegistry
+from src.utils.schedule_util import MessageScheduler
 
 
 # Base client class
 class BotClient(discord.Client):
     """ Custom Discord client """
 
-    def __init__(self, **options):
+    def __init__(self, metrics_path=settings.METRICS_PROMETHEUS_PATH, started_at=None, **options):
+        """
+        Args:
+            metrics_path (str): where to write metrics in the Prometheus text format
+            started_at (float): when the process started (time.time()), used to measure the time to ready
+            **options: options of discord.Client
+        """
         log.info("Initializing bot...")
         super().__init__(**options)
 
-        # Command handlers
-        self.command_handlers = []
+        # Command handlers, indexed by command name and aliases
+        self.command_handlers = CommandRegistry()
+        # Lazy command module loader, see register_command_manifest
+        self.command_loader = None
         # Intent handlers { intent => handler }
         self.intent_handlers = {}
-        # Dynamically-registered reaction handlers
-        self.reaction_handlers = []
+        # Dynamically-registered reaction handlers, indexed by (message id, emoji) and expired on a timer
+        self.reaction_handlers = ReactionRegistry()
         # Chat handler
         self.chat_handler = None
         self.chat_enabled = False
 
+        # Thread pool for blocking command work
+        self.executor = BlockingExecutor()
+        # Per-user and per-guild command rate limits
+        self.rate_limiter = RateLimiter(shared_state.get_state())
+        # Identical in-flight command work is executed once
+        self.coalescer = Coalescer()
+        # Outbound REST call scheduler
+        self.outbound = OutboundQueue()
+        # Delivers the messages of the "scheduled_messages" table, started after on_ready
+        self.scheduler = MessageScheduler(self)
+        count_library_rate_limits()
+        # Background metrics tasks, started once the bot is online
+        self.metrics_tasks = []
+        self.metrics_path = metrics_path
+        self.started_at = started_at if started_at is not None else time.time()
+
         log.info("Initialization complete!")
 
     #########################
@@ -35,6 +68,29 @@ class BotClient(discord.Client):
         log.info(f"Bot is online! Hello (happy) world from {self.user}!")
         await self.change_presence(activity=discord.Activity(name="with Breeze", type=1))
 
+        # on_ready fires again after reconnects, only do the startup work once
+        if not self.metrics_tasks:
+            time_to_ready = time.time() - self.started_at
+            metrics_util.set_gauge("startup_time_to_ready_seconds", time_to_ready)
+            log.info(f"Ready {time_to_ready:.2f}s after startup!")
+
+            self.metrics_tasks.append(self.loop.create_task(metrics_util.monitor_loop_lag()))
+            self.metrics_tasks.append(self.loop.create_task(metrics_util.write_prometheus_periodically(self.metrics_path)))
+            # Import the remaining command modules & open the database pool in the background
+            if self.command_loader is not None:
+                self.loop.create_task(self.command_loader.warm_up())
+            self.loop.create_task(async_sql_util.warm_up())
+            self.loop.create_task(journal_util.warm_up())
+            self.scheduler.start()
+
+    async def close(self):
+        """ Called when the bot shuts down, also stops the blocking work thread pool and flushes the journal """
+        self.scheduler.stop()
+        await super().close()
+        self.executor.shutdown()
+        await journal_util.close_journal()
+        await http_util.close_session()
+
     async def on_message(self, message):
         """
         Main method for handling messages and commands
@@ -75,19 +131,25 @@ class BotClient(discord.Client):
         log.info(f"Command \"{message.content}\" received from {author.display_name}#{author.discriminator}!")
 
         # Find command handler in registered handlers
-        handler = None
-        for loop in self.command_handlers:
-            if command == loop.command or command in loop.aliases:
-                handler = loop
-                break
+        handler = self.get_command_handler(command)
 
         # Not found -- unknown command
         if handler is None:
             await self.react_unknown(message)
             return
 
+        # Rate limited -- ignore the command
+        guild_id = message.guild.id if message.guild is not None else None
+        retry_after = self.rate_limiter.check(handler.command, author.id, guild_id)
+        if retry_after > 0:
+            log.info(f"Command \"{handler.command}\" rate limited for {author.display_name}#{author.discriminator} "
+                     f"for {retry_after:.1f}s!")
+            await self.react_rate_limited(message)
+            return
+
         # Found -- fire handler
-        await handler.on_command(message.author, command, args, message, channel, message.guild)
+        with metrics_util.measure("command_latency_seconds", command=handler.command):
+            await handler.on_command(message.author, command, args, message, channel, message.guild)
 
     async def on_reaction_add(self, reaction, user):
         """
@@ -110,29 +172,16 @@ class BotClient(discord.Client):
         emoji = reaction.emoji  # any of {Emoji, str}
 
         # Find reaction handler in registered handlers
-        for a in range(len(self.reaction_handlers) - 1, 0 - 1, -1):
-            handler = self.reaction_handlers[a]
-
-            # Check if the reaction has expired
-            if time.time() > handler.expire_time:
-                # Fire on_timeout
-                await handler.on_timeout()
-                del self.reaction_handlers[a]
-                continue
-
-            # Match message and reaction(s)
-            if message != handler.message or emoji not in handler.emojis:
-                continue
+        handler = self.reaction_handlers.pop(message, emoji)
+        if handler is None:
+            return
 
-            # Correct handler, fire on_react
+        # Correct handler, fire on_react
+        with metrics_util.measure("reaction_latency_seconds"):
             await handler.on_react(user, emoji)
-            del self.reaction_handlers[a]
-
-            # Log
-            log.info(f"Reaction \"{emoji}\" added by {user.display_name}#{user.discriminator} on \"{message.content}\"!")
 
-            # We're done here, return out of this method
-            return
+        # Log
+        log.info(f"Reaction \"{emoji}\" added by {user.display_name}#{user.discriminator} on \"{message.content}\"!")
 
     ####################
     # LOGISTIC METHODS #
@@ -144,8 +193,33 @@ class BotClient(discord.Client):
 
         Args:
             handler (CommandHandler): command handler
+
+        Raises:
+            ValueError: if the command name or one of the aliases is already registered
+        """
+        self.command_handlers.register(handler)
+
+    def register_command_manifest(self, manifest):
+        """
+        Register every command & intent of a manifest, their modules are imported on first use or after on_ready
+
+        Args:
+            manifest (Dict[str, Dict]): command manifest, see src.commands.manifest
         """
-        self.command_handlers.append(handler)
+        self.command_loader = CommandLoader(self, manifest)
+        self.command_loader.register_placeholders()
+
+    def get_command_handler(self, command):
+        """
+        Find the command handler registered under a command name or alias
+
+        Args:
+            command (str): command name or alias
+
+        Returns:
+            (CommandHandler) command handler if registered, otherwise None
+        """
+        return self.command_handlers.get(command)
 
     def register_intent_handler(self, intent, handler):
         """
@@ -164,7 +238,7 @@ class BotClient(discord.Client):
         Args:
             handler (ReactionHandler): reaction handler
         """
-        self.reaction_handlers.append(handler)
+        self.reaction_handlers.register(handler)
 
     def register_chat_handler(self, handler):
         """
@@ -175,13 +249,29 @@ class BotClient(discord.Client):
         """
         self.chat_handler = handler
 
+    async def run_blocking(self, command, max_concurrency, func, *args, **kwargs):
+        """
+        Run blocking work in the bot's thread pool, see CommandHandler.run_blocking
+
+        Args:
+            command (str): command the work belongs to
+            max_concurrency (int): how many calls of this command can run at the same time
+            func (function): blocking function
+            *args: positional arguments for the function
+            **kwargs: keyword arguments for the function
+
+        Returns:
+            (Any) return value of the function
+        """
+        return await self.executor.run(command, max_concurrency, func, *args, **kwargs)
+
     ##########################
     # EXPRESS ACTION METHODS #
     ##########################
 
     async def send_message_to_channel(self, channel_id: int, content=None, embedded=None, view=None):
         channel = self.get_channel(channel_id)
-        await channel.send(content=content, embed=embedded, view=view)
+        return await self.outbound.send(channel, content=content, embed=embedded, view=view)
 
     @staticmethod
     async def send_typing_packet(channel):
@@ -194,21 +284,28 @@ class BotClient(discord.Client):
         # TODO: replace with context manager "with channel.typing():"
         await channel.trigger_typing()
 
-    @staticmethod
-    async def reply(reference, content=None, embedded=None, channel=None, view=None):
+    async def reply(self, reference, content=None, embedded=None, channel=None, view=None):
         assert any([content, embedded]), "Must reply with one or more of {content (string), embedded (embedded message)}!"
         if channel is None:
             channel = reference.channel
-        return await channel.send(content=content, embed=embedded, reference=reference, view=view, mention_author=False)
+        return await self.outbound.send(channel, content=content, embed=embedded, reference=reference, view=view,
+                                        mention_author=False)
 
-    @staticmethod
-    async def react_unknown(message):
-        await message.add_reaction(emojis.QUESTION)
+    async def add_reaction(self, message, emoji):
+        await self.outbound.add_reaction(message, emoji)
 
-    @staticmethod
-    async def react_check(message):
-        await message.add_reaction(emojis.CHECK)
+    async def react_unknown(self, message):
+        await self.add_reaction(message, emojis.QUESTION)
 
-    @staticmethod
-    async def react_cross(message):
-        await message.add_reaction(emojis.CROSS)
+    async def react_rate_limited(self, message):
+        await self.add_reaction(message, emojis.HOUR_GLASS)
+
+    async def react_check(self, message):
+        await self.add_reaction(message, emojis.CHECK)
+
+    async def react_cross(self, message):
+        await self.add_reaction(message, emojis.CROSS)
+
+
+class ShardedBotClient(BotClient, discord.AutoShardedClient):
+    """ Sharded Discord client, runs the gateway shards given by "shard_ids" in this process """
@@ -0,0 +1,138 @@
+import discord
+
+from src.data import colors, settings
+from src.utils import metrics_util, sql_stats_util
+from src.utils.command_handler import CommandHandler
+
+
+class AdminCommandHandler(CommandHandler):
+    """ Command handler that only responds to users in settings.ADMIN_USERS """
+
+    async def on_command(self, author, command, args, message, channel, guild):
+        if author.id not in settings.ADMIN_USERS:
+            await self.bot.react_unknown(message)
+            return
+        await self.on_admin_command(author, command, args, message, channel, guild)
+
+    async def on_admin_command(self, author, command, args, message, channel, guild):
+        """ Executes the command for an admin, should be overridden in the subclass """
+
+
+class StatsCommandHandler(AdminCommandHandler):
+    def __init__(self, bot):
+        super().__init__(bot, "stats", [], "Show command latencies and event loop lag (admin only)", "", "")
+
+    async def on_admin_command(self, author, command, args, message, channel, guild):
+        await self.bot.reply(message, embedded=self.get_stats_embedded())
+
+    def get_stats_embedded(self):
+        embedded = discord.Embed(
+            title=f"Bot statistics",
+            description=f"Latencies are percentiles of the last {settings.METRICS_HISTOGRAM_WINDOW} samples in milliseconds",
+            color=colors.COLOR_HELP
+        )
+        embedded.add_field(name="**Commands:**",
+                           value=format_latency_table(metrics_util.get_histograms("command_latency_seconds"),
+                                                      "command_latency_seconds", "command"),
+                           inline=False)
+        embedded.add_field(name="**View callbacks:**",
+                           value=format_latency_table(metrics_util.get_histograms("view_latency_seconds"),
+                                                      "view_latency_seconds", "function"),
+                           inline=False)
+
+        lag = metrics_util.get_histograms("event_loop_lag_seconds").get((), metrics_util.Histogram())
+        lag_quantiles = lag.quantiles()
+        embedded.add_field(name="**Event loop lag:**",
+                           value=f"```p50 {lag_quantiles[0.5] * 1000:.1f}ms, p95 {lag_quantiles[0.95] * 1000:.1f}ms, "
+                                 f"p99 {lag_quantiles[0.99] * 1000:.1f}ms```",
+                           inline=False)
+        embedded.add_field(name="**Gateway latency:**", value=f"{int(self.bot.latency * 1000)}ms", inline=True)
+        embedded.add_field(name="**Reaction handlers:**", value=f"{len(self.bot.reaction_handlers)}", inline=True)
+        return embedded
+
+
+class DatabaseStatsCommandHandler(AdminCommandHandler):
+    def __init__(self, bot):
+        super().__init__(bot, "dbstats", [], "Show database statement timings and slow queries (admin only)", "", "")
+
+    async def on_admin_command(self, author, command, args, message, channel, guild):
+        await self.bot.reply(message, embedded=get_database_stats_embedded())
+
+
+def get_database_stats_embedded(limit=10):
+    """
+    Build the "~dbstats" embed
+
+    Args:
+        limit (int): how many statements to list, the ones with the most total time first
+
+    Returns:
+        (discord.Embed) embedded message
+    """
+    histograms = metrics_util.get_histograms("db_statement_seconds")
+    embedded = discord.Embed(
+        title=f"Database statistics",
+        description=f"{len(histograms)} distinct statements, top {min(limit, len(histograms))} by total time. "
+                    f"Latencies are percentiles of the last {settings.METRICS_HISTOGRAM_WINDOW} samples",
+        color=colors.COLOR_HELP
+    )
+
+    statements = ""
+    for labels, histogram in sorted(histograms.items(), key=lambda a: -a[1].sum)[:limit]:
+        statement = dict(labels)["statement"]
+        quantiles = histogram.quantiles()
+        read = metrics_util.get_counter("db_rows_returned_total", statement=statement)
+        written = metrics_util.get_counter("db_rows_affected_total", statement=statement)
+        statements += f"{statement[:100]}\n" \
+                      f"  {histogram.count} calls, {histogram.sum * 1000:.0f}ms total, " \
+                      f"p50 {quantiles[0.5] * 1000:.1f}ms, p95 {quantiles[0.95] * 1000:.1f}ms, " \
+                      f"p99 {quantiles[0.99] * 1000:.1f}ms, {int(read)} read, {int(written)} written\n"
+    embedded.add_field(name="**Statements:**", value=f"```{statements[:1000]}```" if statements else "No data yet",
+                       inline=False)
+
+    pools = ""
+    for labels, histogram in sorted(metrics_util.get_histograms("db_pool_acquire_seconds").items()):
+        pool = dict(labels)["pool"]
+        quantiles = histogram.quantiles()
+        pools += f"{pool:5s} in use {int(metrics_util.get_gauge('db_pool_in_use', pool=pool))}, " \
+                 f"waiting {int(metrics_util.get_gauge('db_pool_waiters', pool=pool))}, " \
+                 f"timeouts {int(metrics_util.get_counter('db_pool_timeouts_total', pool=pool))}, " \
+                 f"checkout p95 {quantiles[0.95] * 1000:.1f}ms\n"
+    embedded.add_field(name="**Connection pools:**", value=f"```{pools}```" if pools else "No data yet",
+                       inline=False)
+
+    slow = "".join(f"{query.seconds * 1000:7.0f}ms {query.fingerprint[:80]}\n"
+                   for query in reversed(sql_stats_util.slow_queries))
+    embedded.add_field(name=f"**Slow queries (>= {settings.DATABASE_SLOW_QUERY_SECONDS * 1000:.0f}ms):**",
+                       value=f"```{slow[:1000]}```" if slow else "None", inline=False)
+    return embedded
+
+
+def format_latency_table(histograms, name, label):
+    """
+    Format latency histograms as a fixed-width table
+
+    Args:
+        histograms (Dict[Tuple, Histogram]): histograms from metrics_util.get_histograms
+        name (str): histogram name, used to look up the error counters
+        label (str): label that names each row
+
+    Returns:
+        str: table in a code block
+    """
+    if not histograms:
+        return "No data yet"
+    table = f"```{label.title():14s} {'Count':>6s} {'Errors':>6s} {'p50':>7s} {'p95':>7s} {'p99':>7s}\n"
+    for labels, histogram in sorted(histograms.items(), key=lambda a: -a[1].count):
+        labels = dict(labels)
+        quantiles = histogram.quantiles()
+        errors = metrics_util.get_counter(f"{name}_errors_total", **labels)
+        table += f"{str(labels.get(label)):14.14s} {histogram.count:6d} {int(errors):6d} {quantiles[0.5] * 1000:7.1f} " \
+                 f"{quantiles[0.95] * 1000:7.1f} {quantiles[0.99] * 1000:7.1f}\n"
+    return table[:-1] + "```"
+
+
+def register_all(bot):
+    """ Register all commands in this module """
+    bot.register_command_handler(StatsCommandHandler(bot))
+    bot.register_command_handler(DatabaseStatsCommandHandler(bot))
@@ -1,15 +1,31 @@
+import asyncio
+
+import aiohttp
 import discord
 from discord.ui import View, Button
 
 from src.data import emotes
 from src.data.botworld.botworld_objects import BotList
-from src.data.botworld.botworld_spider import fetch_bot
-from src.data.settings import BOT_PREFIX
+from src.data.botworld.botworld_cache import get_cache
+from src.data.botworld.botworld_crawler import BotCrawler
+from src.data.botworld.botworld_spider import BotNotFoundError, fetch_bot
+from src.data.settings import BOT_PREFIX, BOTWORLD_CRAWLER_ENABLED
+from src.utils import metrics_util
 from src.utils.command_handler import CommandHandler
 
-# Statically initialized
+# Built on first use (or in the warm-up after on_ready)
 # - data doesn't change unless restarted
-bot_list = BotList()
+bot_list = None
+
+# Keeps every bot cached in the background, started with the module
+crawler = None
+
+
+def get_bot_list():
+    global bot_list
+    if bot_list is None:
+        bot_list = BotList()
+    return bot_list
 
 
 class BotView(View):
@@ -18,32 +34,38 @@ class BotView(View):
     def __init__(self, bot, command):
         super().__init__()
         self.bot = bot
+        # Rendered once per bot, so switching tabs only sends them
+        self.embeds = bot.get_embeds()
         self.command = command
         self.message = None
 
     @discord.ui.button(label="Basics", disabled=True)
+    @metrics_util.timed("view_latency_seconds")
     async def basics_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
-        await interaction.response.edit_message(embed=self.bot.get_general_embedded(), view=self)
+        await interaction.response.edit_message(embed=self.embeds["general"], view=self)
 
     @discord.ui.button(label="Abilities")
+    @metrics_util.timed("view_latency_seconds")
     async def abilities_callback(self, button, interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
-        await interaction.response.edit_message(embed=self.bot.get_abilities_embedded(), view=self)
+        await interaction.response.edit_message(embed=self.embeds["abilities"], view=self)
 
     @discord.ui.button(label="AI Tree")
+    @metrics_util.timed("view_latency_seconds")
     async def ai_callback(self, button, interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
-        await interaction.response.edit_message(embed=self.bot.get_ai_embedded(), view=self)
+        await interaction.response.edit_message(embed=self.embeds["ai"], view=self)
 
     @discord.ui.button(label="Stats")
+    @metrics_util.timed("view_latency_seconds")
     async def stats_callback(self, button, interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
-        await interaction.response.edit_message(embed=self.bot.get_stats_embedded(), view=self)
+        await interaction.response.edit_message(embed=self.embeds["stats"], view=self)
 
     async def on_timeout(self):
         # Clear all items
@@ -68,53 +90,60 @@ class BotListView(View):
         self.message = None
 
     @discord.ui.button(label="Tank", emoji=emotes.ICON_TANK, disabled=True)
+    @metrics_util.timed("view_latency_seconds")
     async def tank_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
         self.bot_class = "TANK"
-        await interaction.response.edit_message(embed=bot_list.get_embedded_by_class(self.bot_class), view=self)
+        await interaction.response.edit_message(embed=get_bot_list().get_embedded_by_class(self.bot_class), view=self)
 
     @discord.ui.button(label="Splasher", emoji=emotes.ICON_SPLASHER, disabled=False)
+    @metrics_util.timed("view_latency_seconds")
     async def splasher_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
         self.bot_class = "SPLASHER"
-        await interaction.response.edit_message(embed=bot_list.get_embedded_by_class(self.bot_class), view=self)
+        await interaction.response.edit_message(embed=get_bot_list().get_embedded_by_class(self.bot_class), view=self)
 
     @discord.ui.button(label="Sniper", emoji=emotes.ICON_SNIPER, disabled=False)
+    @metrics_util.timed("view_latency_seconds")
     async def sniper_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
         self.bot_class = "SNIPER"
-        await interaction.response.edit_message(embed=bot_list.get_embedded_by_class(self.bot_class), view=self)
+        await interaction.response.edit_message(embed=get_bot_list().get_embedded_by_class(self.bot_class), view=self)
 
     @discord.ui.button(label="Chaser", emoji=emotes.ICON_CHASER, disabled=False)
+    @metrics_util.timed("view_latency_seconds")
     async def chaser_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
         self.bot_class = "CHASER"
-        await interaction.response.edit_message(embed=bot_list.get_embedded_by_class(self.bot_class), view=self)
+        await interaction.response.edit_message(embed=get_bot_list().get_embedded_by_class(self.bot_class), view=self)
 
     @discord.ui.button(label="Evader", emoji=emotes.ICON_EVADER, disabled=False)
+    @metrics_util.timed("view_latency_seconds")
     async def evader_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
         self.bot_class = "EVADER"
-        await interaction.response.edit_message(embed=bot_list.get_embedded_by_class(self.bot_class), view=self)
+        await interaction.response.edit_message(embed=get_bot_list().get_embedded_by_class(self.bot_class), view=self)
 
     @discord.ui.button(label="Brawler", emoji=emotes.ICON_BRAWLER, disabled=False)
+    @metrics_util.timed("view_latency_seconds")
     async def brawler_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
         self.bot_class = "BRAWLER"
-        await interaction.response.edit_message(embed=bot_list.get_embedded_by_class(self.bot_class), view=self)
+        await interaction.response.edit_message(embed=get_bot_list().get_embedded_by_class(self.bot_class), view=self)
 
     @discord.ui.button(label="Support", emoji=emotes.ICON_SUPPORT, disabled=False)
+    @metrics_util.timed("view_latency_seconds")
     async def support_callback(self, button, interaction: discord.Interaction):
         self.enable_all_items(exclusions=[button])
         button.disabled = True
         self.bot_class = "SUPPORT"
-        await interaction.response.edit_message(embed=bot_list.get_embedded_by_class(self.bot_class), view=self)
+        await interaction.response.edit_message(embed=get_bot_list().get_embedded_by_class(self.bot_class), view=self)
 
     async def on_timeout(self):
         # Clear all items
@@ -131,13 +160,14 @@ class BotListView(View):
 
 class BotCommandHandler(CommandHandler):
     def __init__(self, bot):
-        super().__init__(bot, "bot", ["b"], "Query for a bot", f"{BOT_PREFIX}bot <name>", f"{BOT_PREFIX}bot chainer")
+        super().__init__(bot, "bot", ["b"], "Query for a bot", f"{BOT_PREFIX}bot <name>", f"{BOT_PREFIX}bot chainer",
+                         blocking=True)
 
     async def on_command(self, author, command, args, message, channel, guild):
         if not args:
             default_bot_class = "TANK"
             view = BotListView(default_bot_class, self.command)
-            view.message = await self.bot.reply(message, embedded=bot_list.get_embedded_by_class(default_bot_class), view=view)
+            view.message = await self.bot.reply(message, embedded=get_bot_list().get_embedded_by_class(default_bot_class), view=view)
             return
 
         bot_name = args[0].lower()
@@ -147,16 +177,29 @@ class BotCommandHandler(CommandHandler):
             bot_name = "dune-bug"
 
         try:
-            bot = fetch_bot(bot_name)
-        except AttributeError:
+            bot = await self.coalesced((bot_name,), fetch_bot, bot_name, run_blocking=self.run_blocking)
+        except (BotNotFoundError, AttributeError):
             # TODO: perhaps add fuzz search here?
             await self.bot.reply(message, content=f"Bot not found, use `{BOT_PREFIX}{self.command}` to view a list of bots")
             return
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            await self.bot.reply(message, content="The botworld wiki is unreachable, try again later")
+            return
 
         view = BotView(bot, self.command)
-        view.message = await self.bot.reply(message, embedded=bot.get_general_embedded(), view=view)
+        view.message = await self.bot.reply(message, embedded=view.embeds["general"], view=view)
 
 
 def register_all(bot):
     """ Register all commands in this module """
+    global crawler
     bot.register_command_handler(BotCommandHandler(bot))
+    if BOTWORLD_CRAWLER_ENABLED and crawler is None:
+        crawler = BotCrawler(lambda: get_bot_list().get_bot_names())
+        crawler.start()
+
+
+def warm_up():
+    """ Build the heavy state of this module, called by the command loader off the event loop """
+    get_bot_list()
+    get_cache().load()
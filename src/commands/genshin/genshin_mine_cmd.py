@@ -1,14 +1,31 @@
 import datetime
+import time
 
 import discord
 import pytz
 
 import src.utils.log_util as log
-from src.data import settings, emojis, colors
+from src.data import settings, colors
 from src.data.settings import SEP
 from src.utils.command_handler import CommandHandler
 from src.utils.intent_handler import IntentHandler
-from src.utils.sql_util import ChainedStatement, SQLError
+from src.utils import journal_util
+from src.utils.async_sql_util import AsyncChainedStatement
+from src.utils.sql_builder import named_row
+from src.utils.sql_util import SQLError
+
+# Row of the "genshin_mine" table
+MineRow = named_row("MineRow", ("player", "time_stamp"))
+
+# Start of the mining timestamps, as seconds since the epoch
+EPOCH = datetime.datetime(2021, 1, 1, tzinfo=pytz.timezone("US/Pacific")).timestamp()
+
+# Write-through cache of the "genshin_mine" table { player => time_stamp }, None until first read
+timestamps = None
+# When "timestamps" was read from the table, in time.monotonic() seconds
+timestamps_loaded_at = 0
+# Incremented by every write, tells a reload whether a write happened while it was reading
+timestamps_version = 0
 
 
 class MineCommandHandler(CommandHandler, IntentHandler):
@@ -17,6 +34,7 @@ class MineCommandHandler(CommandHandler, IntentHandler):
         CommandHandler.__init__(self, bot, "mine", ["mining"], "Command to view Genshin mining respawn status",
                                 f"{settings.BOT_PREFIX}mine [list/update] [args...]",
                                 f"{settings.BOT_PREFIX}mine update Breeze\n"
+                                f"> {settings.BOT_PREFIX}mine update Breeze Geoff Klee\n"
                                 f"> {settings.BOT_PREFIX}mine list")
         # Initialize intent handler superclass
         IntentHandler.__init__(self, bot, "genshin_mine", "Check whose Genshin Impact world is ready to be mined")
@@ -29,14 +47,14 @@ class MineCommandHandler(CommandHandler, IntentHandler):
         operation = args[0]
         if operation == "list" or operation == "l":
             await self.bot.send_typing_packet(channel)
-            await self.bot.reply(message, embedded=get_mine_list_embedded(get_worlds()))
+            await self.bot.reply(message, embedded=get_mine_list_embedded(await self.coalesced(("list",), get_worlds)))
         elif operation == "update" or operation == "u":
             if len(args) < 2:
                 await self.bot.reply(message,
-                                     content=f"Invalid arguments! Usage: `{settings.BOT_PREFIX}mine update <name>`")
+                                     content=f"Invalid arguments! Usage: `{settings.BOT_PREFIX}mine update <names...>`")
                 return
-            # Update mine
-            update(args[1])
+            # Update mines, all names in one statement
+            await update(*args[1:])
             await self.bot.react_check(message)
         elif operation == "delete" or operation == "d":
             if len(args) < 2:
@@ -44,15 +62,15 @@ class MineCommandHandler(CommandHandler, IntentHandler):
                                      content=f"Invalid arguments! Usage: `{settings.BOT_PREFIX}mine delete <existing name>`")
                 return
             # Delete mine entry
-            row_count = delete(args[1])
+            row_count = await delete(args[1])
             await self.bot.reply(message, content=f"Operation successful, {row_count} rows affected")
         else:
-            await message.add_reaction(emojis.QUESTION)
+            await self.bot.react_unknown(message)
             return
 
     async def on_intent_detected(self, author, confidence, message, channel, guild):
         await self.bot.send_typing_packet(channel)
-        return await self.bot.reply(message, embedded=get_mine_list_embedded(get_worlds()))
+        return await self.bot.reply(message, embedded=get_mine_list_embedded(await self.coalesced(("list",), get_worlds)))
 
 
 def get_mine_list_embedded(worlds):
@@ -78,8 +96,8 @@ def get_mine_list_embedded(worlds):
 
 
 def get_time_stamp():
-    pacific = pytz.timezone("US/Pacific")
-    return (datetime.datetime.now(pacific) - datetime.datetime(2021, 1, 1, tzinfo=pacific)).total_seconds()
+    # Same as (now in US/Pacific - EPOCH), timezone-aware differences don't depend on the timezone
+    return time.time() - EPOCH
 
 
 def format_time(timestamp):
@@ -93,34 +111,118 @@ def format_time(timestamp):
     return message
 
 
-def update(player_name):
-    sql = f"INSERT INTO genshin_mine VALUES (\"{player_name}\", {get_time_stamp()}) ON DUPLICATE KEY UPDATE time_stamp={get_time_stamp()};"
+async def update(*player_names):
+    # Duplicates would make MySQL count the same row twice
+    player_names = list(dict.fromkeys(player_names))
+    time_stamp = get_time_stamp()
+    journal = await journal_util.get_journal()
+    if journal is not None:
+        # Write-behind, acknowledged once it is in the local journal
+        await journal.upsert("genshin_mine", ("player", "time_stamp"),
+                             [(player_name, time_stamp) for player_name in player_names], keys=("player",))
+        _write_through({player_name: time_stamp for player_name in player_names})
+        return
+
     try:
-        with ChainedStatement() as statement:
-            row_count = statement.execute(sql)
-        if row_count != 1:
+        async with AsyncChainedStatement() as statement:
+            row_count = await statement.upsert_many("genshin_mine", ("player", "time_stamp"),
+                                                    [(player_name, time_stamp) for player_name in player_names],
+                                                    keys=("player",))
+        # MySQL reports 2 affected rows for every existing player that is updated
+        if not len(player_names) <= row_count <= 2 * len(player_names):
             raise SQLError("Potentially incorrect SQL operation!")
+        _write_through({player_name: time_stamp for player_name in player_names})
     except SQLError as e:
         log.error(e.strerror)
-
-
-def delete(player_name):
-    sql = f"DELETE FROM genshin_mine WHERE player=\"{player_name}\";"
-    with ChainedStatement() as statement:
-        row_count = statement.execute(sql)
+        # Unsure what the table holds now, read it again on the next list
+        _write_through({})
+        invalidate()
+
+
+async def delete(player_name):
+    journal = await journal_util.get_journal()
+    if journal is not None:
+        # The database has not run the delete yet, count what it will delete
+        row_count = 1 if player_name in await get_timestamps() else 0
+        await journal.delete("genshin_mine", ("player",), [(player_name,)])
+        _write_through({player_name: None})
+        return row_count
+
+    async with AsyncChainedStatement() as statement:
+        row_count = await statement.delete("genshin_mine", "player=%s", data=(player_name,))
+    _write_through({player_name: None})
     return row_count
 
 
-def get_worlds():
-    sql = f"SELECT * FROM genshin_mine"
-    now = get_time_stamp()
+async def get_worlds():
+    """
+    Get the seconds until every world can be mined again, served from the cache while it is fresh
+
+    Returns:
+        (Dict[str, float]) { player => seconds left, 0 if ready }
+    """
     try:
-        with ChainedStatement() as statement:
-            result = list(statement.query(sql))
-        return {a[0]: max(a[1] + 259200 - now, 0) for a in result}
+        cached = await get_timestamps()
     except SQLError as e:
         log.error(e.strerror)
-        return []
+        return {}
+    now = get_time_stamp()
+    return {player: max(time_stamp + 259200 - now, 0) for player, time_stamp in cached.items()}
+
+
+async def get_timestamps():
+    """
+    Get the mining timestamp of every player, re-read from the table once the cache is older than its TTL
+
+    Returns:
+        (Dict[str, float]) { player => time_stamp }, must not be modified
+    """
+    global timestamps, timestamps_loaded_at
+    if timestamps is not None and time.monotonic() - timestamps_loaded_at < settings.GENSHIN_MINE_CACHE_TTL:
+        return timestamps
+
+    version = timestamps_version
+    sql = f"SELECT player, time_stamp FROM genshin_mine"
+    journal = await journal_util.get_journal()
+    if journal is not None:
+        # Includes the writes still waiting in the journal
+        loaded = {row[0]: row[1] for row in await journal.read("genshin_mine", MineRow._fields, ("player",), sql)}
+    else:
+        async with AsyncChainedStatement() as statement:
+            loaded = {row.player: row.time_stamp async for row in statement.stream(sql, row_type=MineRow)}
+    if version == timestamps_version:
+        timestamps = loaded
+        timestamps_loaded_at = time.monotonic()
+    else:
+        # A write landed while reading and may be missing from the result, serve it once and read again next time
+        timestamps_loaded_at = 0
+    return loaded
+
+
+def invalidate():
+    """ Drop the cached timestamps, the next read goes to the table """
+    global timestamps
+    timestamps = None
+
+
+def _write_through(changes):
+    """
+    Apply a write to the cache, so reads after it don't have to go to the table
+
+    Args:
+        changes (Dict[str, float]): { player => new time_stamp, None if deleted }
+    """
+    global timestamps, timestamps_version
+    timestamps_version += 1
+    if timestamps is None:
+        return
+    # Replaced instead of modified, readers may still hold the old dictionary
+    timestamps = dict(timestamps)
+    for player, time_stamp in changes.items():
+        if time_stamp is None:
+            timestamps.pop(player, None)
+        else:
+            timestamps[player] = time_stamp
 
 
 ###############################################################
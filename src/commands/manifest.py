@@ -0,0 +1,62 @@
+# Command modules, with the commands & intents they register
+# - names are registered at startup, each module is imported on first use or in the warm-up after on_ready
+# - must match what each module's "register_all" registers, in the form { command => [aliases] }
+COMMAND_MANIFEST = {
+    "src.commands.utility_cmd": {
+        "commands": {
+            "help": ["?"],
+            "ping": [],
+            "echo": [],
+            "fact": ["ff"],
+        },
+        "intents": [],
+    },
+    "src.commands.admin_cmd": {
+        "commands": {
+            "stats": [],
+            "dbstats": [],
+        },
+        "intents": [],
+    },
+    "src.commands.genshin.genshin_general_cmd": {
+        "commands": {
+            "remind": [],
+        },
+        "intents": [],
+    },
+    "src.commands.genshin.genshin_mine_cmd": {
+        "commands": {
+            "mine": ["mining"],
+        },
+        "intents": ["genshin_mine"],
+    },
+    "src.commands.botworld.botworld_cmd": {
+        "commands": {
+            "bot": ["b"],
+        },
+        "intents": [],
+    },
+}
+
+if __name__ == "__main__":
+    # Startup benchmark: cold import time of every command module, each measured in a fresh interpreter
+    import subprocess
+    import sys
+
+    def cold_import_time(module):
+        code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        return float(result.stdout.strip().splitlines()[-1])
+
+    total = 0
+    for name in ["src.app", *COMMAND_MANIFEST]:
+        seconds = cold_import_time(name)
+        if seconds is None:
+            print(f"{name:45s} >> import failed")
+            continue
+        if name != "src.app":
+            total += seconds
+        print(f"{name:45s} >> {seconds * 1000:8.1f}ms")
+    print(f"{'Deferred by lazy loading (upper bound)':45s} >> {total * 1000:8.1f}ms")
@@ -18,11 +18,10 @@ class HelpCommandHandler(CommandHandler):
         # Help for specific command
         elif len(args) == 1:
             # Find target command
-            handler = None
-            for loop in self.bot.command_handlers:
-                if args[0] == loop.command or args[0] in loop.aliases:
-                    handler = loop
-                    break
+            handler = self.bot.get_command_handler(args[0])
+            # Command module not loaded yet, load it for its help message
+            if getattr(handler, "placeholder", False):
+                handler = await handler.load()
 
             # Not found -- unknown command
             if handler is None:
@@ -81,12 +80,15 @@ class EchoCommandHandler(CommandHandler):
 
 class FactCommandHandler(CommandHandler):
     def __init__(self, bot):
-        super().__init__(bot, "fact", ["ff"], "I will generate a random fun fact", "", "")
+        super().__init__(bot, "fact", ["ff"], "I will generate a random fun fact", "", "", blocking=True)
 
     async def on_command(self, author, command, args, message, channel, guild):
         facts_url = "http://numbersapi.com/random"
-        response = requests.get(facts_url)
-        if response.status_code != 200:
+        try:
+            response = await self.run_blocking(requests.get, facts_url, timeout=10)
+        except requests.RequestException:
+            response = None
+        if response is None or response.status_code != 200:
             await self.bot.reply(message, content="Unable to reach the facts API, try again later")
             return
         embedded = discord.Embed(
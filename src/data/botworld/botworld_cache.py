@@ -0,0 +1,258 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import src.utils.log_util as log
+from src.data.botworld.botworld_objects import Bot
+from src.data.settings import BOTWORLD_CACHE_TTL, BOTWORLD_CACHE_SIZE, BOTWORLD_CACHE_PERSIST_DELAY
+from src.utils import metrics_util
+
+# Optional, only available on POSIX. Without it, concurrent writers may drop each other's entries, files stay intact
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "cache.json")
+
+# Cache of this process, see get_cache
+cache = None
+_cache_lock = threading.Lock()
+
+
+class BotCache:
+    """
+    In-memory cache of Bot objects with a TTL and LRU eviction, persisted to a JSON file
+    - the file is read once, on first use
+    - expired bots are kept with their ETag & Last-Modified, so they can be revalidated instead of fetched again
+    - writes are persisted in the background at most once every "persist_delay" seconds, all pending ones together
+    - the file is merged & replaced atomically under a file lock, so concurrent workers can share it
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=BOTWORLD_CACHE_TTL, max_size=BOTWORLD_CACHE_SIZE,
+                 persist_delay=BOTWORLD_CACHE_PERSIST_DELAY):
+        """
+        Args:
+            path (str): path of the JSON cache file
+            ttl (float): seconds until a fetched bot expires
+            max_size (int): maximum number of bots in memory, least recently used ones are evicted
+            persist_delay (float): seconds to gather writes before persisting them
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.persist_delay = persist_delay
+        # Cached bots { name => (bot, expiration, validators) }, least recently used first
+        self.entries = OrderedDict()
+        # Bots written since the last persist { name => (bot, expiration, validators) }
+        self.dirty = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._loaded = False
+        self._timer = None
+        # Persisted by a timer thread
+        self._lock = threading.RLock()
+
+    def load(self):
+        """ Read the file now instead of on first use, so the first lookup doesn't wait for it """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+    def get(self, name):
+        """
+        Get a cached bot
+
+        Args:
+            name (str): bot name
+
+        Returns:
+            (Bot) cached bot, None if it is not cached or expired
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            entry = self.entries.get(name)
+            if entry is None or entry[1] <= time.time():
+                self.misses += 1
+                metrics_util.inc("botworld_cache_misses_total")
+                return None
+            self.entries.move_to_end(name)
+            self.hits += 1
+            metrics_util.inc("botworld_cache_hits_total")
+            return entry[0]
+
+    def get_stale(self, name):
+        """
+        Get a cached bot even if it expired, to revalidate it
+
+        Args:
+            name (str): bot name
+
+        Returns:
+            (Tuple[Bot, float, Dict[str, str]]) cached bot, its expiration & validators ("etag" & "last_modified"),
+                None if not cached
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            return self.entries.get(name)
+
+    def put(self, name, bot, expiration=None, validators=None):
+        """
+        Cache a bot, it is persisted in the background
+
+        Args:
+            name (str): bot name
+            bot (Bot): bot to cache
+            expiration (float): when it expires in seconds since the epoch, default = now + TTL
+            validators (Dict[str, str]): "etag" & "last_modified" of the wiki page, to revalidate it once expired
+        """
+        entry = (bot, expiration if expiration is not None else time.time() + self.ttl, validators or {})
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._insert(name, entry)
+            self.dirty[name] = entry
+            if self._timer is None:
+                self._timer = threading.Timer(self.persist_delay, self.persist)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def stats(self):
+        """
+        Returns:
+            (Dict[str, int]) hit, miss & eviction counts and the current size
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries)}
+
+    def persist(self):
+        """ Write the pending bots to the file, merged with what other workers wrote """
+        with self._lock:
+            self._timer = None
+            dirty, self.dirty = self.dirty, {}
+        if not dirty:
+            return
+
+        try:
+            with self._file_lock():
+                # Keep what other workers wrote, expired bots too since they can be revalidated
+                stored = self._read()
+                for name, (bot, expiration, validators) in dirty.items():
+                    if name not in stored or stored[name]["expiration"] < expiration:
+                        stored[name] = {**bot.to_json(), "expiration": expiration,
+                                        "etag": validators.get("etag"), "last_modified": validators.get("last_modified")}
+                self._write(stored)
+        except (OSError, ValueError) as e:
+            log.error(f"Unable to persist {len(dirty)} cached bots to \"{self.path}\": {e}")
+            # Try again with the next batch
+            with self._lock:
+                self.dirty = {**dirty, **self.dirty}
+
+    def _load(self):
+        self._loaded = True
+        try:
+            stored = self._read()
+        except (OSError, ValueError) as e:
+            log.error(f"Unable to read cached bots from \"{self.path}\": {e}")
+            return
+        # Soonest to expire first, so they are evicted first
+        for name, cached in sorted(stored.items(), key=lambda a: a[1]["expiration"]):
+            validators = {"etag": cached.get("etag"), "last_modified": cached.get("last_modified")}
+            self._insert(name, (Bot.from_dict(cached), cached["expiration"], validators))
+
+    def _insert(self, name, entry):
+        self.entries[name] = entry
+        self.entries.move_to_end(name)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+            metrics_util.inc("botworld_cache_evictions_total")
+        metrics_util.set_gauge("botworld_cache_size", len(self.entries))
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _write(self, stored):
+        # Write a temporary file next to the cache, then swap it in, so readers never see half a file
+        directory = os.path.dirname(self.path) or "."
+        fd, temp_path = tempfile.mkstemp(prefix=".cache-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(stored, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _file_lock(self):
+        return _FileLock(f"{self.path}.lock")
+
+
+class _FileLock:
+    """ Exclusive lock on a lock file, held by one process at a time """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def get_cache():
+    """
+    Get the bot cache of this process, created on first use
+
+    Returns:
+        (BotCache) bot cache
+    """
+    global cache
+    if cache is None:
+        with _cache_lock:
+            if cache is None:
+                cache = BotCache()
+                # Don't lose the last writes on shutdown
+                atexit.register(cache.persist)
+    return cache
+
+
+if __name__ == "__main__":
+    # Code for testing the cache against a temporary file
+    test_bot = Bot("Flamer", "Hot Hot", "icon_url", "EVADER", "SPECIAL", "acquisition",
+                   [("ability1", "desc1", {"Damage": "10"})], [[("1a", "1ad")]], {"1": ["hp", "atk", "dps", "spd"]})
+    with tempfile.TemporaryDirectory() as test_directory:
+        test_path = os.path.join(test_directory, "cache.json")
+        test_cache = BotCache(test_path, max_size=2, persist_delay=0.1)
+        for test_name in ("flamer", "nozzle", "shell"):
+            test_cache.put(test_name, test_bot, validators={"etag": f'"{test_name}"'})
+        print(f"flamer evicted: {test_cache.get('flamer') is None}, shell cached: {test_cache.get('shell') is test_bot}")
+        test_cache.put("expired", test_bot, time.time() - 1, {"etag": '"expired"'})
+        print(f"expired: {test_cache.get('expired')}, stale: {test_cache.get_stale('expired')[2]}")
+
+        start = time.perf_counter()
+        for _ in range(100000):
+            test_cache.get("shell")
+        print(f"Hit: {(time.perf_counter() - start) * 10:.2f}us")
+
+        time.sleep(0.3)
+        print(f"Persisted: {sorted(BotCache(test_path)._read())}")
+        print(f"Reloaded: {BotCache(test_path).get('shell').name}")
+        print(test_cache.stats())
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import src.utils.log_util as log
+from src.data.botworld.botworld_cache import get_cache
+from src.data.botworld.botworld_objects import Bot
+from src.data.botworld.botworld_spider import refresh_bot
+from src.data.settings import URL_BOTWORLD_WIKI, BOTWORLD_CRAWLER_CONCURRENCY, BOTWORLD_CRAWLER_DELAY, \
+    BOTWORLD_CRAWLER_INTERVAL
+from src.utils import metrics_util
+from src.utils.shared_state import get_state
+
+
+class BotCrawler:
+    """
+    Keeps every bot of the bot list cached by crawling the wiki in the background
+    - the first crawl fetches every bot at startup, later crawls refresh the bots that would expire before the next one
+    - requests go out at most "concurrency" at a time, each slot waits "delay" seconds between requests
+    - bots refreshed by another worker are taken from the shared state instead of the wiki
+    """
+
+    def __init__(self, load_names, base_url=URL_BOTWORLD_WIKI, concurrency=BOTWORLD_CRAWLER_CONCURRENCY,
+                 delay=BOTWORLD_CRAWLER_DELAY, interval=BOTWORLD_CRAWLER_INTERVAL):
+        """
+        Args:
+            load_names (function): blocking function returning the names of the bots to crawl
+            base_url (str): base URL of the wiki
+            concurrency (int): maximum number of requests at the same time
+            delay (float): seconds each slot waits after a request
+            interval (float): seconds between crawls
+        """
+        self.load_names = load_names
+        self.base_url = base_url
+        self.delay = delay
+        self.interval = interval
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def crawl(self, names):
+        """
+        Refresh the bots that are missing or expire before the next crawl
+
+        Args:
+            names (List[str]): names of the bots to crawl
+
+        Returns:
+            (int) number of bots refreshed from the wiki
+        """
+        horizon = time.time() + self.interval
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._refresh(name, horizon) for name in names))
+        refreshed = sum(results)
+        metrics_util.observe("botworld_crawl_seconds", time.perf_counter() - start)
+        if refreshed:
+            log.info(f"Crawled {refreshed} bots from the wiki in {time.perf_counter() - start:.1f}s!")
+        return refreshed
+
+    async def _refresh(self, name, horizon):
+        # True if the bot was refreshed from the wiki
+        cache = get_cache()
+        cached = cache.get_stale(name)
+        if cached is not None and cached[1] > horizon:
+            return False
+        shared = get_state().get("botworld", name)
+        if shared is not None and shared["expiration"] > horizon:
+            cache.put(name, Bot.from_dict(shared), shared["expiration"],
+                      {"etag": shared.get("etag"), "last_modified": shared.get("last_modified")})
+            return False
+
+        async with self.semaphore:
+            try:
+                await refresh_bot(name, self.base_url)
+                metrics_util.inc("botworld_crawled_total")
+            except Exception as e:
+                metrics_util.inc("botworld_crawl_failures_total")
+                log.warning(f"Unable to crawl bot \"{name}\": {e!r}")
+                return False
+            finally:
+                await asyncio.sleep(self.delay)
+        return True
+
+    async def _run(self):
+        try:
+            names = await asyncio.to_thread(self.load_names)
+            # Read the cache file off the event loop
+            await asyncio.to_thread(get_cache().load)
+        except Exception as e:
+            log.error(f"Unable to start the bot crawler: {e}")
+            return
+        while True:
+            try:
+                await self.crawl(names)
+            except Exception as e:
+                log.error(f"Unable to crawl the wiki: {e}")
+            await asyncio.sleep(self.interval)
+
+
+if __name__ == "__main__":
+    # Code for testing the crawler & stale-while-revalidate against a local stand-in for the wiki
+    import os
+    import tempfile
+
+    from src.data.botworld import botworld_cache
+    from src.data.botworld.botworld_spider import fetch_bot
+    from src.data.botworld.wiki_stub_server import WikiStubServer
+    from src.utils import http_util
+
+    async def main(server, names):
+        crawler = BotCrawler(lambda: names, server.url, concurrency=4, delay=0.01, interval=0.5)
+        start = time.perf_counter()
+        print(f"Startup crawl: {await crawler.crawl(names)} bots in {time.perf_counter() - start:.2f}s, "
+              f"{server.request_count()} requests")
+        print(f"Crawl of a fresh cache: {await crawler.crawl(names)} bots")
+
+        # Expire a bot: the lookup gets the expired bot right away, while it is revalidated in the background
+        server.delay = 0.2
+        cached = botworld_cache.cache.get_stale(names[0])
+        botworld_cache.cache.put(names[0], cached[0], time.time() - 1, cached[2])
+        get_state().delete("botworld", names[0])
+        start = time.perf_counter()
+        bot = await fetch_bot(names[0], server.url)
+        print(f"Expired lookup: {(time.perf_counter() - start) * 1000:.2f}ms, served stale: {bot is cached[0]}")
+        await asyncio.sleep(0.3)
+        print(f"Fresh after revalidation: {botworld_cache.cache.get(names[0]) is not None}")
+        await http_util.close_session()
+
+    with tempfile.TemporaryDirectory() as test_directory:
+        botworld_cache.cache = botworld_cache.BotCache(os.path.join(test_directory, "cache.json"))
+        test_server = WikiStubServer().start()
+        asyncio.run(main(test_server, [f"bot-{i}" for i in range(37)]))
+        test_server.stop()
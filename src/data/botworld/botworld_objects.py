@@ -1,16 +1,34 @@
 import json
+import math
+import os
+import sys
 from typing import List, Tuple, Dict
 
 import discord
+import numpy
 
 from src.data import colors, emotes
 from src.data.settings import URL_BOTWORLD_WIKI
 from src.utils import log_util
 
+BOTS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "bots.json")
+
 
 class Bot:
+    """
+    A bot of the wiki, kept compact since every cached bot stays in memory
+    - stats are parsed once into a numeric array of levels x STAT_COLUMNS, non-numeric cells are NaN
+    - the text of cells that doesn't print back from its number is kept aside, so the JSON stays lossless
+    - ability & AI strings repeat a lot between bots, they are interned
+    - bots don't change once built, a changed wiki page makes a new bot, so their embeds are rendered only once
+    """
+
     BOT_CLASSES = {"TANK", "SPLASHER", "SNIPER", "CHASER", "EVADER", "BRAWLER", "SUPPORT"}
     BOT_RARITIES = {"COMMON", "SPECIAL", "RARE", "EPIC"}
+    STAT_COLUMNS = ("HP", "ATK", "DPS", "SPD")
+
+    __slots__ = ("name", "description", "icon_url", "bot_class", "rarity", "acquisition", "abilities", "ai",
+                 "stat_levels", "stat_values", "_stat_lengths", "_stat_text", "_embeds")
 
     def __init__(self, name, description, icon_url, bot_class, rarity, acquisition, abilities, ai, stats):
         """
@@ -33,15 +51,61 @@ class Bot:
 
         # Type
         assert bot_class in Bot.BOT_CLASSES
-        self.bot_class = bot_class
+        self.bot_class = sys.intern(bot_class)
         assert rarity in Bot.BOT_RARITIES
-        self.rarity = rarity
+        self.rarity = sys.intern(rarity)
         self.acquisition = acquisition
 
-        # Details
-        self.abilities = abilities
-        self.ai = ai
-        self.stats = stats
+        # Details, as tuples of interned strings, ability attributes as ((name, value), ...)
+        self.abilities = tuple((sys.intern(name), sys.intern(desc),
+                                tuple((sys.intern(key), sys.intern(value)) for key, value in attributes.items()))
+                               for name, desc, attributes in abilities)
+        self.ai = tuple(tuple((sys.intern(option), sys.intern(desc)) for option, desc in level) for level in ai)
+        self._set_stats(stats)
+        self._embeds = None
+
+    @property
+    def stats(self):
+        """
+        Returns:
+            (Dict[str, List[str]]) bot stats formatted as { level => [HP, ATK, DPS, SPD] }, as they were given
+        """
+        stats = {}
+        for row, level in enumerate(self.stat_levels):
+            length = self._stat_lengths[row] if self._stat_lengths is not None else self.stat_values.shape[1]
+            stats[level] = [self._stat_text[row, column] if (row, column) in self._stat_text
+                            else _format_stat(self.stat_values[row, column]) for column in range(length)]
+        return stats
+
+    def get_stat(self, column):
+        """
+        Args:
+            column (str): one of STAT_COLUMNS
+
+        Returns:
+            (numpy.ndarray) values of the stat, one per level, NaN if not numeric
+        """
+        return self.stat_values[:, Bot.STAT_COLUMNS.index(column)]
+
+    def _set_stats(self, stats):
+        self.stat_levels = tuple(sys.intern(level) for level in stats)
+        lengths = tuple(len(values) for values in stats.values())
+        width = max(lengths, default=0)
+        # Only kept if the rows have different lengths
+        self._stat_lengths = lengths if any(length != width for length in lengths) else None
+        self.stat_values = numpy.full((len(lengths), width), numpy.nan)
+        # Cells whose text doesn't print back from the parsed number { (row, column) => text }
+        self._stat_text = {}
+        for row, values in enumerate(stats.values()):
+            for column, text in enumerate(values):
+                try:
+                    value = float(text)
+                except ValueError:
+                    value = numpy.nan
+                self.stat_values[row, column] = value
+                if value != value or _format_stat(value) != text:
+                    self._stat_text[row, column] = sys.intern(text)
+        self.stat_values.flags.writeable = False
 
     def ability_count(self):
         return len(self.abilities)
@@ -58,6 +122,18 @@ class Bot:
     def get_rarity_emote(self):
         return emotes.get_rarity_emote(self.rarity)
 
+    def get_embeds(self):
+        """
+        Get the embeds of every tab of the bot view, rendered on first use
+
+        Returns:
+            (Dict[str, discord.Embed]) "general", "abilities", "ai" & "stats" embeds, must not be modified
+        """
+        if self._embeds is None:
+            self._embeds = {"general": self.get_general_embedded(), "abilities": self.get_abilities_embedded(),
+                            "ai": self.get_ai_embedded(), "stats": self.get_stats_embedded()}
+        return self._embeds
+
     # Embedded generation methods
     def get_general_embedded(self):
         embedded = discord.Embed(
@@ -83,7 +159,7 @@ class Bot:
         for ability in self.abilities:
             ability_details = ability[2]
             ability_details_string = ""
-            for name, attribute in ability_details.items():
+            for name, attribute in ability_details:
                 ability_details_string += f"{name}: {attribute}\n"
             embedded.add_field(name=f"**{ability[0]}:**", value=f"{ability[1]}\n```{ability_details_string[:-1]}```", inline=False)
         return embedded
@@ -133,7 +209,7 @@ class Bot:
             abilities["list"].append({
                 "name": ability[0],
                 "description": ability[1],
-                "stats": ability[2]
+                "stats": dict(ability[2])
             })
         json_obj["abilities"] = abilities
 
@@ -154,7 +230,10 @@ class Bot:
 
     @staticmethod
     def from_json(json_obj: str):
-        json_obj = json.loads(json_obj)
+        return Bot.from_dict(json.loads(json_obj))
+
+    @staticmethod
+    def from_dict(json_obj: Dict[str, any]):
         name = json_obj["name"]
         description = json_obj["description"]
         icon_url = json_obj["icon_url"]
@@ -181,11 +260,18 @@ class Bot:
                    abilities, ai, stats)
 
 
+def _format_stat(value):
+    # "1485" for 1485.0, "23.1" for 23.1, the way the wiki writes them
+    if math.isnan(value):
+        return None
+    return str(int(value)) if value.is_integer() else repr(float(value))
+
+
 class BotList:
     """ Contains a list of bots and various GET methods """
 
     def __init__(self):
-        with open("src/data/botworld/bots.json") as f:
+        with open(BOTS_PATH) as f:
             data_bots = json.load(f)
         self.data_bots = data_bots
 
@@ -198,6 +284,9 @@ class BotList:
     def get_bot_count(self):
         return self.bot_count
 
+    def get_bot_names(self):
+        return [bot for bot_class in self.data_bots["bot_classes"] for bot in self.data_bots["bots"][bot_class]]
+
     def get_embedded_by_class(self, bot_class):
         embedded = discord.Embed(
             title=f"**List of Bots**",
@@ -228,12 +317,36 @@ class BotList:
 
 
 if __name__ == "__main__":
+    # Code for testing the JSON round trip & memory of bots parsed from the wiki pages of the parser benchmark
+    import time
+    import tracemalloc
+
+    from src.data.botworld.parser_benchmark import load_corpus
+
     test_bot = Bot("Flamer", "Hot Hot", "icon_url", "EVADER", "SPECIAL",
-                   "acquisition", [("ability1", "desc1", "stat1"), ("ability2", "desc2", "stat2")],
+                   "acquisition", [("ability1", "desc1", {"Damage": "10"}), ("ability2", "desc2", {"Range": "3"})],
                    [[("1a", "1ad"), ("1b", "1bd")], [("2c", "2cd")]],
-                   {"lv1": ["hp", "atk", "dps", "spd"]})
+                   {"lv1": ["hp", "atk", "dps", "spd"], "lv2": ["007", "1.50", "2.5"], "lv3": ["", "5", "", ""]})
     bot_json = test_bot.to_json()
     print(bot_json)
-
-    b2 = Bot.from_json(bot_json)
-    print(b2.to_json())
+    print(f"Lossless: {Bot.from_dict(bot_json).to_json() == bot_json}")
+
+    corpus = [expected for _, _, expected in load_corpus()] * 10
+    # Count what the bots keep of the loaded JSON, once it is freed
+    corpus_text = json.dumps(corpus)
+    tracemalloc.start()
+    bots = [Bot.from_dict(expected) for expected in json.loads(corpus_text)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Lossless over the corpus: {all(bot.to_json() == expected for bot, expected in zip(bots, corpus))}")
+    print(f"{size / len(bots):.0f} bytes per bot")
+    start = time.perf_counter()
+    for bot in bots:
+        bot.get_embeds()
+    print(f"Embeds: {(time.perf_counter() - start) * 1000 / len(bots):.3f}ms per bot to render, ", end="")
+    start = time.perf_counter()
+    for bot in bots:
+        bot.get_embeds()
+    print(f"{(time.perf_counter() - start) * 1000000 / len(bots):.2f}us per bot once rendered")
+    print(f"HP at max level of {bots[0].name}: {bots[0].get_stat('HP')[-1]:.0f}, "
+          f"highest DPS of the corpus: {max(numpy.nanmax(bot.get_stat('DPS')) for bot in bots):.1f}")
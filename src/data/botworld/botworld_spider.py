@@ -1,125 +1,267 @@
-import json
+import asyncio
 import re
 import time
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
+import src.utils.log_util as log
+from src.data.botworld.botworld_cache import get_cache
 from src.data.botworld.botworld_objects import Bot
-from src.data.settings import URL_BOTWORLD_WIKI
+from src.data.settings import URL_BOTWORLD_WIKI, BOTWORLD_CACHE_MAX_STALE
+from src.utils import http_util, metrics_util
+from src.utils.coalesce_util import Coalescer
+from src.utils.shared_state import get_state
 
+# Only the bot's section of a wiki page is parsed
+_BOT_INFOS = SoupStrainer("div", class_="bot-infos")
+# Separators between the attributes of an ability, e.g. "Damage: 120 , Range: 9"
+_ABILITY_SEPARATOR = re.compile(" , |, | ,")
 
-def fetch_bot(name):
-    # Check cache
-    with open("src/data/botworld/cache.json") as f:
-        bot_cache = json.load(f)
+# Wiki fetches in flight, concurrent lookups of the same bot share one
+fetches = Coalescer()
+# Background revalidations, referenced until they finish
+_revalidations = set()
+
+
+class BotNotFoundError(LookupError):
+    """ The wiki has no page for the bot """
+
+
+async def fetch_bot(name, base_url=URL_BOTWORLD_WIKI, run_blocking=None):
+    """
+    Get a bot, from the cache if it is fresh, otherwise from the wiki
+    - an expired bot is revalidated with a conditional GET, its page is only downloaded & parsed again if it changed
+    - an expired bot is served right away while it is revalidated in the background, for BOTWORLD_CACHE_MAX_STALE
+    - concurrent lookups of the same bot share one fetch, and its result or exception
+
+    Args:
+        name (str): bot name, as in its wiki URL
+        base_url (str): base URL of the wiki
+        run_blocking (function): coroutine function running blocking work off the event loop, default = a thread
+
+    Returns:
+        (Bot) bot
+
+    Raises:
+        BotNotFoundError: the wiki has no page for the bot
+        aiohttp.ClientError, asyncio.TimeoutError: the wiki is unreachable
+    """
+    cache = get_cache()
 
     # Cache hit, early return
-    if name in bot_cache and bot_cache[name]["expiration"] > time.time():
-        return Bot.from_json(json.dumps(bot_cache[name]))
+    bot = cache.get(name)
+    if bot is not None:
+        return bot
+
+    # Check the cache shared by all workers
+    cached = get_state().get("botworld", name)
+    if cached is not None and cached["expiration"] > time.time():
+        bot = Bot.from_dict(cached)
+        cache.put(name, bot, cached["expiration"], {"etag": cached.get("etag"), "last_modified": cached.get("last_modified")})
+        return bot
+
+    # Serve the expired bot, unless it is too old
+    stale = cache.get_stale(name)
+    if stale is not None and stale[1] + BOTWORLD_CACHE_MAX_STALE > time.time():
+        metrics_util.inc("botworld_stale_served_total")
+        revalidate(name, base_url, run_blocking)
+        return stale[0]
+
+    return await refresh_bot(name, base_url, run_blocking)
+
 
-    # Cache miss, fetch from web
-    bot_info = fetch_bot_from_wiki(name)
+async def refresh_bot(name, base_url=URL_BOTWORLD_WIKI, run_blocking=None):
+    """
+    Revalidate a bot with the wiki, even if it is cached and fresh, joining the fetch of the bot in flight if any
 
-    # Write to cache
-    bot_cache[name] = bot_info.to_json()
-    bot_cache[name]["expiration"] = time.time() + 60 * 60
-    with open("src/data/botworld/cache.json", "w") as f:
-        json.dump(bot_cache, f)
+    Args:
+        name (str): bot name, as in its wiki URL
+        base_url (str): base URL of the wiki
+        run_blocking (function): coroutine function running blocking work off the event loop, default = a thread
+
+    Returns:
+        (Bot) bot
+    """
+    return await fetches.run(name, _fetch_bot_from_wiki, name, base_url, run_blocking)
+
+
+def revalidate(name, base_url=URL_BOTWORLD_WIKI, run_blocking=None):
+    """ Refresh a bot in the background, unless it is already being fetched """
+    if name in fetches:
+        return
+    task = asyncio.ensure_future(refresh_bot(name, base_url, run_blocking))
+    _revalidations.add(task)
+    task.add_done_callback(_on_revalidated)
+
+
+def _on_revalidated(task):
+    _revalidations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        # The expired bot keeps being served, the next lookup tries again
+        metrics_util.inc("botworld_revalidation_failures_total")
+        log.warning(f"Unable to revalidate a bot: {task.exception()!r}")
+
+
+async def _fetch_bot_from_wiki(name, base_url, run_blocking):
+    cache = get_cache()
+
+    # Cache miss, revalidate the expired bot if there is one, otherwise fetch from web
+    stale = cache.get_stale(name)
+    headers = http_util.conditional_headers(stale[2]) if stale is not None else None
+    response = await http_util.get(f"{base_url}{name}", headers=headers)
+    if response.status == 304:
+        metrics_util.inc("botworld_revalidated_total")
+        bot = stale[0]
+    elif response.status == 404:
+        raise BotNotFoundError(name)
+    else:
+        response.raise_for_status()
+        run_blocking = run_blocking or asyncio.to_thread
+        bot = await run_blocking(_parse_bot_page_measured, response.content, base_url)
+    validators = http_util.get_validators(response)
+
+    # Write to cache, the cache file is updated in the background
+    expiration = time.time() + cache.ttl
+    get_state().set("botworld", name, {**bot.to_json(), "expiration": expiration, **validators})
+    cache.put(name, bot, expiration, validators)
 
     # Return bot info
-    return bot_info
+    return bot
 
 
-def fetch_bot_from_wiki(name):
-    page = requests.get(f"{URL_BOTWORLD_WIKI}/{name}")
-    soup = BeautifulSoup(page.content, "html.parser")
-    bot_info = soup.find("div", class_="bot-infos")
+def parse_bot_page(content, base_url=URL_BOTWORLD_WIKI):
+    """
+    Parse the wiki page of a bot
+    - only the "bot-infos" section of the page is parsed, each of its parts is walked once
+
+    Args:
+        content (Union[bytes, str]): page HTML, bytes are decoded as UTF-8
+        base_url (str): base URL of the wiki, for the icon URL
+
+    Returns:
+        (Bot) parsed bot
+
+    Raises:
+        BotNotFoundError: the page is not a bot page
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    bot_info = BeautifulSoup(content, "html.parser", parse_only=_BOT_INFOS).find("div", class_="bot-infos")
+    if bot_info is None:
+        raise BotNotFoundError("not a bot page")
 
     # Bot Basics
     bot_intro = bot_info.find("div", class_="intro")
     bot_name = bot_intro.find("h1").get_text()
-    # print(f"NAME: {bot_name}")
     bot_description = bot_intro.find("p").get_text()
-    # print(f"DESC: {bot_description}")
-
-    # Bot Icon
-    bot_icon = bot_info.find("div", class_="botcard").find("div", class_="pic").find("img")["src"]
-    bot_icon = f"{URL_BOTWORLD_WIKI[:-1]}{bot_icon}"
-    # print(f"ICON SRC: {bot_icon}")
-
-    # Bot Card
-    bot_card = bot_info.find("div", class_="botcard").find("div", class_="cardinfos").find_all("td")
-    bot_class = bot_card[0].get_text().upper()
-    # print(f"TYPE: {bot_class}")
-    bot_rarity = bot_card[1].get_text().upper()
-    # print(f"RARITY: {bot_rarity}")
-    bot_acquisition = bot_card[2].get_text()
-    # print(f"ACQUISITION: {bot_acquisition}")
+
+    # Bot Icon & Card
+    bot_card = bot_info.find("div", class_="botcard")
+    bot_icon = f"{base_url[:-1]}{bot_card.find('div', class_='pic').find('img')['src']}"
+    bot_card_cells = bot_card.find("div", class_="cardinfos").find_all("td", limit=3)
+    bot_class = bot_card_cells[0].get_text().upper()
+    bot_rarity = bot_card_cells[1].get_text().upper()
+    bot_acquisition = bot_card_cells[2].get_text()
 
     # Bot Abilities
-    bot_abilities_html = bot_info.find("div", class_="abilities")
     bot_abilities = []
-    for i, bot_ability_html in enumerate(bot_abilities_html.find_all("li")):
+    for bot_ability_html in bot_info.find("div", class_="abilities").find_all("li"):
         bot_ability_name = bot_ability_html.find("h3").get_text()
-        bot_ability_description = bot_ability_html.find_all("p")[1].get_text()
-        bot_ability_attributes_text = bot_ability_html.find("code").get_text()
-
+        bot_ability_description = bot_ability_html.find_all("p", limit=2)[1].get_text()
         bot_ability_attributes = {}
-        pattern = re.compile("( , |, | ,)")
-        for ability_entry in pattern.split(bot_ability_attributes_text):
-            if pattern.match(ability_entry):
-                continue
-            try:
-                ability_data = ability_entry.strip().split(":")
+        for ability_entry in _ABILITY_SEPARATOR.split(bot_ability_html.find("code").get_text()):
+            ability_data = ability_entry.strip().split(":")
+            if len(ability_data) > 1:
                 bot_ability_attributes[ability_data[0].strip()] = ability_data[1].strip()
-            except IndexError:
+            else:
                 bot_ability_attributes[ability_entry] = "N/A"
-
         bot_abilities.append((bot_ability_name, bot_ability_description, bot_ability_attributes))
-        # print(f"ABILITY {i + 1}: {(bot_ability_name, bot_ability_description, bot_ability_attributes)}")
 
-    # Bot AI Tree
-    bot_ai_tree_html = bot_info.find("div", class_="bot_bloc_2")
+    # Bot AI Tree, empty header & body cells are layout padding
     bot_ai_tree = []
-    for bot_ai_html in bot_ai_tree_html.find_all("li"):
-        bot_ai_names_html = bot_ai_html.find("thead").find_all("th")
-        bot_ai_names = []
-        for bot_ai_name_html in bot_ai_names_html:
-            if bot_ai_name_html.get_text():
-                bot_ai_names.append(bot_ai_name_html.get_text())
-
-        bot_ai_descriptions_html = bot_ai_html.find("tbody").find_all("td")
-        bot_ai_descriptions = []
-        for bot_ai_description_html in bot_ai_descriptions_html:
-            if bot_ai_description_html.get_text():
-                bot_ai_descriptions.append(bot_ai_description_html.get_text())
-
+    for bot_ai_html in bot_info.find("div", class_="bot_bloc_2").find_all("li"):
+        bot_ai_names = [text for text in (th.get_text() for th in bot_ai_html.find("thead").find_all("th")) if text]
+        bot_ai_descriptions = [text for text in (td.get_text() for td in bot_ai_html.find("tbody").find_all("td"))
+                               if text]
         bot_ai_tree.append(list(zip(bot_ai_names, bot_ai_descriptions)))
 
-    # print(f"AI TREE:")
-    # for i, data in enumerate(bot_ai_tree):
-    #     print(f"- AI Lv.{i}: {data}")
-
-    bot_stats_html = bot_info.find("div", class_="bot_bloc_3").find("div", class_="stats").find("tbody")
+    # Bot Stats, the first cell of each row is the level
     bot_stats = {}
+    bot_stats_html = bot_info.find("div", class_="bot_bloc_3").find("div", class_="stats").find("tbody")
     for bot_stat_html in bot_stats_html.find_all("tr"):
-        bot_stat_level = None
-        bot_stat_stats = []
-        for i, bot_sub_stat_html in enumerate(bot_stat_html.find_all("td")):
-            if i == 0:
-                bot_stat_level = bot_sub_stat_html.get_text()
-                continue
-            bot_stat_stats.append(bot_sub_stat_html.get_text())
-        bot_stats[bot_stat_level] = bot_stat_stats
-
-    # print(f"STATS: {bot_stats}")
-
-    bot = Bot(bot_name, bot_description, bot_icon, bot_class, bot_rarity, bot_acquisition, bot_abilities, bot_ai_tree,
-              bot_stats)
+        cells = [td.get_text() for td in bot_stat_html.find_all("td")]
+        if cells:
+            bot_stats[cells[0]] = cells[1:]
+
+    return Bot(bot_name, bot_description, bot_icon, bot_class, bot_rarity, bot_acquisition, bot_abilities,
+               bot_ai_tree, bot_stats)
+
+
+def _parse_bot_page_measured(content, base_url):
+    with metrics_util.measure("botworld_parse_seconds"):
+        bot = parse_bot_page(content, base_url)
+    # Render the embeds off the event loop too, the first view of the bot then only sends them
+    bot.get_embeds()
     return bot
 
 
 if __name__ == "__main__":
-    response = fetch_bot("nozzle")
-    print(response)
+    # Code for benchmarking the spider against a local stand-in for the wiki, with a temporary cache
+    import os
+    import tempfile
+
+    import aiohttp
+
+    from src.data.botworld import botworld_cache
+    from src.data.botworld.wiki_stub_server import WikiStubServer
+
+    async def main(server, names):
+        # Cold: every bot is downloaded & parsed
+        start = time.perf_counter()
+        await asyncio.gather(*(fetch_bot(name, server.url) for name in names))
+        print(f"Cold fetch: {(time.perf_counter() - start) * 1000 / len(names):.2f}ms per bot")
+
+        # Expired: every bot is revalidated, only the updated one is downloaded & parsed again
+        for name in names:
+            stale = botworld_cache.cache.get_stale(name)
+            botworld_cache.cache.put(name, stale[0], time.time() - BOTWORLD_CACHE_MAX_STALE, stale[2])
+            get_state().delete("botworld", name)
+        server.update(names[0])
+        before = server.request_count()
+        start = time.perf_counter()
+        bots = await asyncio.gather(*(fetch_bot(name, server.url) for name in names))
+        print(f"Revalidation: {(time.perf_counter() - start) * 1000 / len(names):.2f}ms per bot, "
+              f"{server.request_count() - before} requests, updated HP: {bots[0].stats['1'][0]}")
+
+        # Sequential requests, through the pooled session vs a new session (and connection) per request
+        start = time.perf_counter()
+        for name in names:
+            await http_util.get(f"{server.url}{name}")
+        print(f"Pooled session: {(time.perf_counter() - start) * 1000 / len(names):.2f}ms per request")
+        start = time.perf_counter()
+        for name in names:
+            async with aiohttp.ClientSession() as new_session, new_session.get(f"{server.url}{name}") as response:
+                await response.read()
+        print(f"New session per request: {(time.perf_counter() - start) * 1000 / len(names):.2f}ms per request")
+
+        await check_single_flight(server, "single-flight", 20)
+        await check_single_flight(server, "missing", 20)
+        await http_util.close_session()
+
+    async def check_single_flight(server, name, count):
+        # Concurrent lookups of a bot that is not cached make exactly one request, and all get its result
+        server.delay = 0.2
+        before = server.request_count(name)
+        results = await asyncio.gather(*(fetch_bot(name, server.url) for _ in range(count)), return_exceptions=True)
+        server.delay = 0
+        requests = server.request_count(name) - before
+        assert requests == 1, f"{count} lookups of {name} made {requests} requests"
+        assert all(result is results[0] for result in results), f"{count} lookups of {name} got different results"
+        print(f"{count} concurrent lookups of {name}: {requests} request, {type(results[0]).__name__}")
+
+    with tempfile.TemporaryDirectory() as test_directory:
+        botworld_cache.cache = botworld_cache.BotCache(os.path.join(test_directory, "cache.json"))
+        test_server = WikiStubServer(missing=("missing",)).start()
+        asyncio.run(main(test_server, [f"bot-{i}" for i in range(50)]))
+        test_server.stop()
+        print(botworld_cache.cache.stats())
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+from src.data.botworld.botworld_objects import Bot
+from src.data.botworld.botworld_spider import BotNotFoundError, parse_bot_page
+from src.data.settings import URL_BOTWORLD_WIKI
+
+# Bot pages "<name>.html", each with the bot it must parse into "<name>.json"
+# - "synthetic-*" pages are written in the layout the parser expects, real pages are added with "--save"
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "wiki_pages")
+
+# Parsing the corpus must take at most this fraction of the full-tree reference parser, measured on the same machine
+# - the synthetic pages are mostly the bot section, the parser takes 0.93-0.95 of the reference on them
+MAX_PARSE_RATIO = 0.97
+
+
+def load_corpus(path=CORPUS_PATH):
+    """
+    Load the saved wiki pages
+
+    Args:
+        path (str): directory of the corpus
+
+    Returns:
+        (List[Tuple[str, bytes, Dict[str, Any]]]) name, page & expected bot JSON of every saved page
+    """
+    corpus = []
+    for file_name in sorted(os.listdir(path)):
+        if not file_name.endswith(".html"):
+            continue
+        name = file_name[:-len(".html")]
+        with open(os.path.join(path, file_name), "rb") as f:
+            page = f.read()
+        with open(os.path.join(path, f"{name}.json")) as f:
+            expected = json.load(f)
+        corpus.append((name, page, expected))
+    return corpus
+
+
+def parse_bot_page_full_tree(content, base_url=URL_BOTWORLD_WIKI):
+    """
+    Reference parser, parses the whole page into a tree and searches it, the way the spider used to
+
+    Args:
+        content (bytes): page HTML
+        base_url (str): base URL of the wiki, for the icon URL
+
+    Returns:
+        (Bot) parsed bot
+    """
+    bot_info = BeautifulSoup(content, "html.parser").find("div", class_="bot-infos")
+    if bot_info is None:
+        raise BotNotFoundError("not a bot page")
+
+    bot_intro = bot_info.find("div", class_="intro")
+    bot_icon = bot_info.find("div", class_="botcard").find("div", class_="pic").find("img")["src"]
+    bot_card = bot_info.find("div", class_="botcard").find("div", class_="cardinfos").find_all("td")
+
+    bot_abilities = []
+    for bot_ability_html in bot_info.find("div", class_="abilities").find_all("li"):
+        bot_ability_attributes = {}
+        pattern = re.compile("( , |, | ,)")
+        for ability_entry in pattern.split(bot_ability_html.find("code").get_text()):
+            if pattern.match(ability_entry):
+                continue
+            try:
+                ability_data = ability_entry.strip().split(":")
+                bot_ability_attributes[ability_data[0].strip()] = ability_data[1].strip()
+            except IndexError:
+                bot_ability_attributes[ability_entry] = "N/A"
+        bot_abilities.append((bot_ability_html.find("h3").get_text(), bot_ability_html.find_all("p")[1].get_text(),
+                              bot_ability_attributes))
+
+    bot_ai_tree = []
+    for bot_ai_html in bot_info.find("div", class_="bot_bloc_2").find_all("li"):
+        bot_ai_names = [th.get_text() for th in bot_ai_html.find("thead").find_all("th") if th.get_text()]
+        bot_ai_descriptions = [td.get_text() for td in bot_ai_html.find("tbody").find_all("td") if td.get_text()]
+        bot_ai_tree.append(list(zip(bot_ai_names, bot_ai_descriptions)))
+
+    bot_stats = {}
+    for bot_stat_html in bot_info.find("div", class_="bot_bloc_3").find("div", class_="stats").find("tbody").find_all("tr"):
+        cells = [td.get_text() for td in bot_stat_html.find_all("td")]
+        bot_stats[cells[0] if cells else None] = cells[1:]
+
+    return Bot(bot_intro.find("h1").get_text(), bot_intro.find("p").get_text(), f"{base_url[:-1]}{bot_icon}",
+               bot_card[0].get_text().upper(), bot_card[1].get_text().upper(), bot_card[2].get_text(), bot_abilities,
+               bot_ai_tree, bot_stats)
+
+
+def time_per_call(funcs, *args, repeat=50):
+    """
+    Time functions on the same arguments, taking turns so a busy machine slows them all alike
+
+    Args:
+        funcs (List[function]): functions to time
+        *args: arguments for every function
+        repeat (int): calls of each function
+
+    Returns:
+        (List[float]) best time of one call of each function, in seconds
+    """
+    best = [float("inf")] * len(funcs)
+    for _ in range(repeat):
+        for i, func in enumerate(funcs):
+            start = time.perf_counter()
+            func(*args)
+            best[i] = min(best[i], time.perf_counter() - start)
+    return best
+
+
+def run(corpus, repeat=50):
+    """
+    Parse every page of the corpus, check the parsed bots and time the parser against the full-tree reference parser
+
+    Args:
+        corpus (List[Tuple[str, bytes, Dict[str, Any]]]): corpus, see load_corpus
+        repeat (int): timed parses per page
+
+    Returns:
+        (List[str]) regressions, empty if none
+    """
+    regressions = []
+    total_parse = total_reference = 0
+    print(f"{'Page':20s} {'Size':>8s} {'Parse':>9s} {'Reference':>10s} {'Ratio':>6s}")
+    for name, page, expected in corpus:
+        if parse_bot_page(page, URL_BOTWORLD_WIKI).to_json() != expected:
+            regressions.append(f"{name}: parsed bot differs from {name}.json")
+        parse_seconds, reference_seconds = time_per_call([parse_bot_page, parse_bot_page_full_tree], page,
+                                                         URL_BOTWORLD_WIKI, repeat=repeat)
+        total_parse += parse_seconds
+        total_reference += reference_seconds
+        print(f"{name:20s} {len(page):8d} {parse_seconds * 1000:7.2f}ms {reference_seconds * 1000:8.2f}ms "
+              f"{parse_seconds / reference_seconds:6.2f}")
+
+    # Single pages are too noisy to gate on, the whole corpus is not
+    ratio = total_parse / total_reference
+    print(f"{'Total':20s} {'':8s} {total_parse * 1000:7.2f}ms {total_reference * 1000:8.2f}ms {ratio:6.2f}")
+    if ratio > MAX_PARSE_RATIO:
+        regressions.append(f"parsing the corpus took {ratio:.2f} of the reference parser, at most {MAX_PARSE_RATIO}")
+    return regressions
+
+
+async def save_pages(names, base_url=URL_BOTWORLD_WIKI, path=CORPUS_PATH):
+    """
+    Save the current wiki pages of bots into the corpus, with the bots the reference parser reads from them
+    - check the saved JSON by hand, it becomes the expected result of the parser
+
+    Args:
+        names (List[str]): bot names, as in their wiki URLs
+        base_url (str): base URL of the wiki
+        path (str): directory of the corpus
+    """
+    from src.utils import http_util
+
+    for name in names:
+        response = await http_util.get(f"{base_url}{name}")
+        response.raise_for_status()
+        with open(os.path.join(path, f"{name}.html"), "wb") as f:
+            f.write(response.content)
+        with open(os.path.join(path, f"{name}.json"), "w") as f:
+            json.dump(parse_bot_page_full_tree(response.content, base_url).to_json(), f, indent=2)
+        print(f"Saved {name}")
+    await http_util.close_session()
+
+
+if __name__ == "__main__":
+    # Benchmark:            python -m src.data.botworld.parser_benchmark
+    # Save pages of bots:   python -m src.data.botworld.parser_benchmark --save nozzle chainer ...
+    if sys.argv[1:2] == ["--save"]:
+        asyncio.run(save_pages(sys.argv[2:]))
+        sys.exit()
+
+    found = run(load_corpus())
+    for regression in found:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if found else 0)
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Bot pages for the stand-in, used when no saved page exists
+TEMPLATE = """<html><body><div class="bot-infos">
+<div class="intro"><h1>{title}</h1><p>{title} is a stand-in bot for testing.</p></div>
+<div class="botcard">
+<div class="pic"><img src="/images/bots/{name}.png"/></div>
+<div class="cardinfos"><table><tr><td>Sniper</td><td>Rare</td><td>Found in {title} crates</td></tr></table></div>
+</div>
+<div class="abilities"><ul>
+<li><h3>Long Shot</h3><p>Passive</p><p>Fires a shot across the map.</p><code>Damage: 120 , Range: 9, Cooldown</code></li>
+<li><h3>Overcharge</h3><p>Active</p><p>Doubles the damage of the next shot.</p><code>Duration: 4s, Bonus: 100%</code></li>
+</ul></div>
+<div class="bot_bloc_2"><ul>
+<li><table><thead><tr><th>A</th><th>B</th><th></th></tr></thead>
+<tbody><tr><td>Targets the weakest bot</td><td>Targets the closest bot</td><td></td></tr></tbody></table></li>
+<li><table><thead><tr><th>A</th><th>B</th></tr></thead>
+<tbody><tr><td>Retreats when hit</td><td>Holds position</td></tr></tbody></table></li>
+</ul></div>
+<div class="bot_bloc_3"><div class="stats"><table>
+<thead><tr><th>Level</th><th>HP</th><th>ATK</th><th>DPS</th><th>SPD</th></tr></thead>
+<tbody>{stats}</tbody>
+</table></div></div>
+</div></body></html>"""
+
+
+class WikiStubServer:
+    """
+    Local stand-in for the botworld wiki, so the spider can be tested & benchmarked without hitting the real site
+    - serves "<name>.html" from a directory of saved wiki pages, or a generated page in the wiki's layout
+    - answers conditional GETs with 304 Not Modified, like the wiki's CDN
+    - counts the requests it served, per bot
+    """
+
+    def __init__(self, pages_directory=None, delay=0, missing=()):
+        """
+        Args:
+            pages_directory (str): directory of saved wiki pages, named "<name>.html"
+            delay (float): seconds to wait before answering, to mimic the wiki's latency
+            missing (Tuple[str]): bot names answered with 404
+        """
+        self.pages_directory = pages_directory
+        self.delay = delay
+        self.missing = set(missing)
+        # Page versions { name => version }, bump one with "update" to change its page
+        self.versions = {}
+        # Served requests { name => count }
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """ Base URL of the stand-in, to use in place of settings.URL_BOTWORLD_WIKI """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def update(self, name):
+        """ Change the page of a bot, so its ETag no longer matches """
+        with self._lock:
+            self.versions[name] = self.versions.get(name, 0) + 1
+
+    def request_count(self, name=None):
+        """
+        Args:
+            name (str): bot name, default = all bots
+
+        Returns:
+            (int) number of requests served
+        """
+        with self._lock:
+            return self.requests.get(name, 0) if name is not None else sum(self.requests.values())
+
+    def page(self, name):
+        """
+        Args:
+            name (str): bot name
+
+        Returns:
+            (bytes) page of the bot
+        """
+        if self.pages_directory is not None:
+            path = os.path.join(self.pages_directory, f"{name}.html")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read()
+        version = self.versions.get(name, 0)
+        stats = "".join(f"<tr><td>{level}</td><td>{1000 + level * 100 + version}</td><td>{50 + level * 5}</td>"
+                        f"<td>{25 + level * 2}</td><td>3</td></tr>" for level in range(1, 11))
+        return TEMPLATE.format(name=name, title=name.replace("-", " ").title(), stats=stats).encode()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers & body are written separately, don't let kept-alive connections wait on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                name = self.path.strip("/").lower()
+                with stub._lock:
+                    stub.requests[name] = stub.requests.get(name, 0) + 1
+                    version = stub.versions.get(name, 0)
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if name in stub.missing:
+                    self._respond(404, b"Not Found")
+                    return
+
+                page = stub.page(name)
+                etag = f'"{hashlib.md5(page).hexdigest()}"'
+                last_modified = formatdate(1600000000 + version, usegmt=True)
+                headers = {"ETag": etag, "Last-Modified": last_modified}
+                if self.headers.get("If-None-Match") == etag:
+                    self._respond(304, b"", headers)
+                    return
+                self._respond(200, page, {**headers, "Content-Type": "text/html; charset=utf-8"})
+
+            def _respond(self, status, body, headers=None):
+                self.send_response(status)
+                for header, value in (headers or {}).items():
+                    self.send_header(header, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    # Serve the stand-in until interrupted, e.g. to point a development bot at it
+    server = WikiStubServer().start()
+    print(f"Serving stand-in wiki at {server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
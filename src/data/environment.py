@@ -6,3 +6,8 @@ DATABASE_URL = os.getenv("db_url")
 DATABASE_USERNAME = os.getenv("db_username")
 DATABASE_PASSWORD = os.getenv("db_password")
 DATABASE_NAME = os.getenv("db_name")
+
+# Backend of the async database layer, one of {"mysql", "sqlite"}
+DATABASE_BACKEND = os.getenv("db_backend", "mysql")
+# Database file used by the SQLite backend
+DATABASE_SQLITE_PATH = os.getenv("db_sqlite_path", ":memory:")
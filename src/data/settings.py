@@ -7,17 +7,90 @@ SEP = ", "
 VERBOSE_LEVEL = 0
 STDERR_LEVEL = 5
 
+# Users that can use admin commands
+ADMIN_USERS = {
+    233735408737976320,
+}
+
 ############################
 # SCHEDULER CONFIGURATIONS #
 ############################
 # Note: All units in this section are in seconds
-# How often will the scheduler loop run? (default: 10)
-SCHEDULER_LOOP_INTERVAL = 10
-
 # How often will the scheduler ping the database? (default: 60)
-# - This will also dictate how many "rows" to retrieve in each ping
+# - Picks up messages scheduled by other instances, messages scheduled through the bot are picked up right away
 SCHEDULER_DATABASE_INTERVAL = 60
 
+# How far ahead does each ping load scheduled messages into memory? (default: 120)
+# - Must be at least SCHEDULER_DATABASE_INTERVAL, so no message falls between two pings
+SCHEDULER_LOOKAHEAD = 120
+
+# How many scheduled messages can be delivered at the same time? (default: 5)
+SCHEDULER_MAX_CONCURRENCY = 5
+
+# How long overdue can a scheduled message be before it is deleted undelivered? (default: 86400)
+# - No worker could see its channel for that long, e.g. the channel was deleted or the bot left the guild
+SCHEDULER_MESSAGE_EXPIRY = 86400
+
+##########################
+# METRICS CONFIGURATIONS #
+##########################
+# How many recent samples each latency histogram keeps for percentiles (default: 1024)
+METRICS_HISTOGRAM_WINDOW = 1024
+
+# How often is the event loop lag measured, in seconds (default: 0.5)
+METRICS_LOOP_LAG_INTERVAL = 0.5
+
+# Where and how often (in seconds) are metrics written in the Prometheus text format (default: 15)
+METRICS_PROMETHEUS_PATH = "metrics.prom"
+METRICS_PROMETHEUS_INTERVAL = 15
+
+###########################
+# OUTBOUND CONFIGURATIONS #
+###########################
+# Maximum number of Discord REST calls in flight at the same time (default: 10)
+OUTBOUND_MAX_CONCURRENCY = 10
+
+# How many times is a call retried after Discord answers with 429 Too Many Requests (default: 3)
+OUTBOUND_MAX_RETRIES = 3
+
+# Maximum length of a Discord message, queued plain text sends to a channel are merged up to this length
+OUTBOUND_MAX_MESSAGE_LENGTH = 2000
+
+#############################
+# RATE LIMIT CONFIGURATIONS #
+#############################
+# Token buckets are formatted as (capacity, tokens refilled per second), each command use costs one token
+# Bucket of each user for each command (default: 5 uses, then one every 2 seconds)
+RATE_LIMIT_USER = (5, 0.5)
+# Bucket of each guild for each command (default: 30 uses, then three every second)
+RATE_LIMIT_GUILD = (30, 3)
+
+# Per-command overrides { command => bucket }
+RATE_LIMIT_USER_COMMANDS = {
+    "mine": (3, 0.2),
+    "bot": (3, 0.2),
+}
+RATE_LIMIT_GUILD_COMMANDS = {
+    "mine": (10, 1),
+    "bot": (10, 1),
+}
+
+# Per-guild overrides of the guild buckets { guild id => { command => bucket } }
+RATE_LIMIT_GUILD_OVERRIDES = {}
+
+###########################
+# SHARDING CONFIGURATIONS #
+###########################
+# Sharded mode is opt-in, start the bot with "python src/launcher.py" instead of "python src/app.py"
+# Total number of gateway shards (default: 2)
+SHARD_COUNT = 2
+
+# Number of worker processes, shards are split into contiguous ranges across them (default: 2)
+SHARD_WORKERS = 2
+
+# Local address of the shared state server, port 0 picks a free port
+SHARED_STATE_ADDRESS = ("127.0.0.1", 0)
+
 ##########################
 # CHANNEL CONFIGURATIONS #
 ##########################
@@ -35,8 +108,119 @@ ENABLED_CHANNELS = {
     973242909619019817,  # Void >> bot-spam
 }
 
+##########################
+# GENSHIN CONFIGURATIONS #
+##########################
+# How long the cached mining timestamps are served before re-reading the table, in seconds (default: 60)
+# - writes through "~mine" update the cache right away, this only catches writes made by other instances
+GENSHIN_MINE_CACHE_TTL = 60
+
 ###########################
 # BOTWORLD CONFIGURATIONS #
 ###########################
 # Base URL for BotWorld wiki
 URL_BOTWORLD_WIKI = "https://www.botworld.wiki/"
+
+# How long a fetched bot is cached before it is fetched from the wiki again, in seconds (default: 3600)
+BOTWORLD_CACHE_TTL = 60 * 60
+
+# Maximum number of bots cached in memory, the least recently used ones are evicted (default: 256)
+BOTWORLD_CACHE_SIZE = 256
+
+# How long newly cached bots wait before they are written to the cache file together, in seconds (default: 30)
+BOTWORLD_CACHE_PERSIST_DELAY = 30
+
+# How long an expired bot is still served while it is revalidated in the background, in seconds (default: 86400)
+# - past that, the lookup waits for the wiki
+BOTWORLD_CACHE_MAX_STALE = 24 * 60 * 60
+
+# Whether to crawl every bot of the bot list in the background, so lookups rarely wait for the wiki (default: True)
+BOTWORLD_CRAWLER_ENABLED = True
+
+# Maximum number of wiki requests the crawler makes at the same time (default: 2)
+BOTWORLD_CRAWLER_CONCURRENCY = 2
+
+# How long the crawler waits after each request before making the next one, to go easy on the wiki (default: 1)
+BOTWORLD_CRAWLER_DELAY = 1
+
+# Seconds between crawls, each crawl refreshes the bots that are missing or expire before the next one (default: 300)
+BOTWORLD_CRAWLER_INTERVAL = 5 * 60
+
+###########################
+# DATABASE CONFIGURATIONS #
+###########################
+# Maximum number of connections in each database pool, all of them are opened at startup (default: 5)
+DATABASE_POOL_SIZE = 5
+
+# How long to wait for a free pooled connection before giving up, in seconds (default: 10)
+DATABASE_POOL_TIMEOUT = 10
+
+# Connections older than this are reopened when checked out, in seconds (default: 3600)
+# - keep it below the server's "wait_timeout", which drops idle connections (8 hours by default)
+DATABASE_POOL_RECYCLE = 3600
+
+# Connections idle for longer than this are pinged when checked out, in seconds (default: 30)
+DATABASE_POOL_PING_INTERVAL = 30
+
+# Maximum number of prepared statements kept open on each connection, least recently used ones are closed (default: 32)
+DATABASE_STATEMENT_CACHE_SIZE = 32
+
+# Maximum number of rows in one multi-row statement of the bulk methods, e.g. "insert_many" (default: 200)
+# - SQLite builds before 3.32 allow at most 999 placeholders per statement, keep rows * columns below that
+DATABASE_BATCH_SIZE = 200
+
+# Number of rows fetched from the server at a time by the streaming query methods, e.g. "stream" (default: 500)
+DATABASE_FETCH_SIZE = 500
+
+# Isolation level of transactions that don't specify one, None keeps the server default (default: None)
+# - one of "READ UNCOMMITTED", "READ COMMITTED", "REPEATABLE READ", "SERIALIZABLE"
+DATABASE_ISOLATION_LEVEL = None
+
+# Statements slower than this are logged as slow queries, in seconds (default: 0.5)
+DATABASE_SLOW_QUERY_SECONDS = 0.5
+
+# Whether to run EXPLAIN on slow SELECT/UPDATE/DELETE statements and log the plan with them (default: False)
+# - costs one more round trip per slow query, turn on while investigating
+DATABASE_SLOW_QUERY_EXPLAIN = False
+
+# How many recent slow queries "~dbstats" shows (default: 20)
+DATABASE_SLOW_QUERY_LOG_SIZE = 20
+
+# Whether writes such as "~mine update" go to a local journal first and reach the database in the background
+# - the command answers as soon as the write is in the journal, instead of waiting for the database commit
+DATABASE_WRITE_BEHIND = False
+
+# Path of the local SQLite journal of the write-behind mode
+DATABASE_JOURNAL_PATH = "journal.db"
+
+# How long the journal waits for more writes before flushing them together, in seconds (default: 0.2)
+DATABASE_JOURNAL_FLUSH_DELAY = 0.2
+
+# Maximum number of journaled writes flushed in one database transaction (default: 100)
+DATABASE_JOURNAL_BATCH_SIZE = 100
+
+# Longest wait between retries of a failed flush, in seconds (default: 60)
+# - the wait starts at 1 second and doubles after each failure
+DATABASE_JOURNAL_MAX_RETRY_DELAY = 60
+
+#######################
+# HTTP CONFIGURATIONS #
+#######################
+# Maximum time for a whole HTTP request, including connecting & reading the body, in seconds (default: 10)
+HTTP_TIMEOUT = 10
+
+# Maximum number of pooled connections kept open per host (default: 8)
+HTTP_MAX_CONNECTIONS_PER_HOST = 8
+
+# Maximum number of HTTP requests in flight at the same time, extra requests wait in line (default: 16)
+HTTP_MAX_CONCURRENCY = 16
+
+###########################
+# EXECUTOR CONFIGURATIONS #
+###########################
+# How many threads run blocking command work such as database I/O and web scraping (default: 8)
+EXECUTOR_MAX_WORKERS = 8
+
+# How many blocking calls of the same command can run at the same time (default: 2)
+# - Extra calls wait in a queue, so one slow command can't take over the whole thread pool
+EXECUTOR_COMMAND_CONCURRENCY = 2
@@ -0,0 +1 @@
+CREATE INDEX idx_scheduled_messages_timestamp ON scheduled_messages (timestamp)
\ No newline at end of file
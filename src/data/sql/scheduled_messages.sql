@@ -3,5 +3,6 @@ CREATE TABLE scheduled_messages
     id        INT          NOT NULL PRIMARY KEY AUTO_INCREMENT,
     channel   BIGINT       NOT NULL,
     message   VARCHAR(500) NOT NULL,
-    timestamp BIGINT       NOT NULL
+    timestamp BIGINT       NOT NULL,
+    INDEX idx_scheduled_messages_timestamp (timestamp)
 )
\ No newline at end of file
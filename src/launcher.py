@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import secrets
+import sys
+import time
+
+# Stabilize imports
+current_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(current_dir, ".."))  # two directories above
+
+import src.utils.log_util as log
+from src.data.environment import DISCORD_TOKEN
+from src.data.settings import SHARD_COUNT, SHARD_WORKERS, SHARED_STATE_ADDRESS
+from src.utils import shared_state
+
+
+def split_shards(shard_count, worker_count):
+    """
+    Split shard IDs into contiguous ranges, one per worker
+
+    Args:
+        shard_count (int): total number of shards
+        worker_count (int): number of workers
+
+    Returns:
+        (List[List[int]]) shard IDs of each worker, workers without shards are left out
+    """
+    size, remainder = divmod(shard_count, worker_count)
+    ranges = []
+    start = 0
+    for worker in range(worker_count):
+        end = start + size + (1 if worker < remainder else 0)
+        if end > start:
+            ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def run_worker(worker_id, shard_ids, shard_count, address, authkey):
+    """ Entry point of a worker process, runs the given shards against the launcher's shared state """
+    # Imported here, so the launcher process itself never loads the commands
+    started_at = time.time()
+    from src.app import create_bot
+    from src.bot import ShardedBotClient
+
+    shared_state.set_state(shared_state.SocketSharedState(address, authkey))
+    log.info(f"Worker {worker_id} is starting shards {shard_ids} of {shard_count}...")
+    bot = create_bot(ShardedBotClient, shard_ids=shard_ids, shard_count=shard_count,
+                     metrics_path=f"metrics.worker{worker_id}.prom", started_at=started_at)
+    bot.run(DISCORD_TOKEN)
+
+
+def main(shard_count=SHARD_COUNT, worker_count=SHARD_WORKERS):
+    authkey = secrets.token_bytes(32)
+    manager = shared_state.start_server(SHARED_STATE_ADDRESS, authkey)
+
+    workers = []
+    for worker_id, shard_ids in enumerate(split_shards(shard_count, worker_count)):
+        worker = multiprocessing.Process(target=run_worker, name=f"worker{worker_id}",
+                                         args=(worker_id, shard_ids, shard_count, manager.address, authkey))
+        worker.start()
+        workers.append(worker)
+
+    try:
+        for worker in workers:
+            worker.join()
+            log.warning(f"Worker {worker.name} exited with code {worker.exitcode}!")
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    print("Hello (sharded) world!")
+    main()
@@ -0,0 +1,800 @@
+import asyncio
+import contextlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import src.utils.log_util as log
+from src.data.environment import *
+from src.data.settings import DATABASE_POOL_SIZE, DATABASE_BATCH_SIZE, DATABASE_ISOLATION_LEVEL, \
+    DATABASE_FETCH_SIZE, DATABASE_POOL_TIMEOUT, DATABASE_POOL_RECYCLE, DATABASE_POOL_PING_INTERVAL, \
+    DATABASE_SLOW_QUERY_EXPLAIN
+from src.utils import metrics_util, sql_builder, sql_stats_util
+from src.utils.sql_builder import SQLError, batches, check_isolation_level, build_insert_sql, build_update_sql, \
+    build_upsert_sql, build_delete_sql, build_explain_sql
+
+# Optional dependency, only required by the MySQL backend
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+backend = None
+_backend_lock = asyncio.Lock()
+# Statements holding or waiting for a connection of the shared pool
+_in_use = 0
+_waiters = 0
+
+
+class AsyncBackend:
+    """ Database backend interface, each backend provides a non-blocking connection pool """
+
+    # SQL dialect of this backend, one of {sql_builder.MYSQL, sql_builder.SQLITE}
+    dialect = None
+
+    async def acquire(self):
+        """
+        Get a connection from the pool, waits in line if the pool is exhausted
+
+        Returns:
+            (Any) backend-specific connection
+        """
+        raise NotImplementedError
+
+    async def release(self, connection):
+        """ Return a connection to the pool """
+        raise NotImplementedError
+
+    async def execute(self, connection, sql, data=None):
+        """
+        Execute a statement
+
+        Args:
+            connection (Any): connection from "acquire"
+            sql (str): SQL statement with "%s" placeholders
+            data (Tuple[Any]): statement data (corresponds to the placeholders)
+
+        Returns:
+            (int) affected row count
+        """
+        raise NotImplementedError
+
+    async def query(self, connection, sql, data=None):
+        """
+        Execute a query and fetch its result set
+
+        Args:
+            connection (Any): connection from "acquire"
+            sql (str): SQL query with "%s" placeholders
+            data (Tuple[Any]): query data (corresponds to the placeholders)
+
+        Returns:
+            (List[Tuple]) result rows
+        """
+        raise NotImplementedError
+
+    async def stream(self, connection, sql, data=None, fetch_size=DATABASE_FETCH_SIZE):
+        """
+        Execute a query and fetch its result set in chunks, without buffering all of it
+
+        Args:
+            connection (Any): connection from "acquire"
+            sql (str): SQL query with "%s" placeholders
+            data (Tuple[Any]): query data (corresponds to the placeholders)
+            fetch_size (int): number of rows fetched at a time
+
+        Returns:
+            (AsyncIterator[List[Tuple]]) chunks of result rows
+        """
+        raise NotImplementedError
+        # Makes this an async generator, like its implementations
+        yield
+
+    async def executemany(self, connection, sql, rows):
+        """
+        Execute a statement once for every row of data
+
+        Args:
+            connection (Any): connection from "acquire"
+            sql (str): SQL statement with "%s" placeholders
+            rows (Sequence[Tuple[Any]]): statement data of every execution
+
+        Returns:
+            (int) affected row count
+        """
+        raise NotImplementedError
+
+    async def begin(self, connection, isolation_level=None):
+        """
+        Start a transaction, ending the transaction left open by earlier uncommitted statements
+
+        Args:
+            connection (Any): connection from "acquire"
+            isolation_level (str): isolation level of the transaction, None for the server default
+        """
+        raise NotImplementedError
+
+    async def commit(self, connection):
+        raise NotImplementedError
+
+    async def rollback(self, connection):
+        raise NotImplementedError
+
+    async def close(self):
+        """ Close all connections of this backend """
+        raise NotImplementedError
+
+
+class MySQLBackend(AsyncBackend):
+    """ MySQL backend on top of an aiomysql connection pool """
+
+    dialect = sql_builder.MYSQL
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @staticmethod
+    async def create(size=DATABASE_POOL_SIZE):
+        if aiomysql is None:
+            raise ImportError("The MySQL backend requires the \"aiomysql\" package!")
+        pool = await aiomysql.create_pool(
+            host=DATABASE_URL,
+            user=DATABASE_USERNAME,
+            password=DATABASE_PASSWORD,
+            db=DATABASE_NAME,
+            # Open every connection up front, so the first statements don't wait for a handshake
+            minsize=size,
+            maxsize=size,
+            pool_recycle=DATABASE_POOL_RECYCLE
+        )
+        log.info(f"Async MySQL connection pool is established with {size} connections!")
+        return MySQLBackend(pool)
+
+    async def acquire(self):
+        connection = await self.pool.acquire()
+        if asyncio.get_running_loop().time() - connection.last_usage > DATABASE_POOL_PING_INTERVAL:
+            # Reconnects if the server dropped the idle connection
+            try:
+                await connection.ping()
+            except Exception:
+                await self.pool.release(connection)
+                raise
+        return connection
+
+    async def release(self, connection):
+        await self.pool.release(connection)
+
+    async def execute(self, connection, sql, data=None):
+        async with connection.cursor() as cursor:
+            await cursor.execute(sql, data)
+            return cursor.rowcount
+
+    async def stream(self, connection, sql, data=None, fetch_size=DATABASE_FETCH_SIZE):
+        # Server-side cursor, closing it reads off whatever is left of the result set
+        async with connection.cursor(aiomysql.SSCursor) as cursor:
+            await cursor.execute(sql, data)
+            while rows := await cursor.fetchmany(fetch_size):
+                yield rows
+
+    async def executemany(self, connection, sql, rows):
+        async with connection.cursor() as cursor:
+            await cursor.executemany(sql, rows)
+            return cursor.rowcount
+
+    async def query(self, connection, sql, data=None):
+        async with connection.cursor() as cursor:
+            await cursor.execute(sql, data)
+            return list(await cursor.fetchall())
+
+    async def begin(self, connection, isolation_level=None):
+        if connection.get_transaction_status():
+            await connection.commit()
+        if isolation_level:
+            # Only applies to the next transaction
+            await self.execute(connection, f"SET TRANSACTION ISOLATION LEVEL {isolation_level}")
+        await connection.begin()
+
+    async def commit(self, connection):
+        await connection.commit()
+
+    async def rollback(self, connection):
+        await connection.rollback()
+
+    async def close(self):
+        self.pool.close()
+        await self.pool.wait_closed()
+
+
+class SQLiteBackend(AsyncBackend):
+    """
+    In-process SQLite backend, used for testing and benchmarking without a MySQL server
+    - all statements run on one dedicated thread, so the event loop never blocks
+    - SQLite serializes writers anyway, so the "pool" is a single connection handed out one chain at a time
+    """
+
+    dialect = sql_builder.SQLITE
+
+    def __init__(self, path=DATABASE_SQLITE_PATH):
+        self.path = path
+        self._connection = None
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    async def create(path=DATABASE_SQLITE_PATH):
+        sqlite_backend = SQLiteBackend(path)
+        await sqlite_backend._run(sqlite_backend._connect)
+        log.info(f"SQLite backend is established at \"{path}\"!")
+        return sqlite_backend
+
+    def _connect(self):
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, func, *args)
+
+    @staticmethod
+    def _translate(sql):
+        # MySQL-style "%s" placeholders to SQLite-style "?" placeholders
+        return sql.replace("%s", "?")
+
+    async def acquire(self):
+        await self._lock.acquire()
+        return self._connection
+
+    async def release(self, connection):
+        self._lock.release()
+
+    async def execute(self, connection, sql, data=None):
+        def run():
+            return connection.execute(self._translate(sql), data or ()).rowcount
+
+        return await self._run(run)
+
+    async def stream(self, connection, sql, data=None, fetch_size=DATABASE_FETCH_SIZE):
+        cursor = await self._run(connection.execute, self._translate(sql), data or ())
+        try:
+            while rows := await self._run(cursor.fetchmany, fetch_size):
+                yield rows
+        finally:
+            await self._run(cursor.close)
+
+    async def executemany(self, connection, sql, rows):
+        def run():
+            return connection.executemany(self._translate(sql), rows).rowcount
+
+        return await self._run(run)
+
+    async def query(self, connection, sql, data=None):
+        def run():
+            return connection.execute(self._translate(sql), data or ()).fetchall()
+
+        return await self._run(run)
+
+    async def begin(self, connection, isolation_level=None):
+        # SQLite transactions are always serializable, so the isolation level has nothing to change
+        def run():
+            if connection.in_transaction:
+                connection.commit()
+            connection.execute("BEGIN")
+
+        await self._run(run)
+
+    async def commit(self, connection):
+        await self._run(connection.commit)
+
+    async def rollback(self, connection):
+        await self._run(connection.rollback)
+
+    async def close(self):
+        await self._run(self._connection.close)
+        self._thread.shutdown(wait=False)
+
+
+async def create_backend(name=DATABASE_BACKEND):
+    """
+    Create a database backend by name
+
+    Args:
+        name (str): backend name, one of {"mysql", "sqlite"}
+
+    Returns:
+        (AsyncBackend) backend with an established connection pool
+    """
+    if name == "mysql":
+        return await MySQLBackend.create()
+    if name == "sqlite":
+        return await SQLiteBackend.create()
+    raise ValueError(f"Unknown database backend \"{name}\"!")
+
+
+async def get_backend():
+    """
+    Get the shared database backend, created on first use
+
+    Returns:
+        (AsyncBackend) shared backend
+    """
+    global backend
+    if backend is not None:
+        return backend
+    async with _backend_lock:
+        if backend is None:
+            backend = await create_backend()
+    return backend
+
+
+def set_backend(new_backend):
+    """
+    Replace the shared database backend, e.g. with a SQLite backend for testing
+
+    Args:
+        new_backend (AsyncBackend): backend to use from now on
+    """
+    global backend
+    backend = new_backend
+
+
+async def warm_up():
+    """ Create the shared backend in the background at startup, so the first command doesn't open the pool """
+    try:
+        await get_backend()
+    except Exception as e:
+        log.error(f"Unable to establish the database backend: {e}")
+
+
+def _update_gauges():
+    metrics_util.set_gauge("db_pool_in_use", _in_use, pool="async")
+    metrics_util.set_gauge("db_pool_waiters", _waiters, pool="async")
+
+
+class AsyncChainedStatement:
+    """ Async counterpart of ChainedStatement, executes multiple SQL statements in order without blocking """
+
+    def __init__(self, statement_backend=None):
+        """
+        Args:
+            statement_backend (AsyncBackend): backend to use, default = the shared backend
+        """
+        # To ensure connection is released properly, use "async with" statements
+        self._enabled = False
+        self.backend = statement_backend
+        # Number of open "transaction" blocks, statements are not committed on their own while any is open
+        self._transaction_depth = 0
+        # Whether statements run with commit=False are waiting for a commit, outside of any transaction block
+        self._uncommitted = False
+
+    async def __aenter__(self):
+        global _in_use, _waiters
+        if self.backend is None:
+            self.backend = await get_backend()
+
+        # Waits in line if the pool is busy
+        start = time.perf_counter()
+        _waiters += 1
+        _update_gauges()
+        try:
+            self._connection = await asyncio.wait_for(self.backend.acquire(), DATABASE_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            metrics_util.inc("db_pool_timeouts_total", pool="async")
+            raise ConnectionError(f"No pooled connection was freed up within {DATABASE_POOL_TIMEOUT}s!")
+        finally:
+            _waiters -= 1
+            metrics_util.observe("db_pool_acquire_seconds", time.perf_counter() - start, pool="async")
+        _in_use += 1
+        _update_gauges()
+        self._enabled = True
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        global _in_use
+        self._enabled = False
+        await self.backend.release(self._connection)
+        _in_use -= 1
+        _update_gauges()
+
+    def _check_enabled(self):
+        if self._enabled:
+            return
+        raise ConnectionError("Connection is not enabled! Are you using an \"async with\" statement?")
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, isolation_level=DATABASE_ISOLATION_LEVEL):
+        """
+        Run the statements of the "async with" block in one transaction, committed once when the block exits
+        - rolled back instead if the block raises an exception
+        - nested blocks become savepoints, only their own statements are rolled back on an exception
+
+        Args:
+            isolation_level (str): isolation level of the transaction, only for the outermost block
+
+        Returns:
+            (AsyncChainedStatement) this statement
+        """
+        self._check_enabled()
+        isolation_level = check_isolation_level(isolation_level)
+        if self._transaction_depth:
+            savepoint = f"chain_savepoint_{self._transaction_depth}"
+            await self.backend.execute(self._connection, f"SAVEPOINT {savepoint}")
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                await self.backend.execute(self._connection, f"ROLLBACK TO SAVEPOINT {savepoint}")
+                raise
+            else:
+                await self.backend.execute(self._connection, f"RELEASE SAVEPOINT {savepoint}")
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self._check_uncommitted()
+        await self.backend.begin(self._connection, isolation_level)
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            await self.backend.rollback(self._connection)
+            raise
+        else:
+            await self._commit_now()
+        finally:
+            self._transaction_depth -= 1
+
+    # Specialized SQL methods
+    async def insert(self, table, columns, values):
+        """
+        Insert data into table
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple (if empty, default to all columns)
+            values (Tuple[Any]): values to insert, must correspond to "columns"
+
+        Returns:
+            (int) affected row count
+        """
+        return await self.execute(build_insert_sql(table, tuple(columns), len(values)), data=values)
+
+    async def upsert(self, table, columns, values, keys):
+        """
+        Insert data into table, or update the existing row if a unique key already exists
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple
+            values (Tuple[Any]): values to insert, must correspond to "columns"
+            keys (Tuple[str]): unique key columns, the other columns are updated on conflict
+
+        Returns:
+            (int) affected row count (MySQL counts an updated row twice)
+        """
+        return await self.execute(build_upsert_sql(self.backend.dialect, table, tuple(columns), tuple(keys)), data=values)
+
+    async def update(self, table, columns, values, where, where_data=None):
+        """
+        Update certain parts of the table with new data
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple
+            values (Tuple[Any]): values to update, must correspond to "columns"
+            where (str): where to update, use "%s" placeholders for values to keep the statement reusable
+            where_data (Tuple[Any]): values of the "%s" placeholders in "where"
+
+        Returns:
+            (int) affected row count
+        """
+        return await self.execute(build_update_sql(table, tuple(columns), where), data=(*values, *(where_data or ())))
+
+    async def insert_many(self, table, columns, rows, batch_size=DATABASE_BATCH_SIZE):
+        """
+        Insert many rows into table with multi-row statements, in one transaction
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple (if empty, default to all columns)
+            rows (Sequence[Tuple[Any]]): rows to insert, each must correspond to "columns"
+            batch_size (int): maximum number of rows per statement
+
+        Returns:
+            (int) affected row count
+        """
+        return await self._execute_batches(
+            lambda count: build_insert_sql(table, tuple(columns), len(rows[0]), count), rows, batch_size)
+
+    async def upsert_many(self, table, columns, rows, keys, batch_size=DATABASE_BATCH_SIZE):
+        """
+        Insert many rows into table with multi-row statements, updating the existing rows whose unique key exists
+        - in one transaction
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple
+            rows (Sequence[Tuple[Any]]): rows to insert, each must correspond to "columns"
+            keys (Tuple[str]): unique key columns, the other columns are updated on conflict
+            batch_size (int): maximum number of rows per statement
+
+        Returns:
+            (int) affected row count (MySQL counts an updated row twice)
+        """
+        return await self._execute_batches(
+            lambda count: build_upsert_sql(self.backend.dialect, table, tuple(columns), tuple(keys), count), rows, batch_size)
+
+    async def update_many(self, table, columns, rows, where):
+        """
+        Run the same update for many rows in one "executemany" call, in one transaction
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple
+            rows (Sequence[Tuple[Any]]): values to update followed by the values of the "%s" placeholders in "where"
+            where (str): where to update, with "%s" placeholders
+
+        Returns:
+            (int) affected row count
+        """
+        async with self.transaction():
+            return await self.executemany(build_update_sql(table, tuple(columns), where), rows)
+
+    async def delete(self, table, where, data=None):
+        """
+        Delete row(s) from the table
+
+        Args:
+            table (str): table name
+            where (str): where to delete
+            data (Tuple[Any]): values of the "%s" placeholders in "where"
+
+        Returns:
+            (int) affected row count
+        """
+        return await self.execute(build_delete_sql(table, where), data=data)
+
+    async def delete_all(self, table):
+        """
+        Delete all records from the table
+
+        Args:
+            table (str): table name
+
+        Returns:
+            (int) affected row count
+        """
+        return await self.execute(build_delete_sql(table))
+
+    # General SQL methods
+    async def query(self, sql, data=None):
+        """
+        Query the database
+
+        Args:
+            sql (str): SQL query statement
+            data (Tuple[Any]): query data (corresponds to query statement)
+
+        Returns:
+            (Iterator) iterator of the result set
+        """
+        self._check_enabled()
+        self._check_empty(sql)
+        start = time.perf_counter()
+        rows = await self.backend.query(self._connection, sql, data)
+        await self._record(sql, data, start, rows_returned=len(rows))
+        return iter(rows)
+
+    async def stream(self, sql, data=None, row_type=None, fetch_size=DATABASE_FETCH_SIZE):
+        """
+        Query the database without buffering the result set, rows are fetched in chunks
+        - memory stays constant no matter how large the result set is
+        - no other statement can run on this chain until the iteration finishes or the generator is closed,
+          wrap it in "contextlib.aclosing" when breaking out early
+
+        Args:
+            sql (str): SQL query statement
+            data (Tuple[Any]): query data (corresponds to query statement)
+            row_type (type): class constructed from the values of each row, e.g. from "named_row", default = tuples
+            fetch_size (int): number of rows fetched at a time
+
+        Returns:
+            (AsyncIterator) iterator of the result set
+        """
+        self._check_enabled()
+        self._check_empty(sql)
+        start = time.perf_counter()
+        row_count = 0
+        async with contextlib.aclosing(self.backend.stream(self._connection, sql, data, fetch_size)) as chunks:
+            async for rows in chunks:
+                row_count += len(rows)
+                if row_type is None:
+                    for row in rows:
+                        yield row
+                else:
+                    for row in rows:
+                        yield row_type(*row)
+        # Includes the time the caller spent between rows, which held the connection just the same
+        await self._record(sql, data, start, rows_returned=row_count)
+
+    async def execute(self, sql, data=None, commit=True):
+        """
+        Modify the database
+
+        Args:
+            sql (str): SQL query statement
+            data (Tuple[Any]): query data (corresponds to query statement)
+            commit (bool): whether to commit the changes (default True)
+
+        Returns:
+            (int) affected row count
+        """
+        self._check_enabled()
+        self._check_empty(sql)
+        start = time.perf_counter()
+        row_count = await self.backend.execute(self._connection, sql, data)
+        await self._record(sql, data, start, rows_affected=row_count)
+        if commit:
+            await self._commit()
+        elif not self._transaction_depth:
+            self._uncommitted = True
+        return row_count
+
+    async def executemany(self, sql, rows, commit=True):
+        """
+        Execute the same statement once for every row of data
+
+        Args:
+            sql (str): SQL statement with "%s" placeholders
+            rows (Sequence[Tuple[Any]]): statement data of every execution
+            commit (bool): whether to commit the changes (default True)
+
+        Returns:
+            (int) affected row count
+        """
+        self._check_enabled()
+        self._check_empty(sql)
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        row_count = await self.backend.executemany(self._connection, sql, rows)
+        await self._record(sql, rows[0], start, rows_affected=row_count)
+        if commit:
+            await self._commit()
+        elif not self._transaction_depth:
+            self._uncommitted = True
+        return row_count
+
+    async def _execute_batches(self, build_sql, rows, batch_size):
+        # One multi-row statement per batch, full batches share the same SQL
+        if not rows:
+            return 0
+        row_count = 0
+        async with self.transaction():
+            for batch in batches(rows, batch_size):
+                row_count += await self.execute(build_sql(len(batch)),
+                                                data=tuple(value for row in batch for value in row))
+        return row_count
+
+    async def _commit(self):
+        # Transactions commit once when their block exits
+        if not self._transaction_depth:
+            await self._commit_now()
+
+    async def _commit_now(self):
+        self._uncommitted = False
+        start = time.perf_counter()
+        await self.backend.commit(self._connection)
+        await self._record("COMMIT", None, start)
+
+    def _check_uncommitted(self):
+        # Starting a transaction would commit them along, and a rollback of the transaction would then keep them
+        if self._uncommitted:
+            raise SQLError("Statements run with commit=False are still uncommitted, run the last one with "
+                           "commit=True before starting a transaction!")
+
+    async def _record(self, sql, data, start, rows_returned=0, rows_affected=0):
+        seconds = time.perf_counter() - start
+        if sql_stats_util.record(sql, seconds, rows_returned, rows_affected):
+            sql_stats_util.log_slow(sql, seconds, await self._explain(sql, data))
+
+    async def _explain(self, sql, data):
+        if not DATABASE_SLOW_QUERY_EXPLAIN or not sql_stats_util.is_explainable(sql):
+            return None
+        try:
+            plan = await self.backend.query(self._connection, build_explain_sql(self.backend.dialect, sql), data)
+            return sql_stats_util.format_plan(plan)
+        except Exception as e:
+            return f"EXPLAIN failed: {e}"
+
+    # Utility methods
+    @staticmethod
+    def _check_empty(sql):
+        if not sql:
+            log.warning("SQL statement is empty!")
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    # Code for testing this class against an in-memory SQLite database
+    async def main():
+        set_backend(await SQLiteBackend.create(":memory:"))
+        async with AsyncChainedStatement() as cs:
+            with open("src/data/sql/genshin_mine.sql") as f:
+                await cs.execute(f.read())
+            await cs.insert("genshin_mine", ("player", "time_stamp"), ("Breeze", 100))
+            await cs.upsert("genshin_mine", ("player", "time_stamp"), ("Breeze", 200), keys=("player",))
+            await cs.upsert("genshin_mine", ("player", "time_stamp"), ("Geoff", 300), keys=("player",))
+            await cs.update("genshin_mine", ("time_stamp",), (400,), "player=%s", where_data=("Breeze",))
+            await cs.upsert_many("genshin_mine", ("player", "time_stamp"), [("Geoff", 500), ("Klee", 600)],
+                                 keys=("player",))
+            try:
+                async with cs.transaction():
+                    await cs.insert("genshin_mine", ("player", "time_stamp"), ("Diluc", 700))
+                    async with cs.transaction():
+                        await cs.insert("genshin_mine", ("player", "time_stamp"), ("Kaeya", 800))
+                    try:
+                        async with cs.transaction():
+                            await cs.insert("genshin_mine", ("player", "time_stamp"), ("Diluc", 900))
+                    except sqlite3.IntegrityError:
+                        print("Savepoint rolled back, Diluc & Kaeya are kept")
+                    raise RuntimeError
+            except RuntimeError:
+                print("Transaction rolled back, Diluc & Kaeya are discarded")
+            mine_row = sql_builder.named_row("MineRow", ("player", "time_stamp"))
+            async for a in cs.stream("SELECT player, time_stamp FROM genshin_mine", row_type=mine_row, fetch_size=2):
+                print(f"{a.player} >> {a.time_stamp}")
+            print(f"Rows affected: {await cs.delete('genshin_mine', 'player=%s', data=('Geoff',))}")
+        await backend.close()
+
+    # Benchmark: row-at-a-time writes (one statement & commit per row) against the bulk methods
+    # - on a file database, so every commit pays for a real sync to disk
+    async def benchmark(count=5000):
+        with tempfile.TemporaryDirectory() as directory:
+            bench_backend = await SQLiteBackend.create(os.path.join(directory, "benchmark.db"))
+            rows = [(f"player{i}", i) for i in range(count)]
+
+            async def timed_run(name, func):
+                async with AsyncChainedStatement(bench_backend) as cs:
+                    await cs.delete_all("genshin_mine")
+                    start = time.perf_counter()
+                    row_count = await func(cs)
+                    seconds = time.perf_counter() - start
+                print(f"{name:28s} >> {seconds * 1000:9.1f}ms ({count / seconds:9.0f} rows/s, {row_count} rows)")
+
+            async def insert_rows(cs):
+                return sum([await cs.insert("genshin_mine", ("player", "time_stamp"), row) for row in rows])
+
+            async def upsert_rows(cs):
+                await cs.insert_many("genshin_mine", ("player", "time_stamp"), rows)
+                return sum([await cs.upsert("genshin_mine", ("player", "time_stamp"), row, keys=("player",))
+                            for row in rows])
+
+            async def update_rows(cs):
+                await cs.insert_many("genshin_mine", ("player", "time_stamp"), rows)
+                return sum([await cs.update("genshin_mine", ("time_stamp",), (row[1] + 1,), "player=%s",
+                                            where_data=(row[0],)) for row in rows])
+
+            async def upsert_many_rows(cs):
+                await cs.insert_many("genshin_mine", ("player", "time_stamp"), rows)
+                return await cs.upsert_many("genshin_mine", ("player", "time_stamp"), rows, keys=("player",))
+
+            async def update_many_rows(cs):
+                await cs.insert_many("genshin_mine", ("player", "time_stamp"), rows)
+                return await cs.update_many("genshin_mine", ("time_stamp",), [(row[1] + 1, row[0]) for row in rows],
+                                            "player=%s")
+
+            async with AsyncChainedStatement(bench_backend) as cs:
+                with open("src/data/sql/genshin_mine.sql") as f:
+                    await cs.execute(f.read())
+            await timed_run("insert (row-at-a-time)", insert_rows)
+            await timed_run("insert_many", lambda cs: cs.insert_many("genshin_mine", ("player", "time_stamp"), rows))
+            # The upsert & update runs also time the insert_many that fills the table first
+            await timed_run("upsert (row-at-a-time)", upsert_rows)
+            await timed_run("upsert_many", upsert_many_rows)
+            await timed_run("update (row-at-a-time)", update_rows)
+            await timed_run("update_many", update_many_rows)
+            await bench_backend.close()
+
+    asyncio.run(main())
+    asyncio.run(benchmark())
+    print("done!")
@@ -0,0 +1,45 @@
+import asyncio
+
+from src.utils import metrics_util
+
+
+class Coalescer:
+    """ Coalesces identical in-flight calls, one execution answers every caller waiting on the same key """
+
+    def __init__(self):
+        # Running calls { key => future }
+        self.in_flight = {}
+
+    async def run(self, key, func, *args, **kwargs):
+        """
+        Run a coroutine function, or join the identical call that is already running
+
+        Args:
+            key (Hashable): identifies identical calls
+            func (function): coroutine function
+            *args: positional arguments for the function
+            **kwargs: keyword arguments for the function
+
+        Returns:
+            (Any) return value of the function, exceptions are raised to every waiting caller
+        """
+        future = self.in_flight.get(key)
+        if future is not None:
+            metrics_util.inc("coalesced_calls_total")
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func(*args, **kwargs))
+        self.in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        # Shield the shared call, so one cancelled caller doesn't cancel it for everyone else
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        if self.in_flight.get(key) is future:
+            del self.in_flight[key]
+        # Mark the exception as retrieved, in case every caller was cancelled before it finished
+        if not future.cancelled():
+            future.exception()
+
+    def __contains__(self, key):
+        return key in self.in_flight
@@ -6,7 +6,8 @@ from src.data import colors, settings
 class CommandHandler:
     """ Command handler superclass, each specific command handler should extend this class """
 
-    def __init__(self, bot, command, aliases, description, usage, example):
+    def __init__(self, bot, command, aliases, description, usage, example, blocking=False,
+                 max_concurrency=settings.EXECUTOR_COMMAND_CONCURRENCY):
         """
         Initialize a command handler (should be overridden by each command)
 
@@ -17,6 +18,8 @@ class CommandHandler:
             description (str): short command description
             usage (str): command usage template
             example (str): command usage demonstration
+            blocking (bool): whether the command does blocking work (database I/O, web requests...), default = false
+            max_concurrency (int): how many blocking calls of this command can run at the same time
         """
         self.bot = bot
         self.command = command
@@ -26,6 +29,9 @@ class CommandHandler:
         self.usage = usage
         self.example = example
 
+        self.blocking = blocking
+        self.max_concurrency = max_concurrency
+
     async def on_command(self, author, command, args, message, channel, guild):
         """
         Executes the command, should be overridden in the subclass
@@ -43,6 +49,40 @@ class CommandHandler:
         """
         return False
 
+    async def run_blocking(self, func, *args, **kwargs):
+        """
+        Run blocking work of this command
+        - blocking commands run the work in the bot's thread pool, so the event loop stays responsive
+        - non-blocking commands run the work directly
+
+        Args:
+            func (function): function to run
+            *args: positional arguments for the function
+            **kwargs: keyword arguments for the function
+
+        Returns:
+            (Any) return value of the function
+        """
+        if not self.blocking:
+            return func(*args, **kwargs)
+        return await self.bot.run_blocking(self.command, self.max_concurrency, func, *args, **kwargs)
+
+    async def coalesced(self, key_args, func, *args, **kwargs):
+        """
+        Run command work once for all identical in-flight invocations of this command
+        - callers with the same command and arguments all get the result (or exception) of one execution
+
+        Args:
+            key_args (Tuple[str]): normalized command arguments that identify identical invocations
+            func (function): coroutine function doing the work
+            *args: positional arguments for the function
+            **kwargs: keyword arguments for the function
+
+        Returns:
+            (Any) return value of the function
+        """
+        return await self.bot.coalescer.run((self.command, tuple(key_args)), func, *args, **kwargs)
+
     def get_help_embedded(self):
         """
         Generates an embedded help message for this command
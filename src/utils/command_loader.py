@@ -0,0 +1,126 @@
+import asyncio
+import importlib
+import time
+
+import src.utils.log_util as log
+from src.utils import metrics_util
+from src.utils.command_handler import CommandHandler
+from src.utils.intent_handler import IntentHandler
+
+
+class LazyCommandHandler(CommandHandler):
+    """ Placeholder of a command whose module is not imported yet, imports it and forwards on first use """
+
+    # Replaced in place when the real handler registers, see CommandRegistry.register
+    placeholder = True
+
+    def __init__(self, bot, loader, module, command, aliases):
+        super().__init__(bot, command, aliases, "", "", "")
+        self.loader = loader
+        self.module = module
+
+    async def load(self):
+        """
+        Import the module of this command
+
+        Returns:
+            (CommandHandler) real handler of this command, None if the module did not register it
+        """
+        await self.loader.load(self.module)
+        handler = self.bot.get_command_handler(self.command)
+        if handler is None or handler is self:
+            return None
+        return handler
+
+    async def on_command(self, author, command, args, message, channel, guild):
+        handler = await self.load()
+        if handler is None:
+            log.error(f"Module \"{self.module}\" did not register command \"{self.command}\"!")
+            await self.bot.react_unknown(message)
+            return
+        await handler.on_command(author, command, args, message, channel, guild)
+
+
+class LazyIntentHandler(IntentHandler):
+    """ Placeholder of an intent whose module is not imported yet, imports it and forwards on first use """
+
+    placeholder = True
+
+    def __init__(self, bot, loader, module, intent):
+        super().__init__(bot, intent, "")
+        self.loader = loader
+        self.module = module
+
+    async def on_intent_detected_wrapper(self, author, confidence, confidence_dict, message, channel, guild):
+        await self.loader.load(self.module)
+        handler = self.bot.intent_handlers.get(self.intent)
+        if handler is None or handler is self:
+            log.error(f"Module \"{self.module}\" did not register intent \"{self.intent}\"!")
+            return
+        await handler.on_intent_detected_wrapper(author, confidence, confidence_dict, message, channel, guild)
+
+
+class CommandLoader:
+    """ Registers the commands of a manifest up front and imports their modules on demand """
+
+    def __init__(self, bot, manifest):
+        """
+        Args:
+            bot (BotClient): bot to register the commands to
+            manifest (Dict[str, Dict]): { module => { "commands" => { command => [aliases] }, "intents" => [intents] } }
+        """
+        self.bot = bot
+        self.manifest = manifest
+        # Module imports { module => task }, shared by everyone waiting on the same module
+        self.loads = {}
+
+    def register_placeholders(self):
+        """ Register a placeholder for every command & intent in the manifest """
+        for module, entry in self.manifest.items():
+            for command, aliases in entry["commands"].items():
+                self.bot.register_command_handler(LazyCommandHandler(self.bot, self, module, command, aliases))
+            for intent in entry["intents"]:
+                self.bot.register_intent_handler(intent, LazyIntentHandler(self.bot, self, module, intent))
+
+    async def load(self, module):
+        """
+        Import a command module and register its handlers, only once per module
+
+        Args:
+            module (str): module name from the manifest
+        """
+        task = self.loads.get(module)
+        if task is None:
+            task = self.loads[module] = asyncio.ensure_future(self._load(module))
+        try:
+            await asyncio.shield(task)
+        except Exception:
+            # Forget the failed import, so the next use tries again
+            if self.loads.get(module) is task:
+                del self.loads[module]
+            raise
+
+    async def _load(self, module):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
+        # Importing runs module-level code and may read files, keep it off the event loop
+        imported = await loop.run_in_executor(None, importlib.import_module, module)
+        imported.register_all(self.bot)
+
+        # Build heavy state that the module defers until it is needed
+        warm_up = getattr(imported, "warm_up", None)
+        if warm_up is not None:
+            await loop.run_in_executor(None, warm_up)
+
+        seconds = time.perf_counter() - start
+        metrics_util.set_gauge("command_module_load_seconds", seconds, module=module)
+        log.info(f"Loaded command module \"{module}\" in {seconds * 1000:.1f}ms!")
+
+    async def warm_up(self):
+        """ Import every module in the background, so the first use of each command doesn't wait """
+        for module in self.manifest:
+            try:
+                await self.load(module)
+            except Exception as e:
+                log.error(f"Unable to load command module \"{module}\": {e}")
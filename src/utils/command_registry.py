@@ -0,0 +1,117 @@
+class CommandRegistry:
+    """ Hash-indexed registry of command handlers, maps every command name and alias to its handler """
+
+    def __init__(self):
+        # Registered handlers in registration order
+        self.handlers = []
+        # Lookup table { command or alias => handler }
+        self.index = {}
+
+    def register(self, handler):
+        """
+        Register a command handler under its command name and all of its aliases
+        - placeholders (handlers with a truthy "placeholder" attribute) are replaced in place
+
+        Args:
+            handler (CommandHandler): command handler
+
+        Raises:
+            ValueError: if the command name or any alias is already taken by another handler
+        """
+        names = [handler.command, *handler.aliases]
+        if len(set(names)) != len(names):
+            raise ValueError(f"{handler} declares the same name more than once: {names}")
+        placeholders = []
+        for name in names:
+            existing = self.index.get(name)
+            if existing is None or existing in placeholders:
+                continue
+            if not getattr(existing, "placeholder", False):
+                raise ValueError(f"Command name \"{name}\" of {handler} collides with {existing}!")
+            placeholders.append(existing)
+
+        # Take the position of the earliest placeholder, so listings keep their order
+        position = len(self.handlers)
+        for placeholder in placeholders:
+            position = min(position, self.handlers.index(placeholder))
+            self.unregister(placeholder)
+
+        for name in names:
+            self.index[name] = handler
+        self.handlers.insert(position, handler)
+
+    def unregister(self, handler):
+        """
+        Remove a command handler and every name that maps to it
+
+        Args:
+            handler (CommandHandler): command handler
+        """
+        if handler not in self.handlers:
+            return
+        self.handlers.remove(handler)
+        for name in [name for name, existing in self.index.items() if existing is handler]:
+            del self.index[name]
+
+    def get(self, command):
+        """
+        Find the handler of a command
+
+        Args:
+            command (str): command name or alias
+
+        Returns:
+            (CommandHandler) handler if the command is registered, otherwise None
+        """
+        return self.index.get(command)
+
+    def __contains__(self, command):
+        return command in self.index
+
+    def __iter__(self):
+        return iter(self.handlers)
+
+    def __len__(self):
+        return len(self.handlers)
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: dispatch cost should stay flat as the number of registered handlers grows
+    import timeit
+
+    class _StubHandler:
+        def __init__(self, command, aliases):
+            self.command = command
+            self.aliases = aliases
+
+        def __str__(self):
+            return f"Command handler for \"{self.command}\""
+
+    def linear_scan(handlers, command):
+        for loop in handlers:
+            if command == loop.command or command in loop.aliases:
+                return loop
+        return None
+
+    rounds = 20000
+    for handler_count in (10, 100, 500, 1000):
+        registry = CommandRegistry()
+        for i in range(handler_count):
+            registry.register(_StubHandler(f"command{i}", [f"alias{i}a", f"alias{i}b"]))
+
+        # Worst case for the linear scan: the last alias of the last handler
+        target = f"alias{handler_count - 1}b"
+        assert registry.get(target) is linear_scan(registry.handlers, target)
+
+        indexed = timeit.timeit(lambda: registry.get(target), number=rounds) / rounds
+        linear = timeit.timeit(lambda: linear_scan(registry.handlers, target), number=rounds) / rounds
+        print(f"{handler_count:5d} handlers >> indexed: {indexed * 1e9:8.1f}ns, linear: {linear * 1e9:10.1f}ns")
+
+    # Collisions are rejected at registration time
+    registry = CommandRegistry()
+    registry.register(_StubHandler("help", ["?"]))
+    try:
+        registry.register(_StubHandler("question", ["?"]))
+        raise AssertionError("Alias collision was not rejected!")
+    except ValueError as e:
+        print(f"Collision rejected: {e}")
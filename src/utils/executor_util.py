@@ -0,0 +1,76 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.data.settings import EXECUTOR_MAX_WORKERS
+from src.utils import metrics_util
+
+
+class BlockingExecutor:
+    """ Bounded thread pool for blocking command work, with a concurrency cap per command """
+
+    def __init__(self, max_workers=EXECUTOR_MAX_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+        # Concurrency caps { command => semaphore }
+        self.semaphores = {}
+        # Calls waiting for their command's cap { command => count }
+        self.queued = {}
+        # Calls submitted to the pool that have not started on a thread yet
+        self.backlog = 0
+        self._backlog_lock = threading.Lock()
+
+    async def run(self, command, max_concurrency, func, *args, **kwargs):
+        """
+        Run a blocking function in the thread pool without blocking the event loop
+
+        Args:
+            command (str): command the work belongs to, used for the concurrency cap and metrics
+            max_concurrency (int): how many calls of this command can run at the same time
+            func (function): blocking function
+            *args: positional arguments for the function
+            **kwargs: keyword arguments for the function
+
+        Returns:
+            (Any) return value of the function
+        """
+        semaphore = self.semaphores.get(command)
+        if semaphore is None:
+            semaphore = self.semaphores[command] = asyncio.Semaphore(max_concurrency)
+
+        self._set_queued(command, 1)
+        try:
+            await semaphore.acquire()
+        finally:
+            self._set_queued(command, -1)
+
+        try:
+            self._set_backlog(1)
+            future = self.pool.submit(functools.partial(self._call, func, *args, **kwargs))
+            future.add_done_callback(self._on_done)
+            return await asyncio.wrap_future(future)
+        finally:
+            semaphore.release()
+
+    def _call(self, func, *args, **kwargs):
+        # Runs on a worker thread, the call has left the pool's queue
+        self._set_backlog(-1)
+        return func(*args, **kwargs)
+
+    def _on_done(self, future):
+        # A future is only cancelled before it starts, so its call never left the backlog through "_call"
+        if future.cancelled():
+            self._set_backlog(-1)
+
+    def _set_queued(self, command, delta):
+        self.queued[command] = self.queued.get(command, 0) + delta
+        metrics_util.set_gauge("executor_queue_depth", self.queued[command], command=command)
+
+    def _set_backlog(self, delta):
+        # Called from both the event loop thread and the worker threads
+        with self._backlog_lock:
+            self.backlog += delta
+            metrics_util.set_gauge("executor_backlog", self.backlog)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import aiohttp
+
+from src.data.settings import HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS_PER_HOST, HTTP_MAX_CONCURRENCY
+from src.utils import metrics_util
+
+# Session of this process, see get_session
+session = None
+_semaphore = None
+
+
+class HTTPStatusError(aiohttp.ClientError):
+    """ The server answered with an error status """
+
+    def __init__(self, url, status):
+        super().__init__(f"{url} answered {status}")
+        self.url = url
+        self.status = status
+
+
+class Response:
+    """ A fully read HTTP response """
+
+    __slots__ = ("url", "status", "headers", "content")
+
+    def __init__(self, url, status, headers, content):
+        """
+        Args:
+            url (str): requested URL
+            status (int): HTTP status code
+            headers (Mapping[str, str]): response headers, case-insensitive
+            content (bytes): response body
+        """
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    def raise_for_status(self):
+        """ Raise HTTPStatusError if the status is 400 or above """
+        if self.status >= 400:
+            raise HTTPStatusError(self.url, self.status)
+
+
+def get_session():
+    """
+    Get the HTTP session shared by the whole bot, created on first use
+    - keeps connections alive between requests, so repeated requests to a host skip the TCP & TLS handshakes
+
+    Returns:
+        (aiohttp.ClientSession) shared session
+    """
+    global session, _semaphore
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+        )
+        _semaphore = asyncio.Semaphore(HTTP_MAX_CONCURRENCY)
+    return session
+
+
+async def close_session():
+    global session
+    if session is not None:
+        await session.close()
+        session = None
+
+
+async def get(url, headers=None):
+    """
+    Send a GET request through the shared session, waits in line if too many requests are in flight
+
+    Args:
+        url (str): URL to request
+        headers (Dict[str, str]): request headers
+
+    Returns:
+        (Response) response with its body read
+    """
+    http_session = get_session()
+    async with _semaphore:
+        start = time.perf_counter()
+        async with http_session.get(url, headers=headers) as response:
+            content = await response.read()
+        metrics_util.observe("http_request_seconds", time.perf_counter() - start, host=response.url.host)
+        metrics_util.inc("http_responses_total", host=response.url.host, status=response.status)
+        return Response(url, response.status, response.headers, content)
+
+
+def conditional_headers(validators):
+    """
+    Build the headers of a conditional GET, the server answers 304 Not Modified if the page did not change
+
+    Args:
+        validators (Dict[str, str]): "etag" and/or "last_modified" of the cached response
+
+    Returns:
+        (Dict[str, str]) request headers
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def get_validators(response):
+    """
+    Get the validators of a response, to revalidate it with a conditional GET later
+
+    Args:
+        response (Response): response of a GET
+
+    Returns:
+        (Dict[str, str]) "etag" and "last_modified", None if the server did not send them
+    """
+    return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
@@ -1,8 +1,10 @@
+import asyncio
 from typing import Dict
 
 import discord
 
 from src.data import colors, emojis
+from src.utils import metrics_util
 from src.utils.reaction_handler import ReactionHandler
 
 
@@ -27,13 +29,18 @@ class IntentHandler:
         Wrapper method for automating some intent detected functionalities
         - THIS METHOD SHOULD NOT BE OVERRIDDEN!!!
         """
+        with metrics_util.measure("intent_latency_seconds", intent=self.intent):
+            await self._on_intent_detected_wrapper(author, confidence, confidence_dict, message, channel, guild)
+
+    async def _on_intent_detected_wrapper(self, author, confidence, confidence_dict, message, channel, guild):
         # Call sub-method
         reply_message = await self.on_intent_detected(author, confidence, message, channel, guild)
         if reply_message is None:
             return
 
-        await reply_message.add_reaction(emojis.MAGNIFYING_GLASS)
-        await self.bot.react_cross(reply_message)
+        # Independent reactions, sent concurrently
+        await asyncio.gather(self.bot.add_reaction(reply_message, emojis.MAGNIFYING_GLASS),
+                             self.bot.react_cross(reply_message))
 
         async def on_react(_, _2, emote, _3, _4, _5):
             if emote == emojis.MAGNIFYING_GLASS:
@@ -0,0 +1,322 @@
+import asyncio
+import contextlib
+import json
+import time
+
+import src.utils.log_util as log
+from src.data.settings import DATABASE_WRITE_BEHIND, DATABASE_JOURNAL_PATH, DATABASE_JOURNAL_FLUSH_DELAY, \
+    DATABASE_JOURNAL_BATCH_SIZE, DATABASE_JOURNAL_MAX_RETRY_DELAY
+from src.utils import metrics_util
+from src.utils.async_sql_util import AsyncChainedStatement, SQLiteBackend, get_backend
+from src.utils.sql_builder import build_delete_sql
+
+# Journal of this process, see get_journal
+journal = None
+_journal_lock = asyncio.Lock()
+
+# Schema of the local journal, one row per write
+JOURNAL_SCHEMA = "CREATE TABLE IF NOT EXISTS journal (id INTEGER PRIMARY KEY AUTOINCREMENT, entry TEXT NOT NULL)"
+
+
+class JournalEntry:
+    """ A write waiting in the journal """
+
+    __slots__ = ("id", "op", "table", "columns", "keys", "rows")
+
+    def __init__(self, entry_id, op, table, columns, keys, rows):
+        """
+        Args:
+            entry_id (int): journal id, entries are flushed in id order
+            op (str): "upsert" or "delete"
+            table (str): table name
+            columns (Tuple[str]): columns of "rows", only the key columns for a delete
+            keys (Tuple[str]): unique key columns
+            rows (List[Tuple[Any]]): rows to upsert, or key values of the rows to delete
+        """
+        self.id = entry_id
+        self.op = op
+        self.table = table
+        self.columns = tuple(columns)
+        self.keys = tuple(keys)
+        self.rows = [tuple(row) for row in rows]
+
+    def to_json(self):
+        return json.dumps({"op": self.op, "table": self.table, "columns": self.columns, "keys": self.keys,
+                           "rows": self.rows})
+
+    @staticmethod
+    def from_json(entry_id, text):
+        entry = json.loads(text)
+        return JournalEntry(entry_id, entry["op"], entry["table"], entry["columns"], entry["keys"], entry["rows"])
+
+
+class WriteJournal:
+    """
+    Write-behind journal in front of the database
+    - writes are stored in a local SQLite journal and acknowledged right away
+    - a background task replays them to the database in order, in batches, retrying until they succeed
+    - reads through "read" see the writes that are still waiting
+    """
+
+    def __init__(self, path=DATABASE_JOURNAL_PATH):
+        """
+        Args:
+            path (str): path of the SQLite journal file
+        """
+        self.path = path
+        self.local = None
+        # Entries not flushed yet, in id order
+        self.pending = []
+        self._wake = asyncio.Event()
+        self._flusher = None
+
+    async def open(self):
+        """ Open the journal, writes left over from the last run are flushed first """
+        self.local = await SQLiteBackend.create(self.path)
+        async with AsyncChainedStatement(self.local) as statement:
+            # A journal write is acknowledged once it is in the WAL, which doesn't need a sync per commit
+            await statement.query("PRAGMA journal_mode=WAL")
+            await statement.execute("PRAGMA synchronous=NORMAL")
+            await statement.execute(JOURNAL_SCHEMA)
+            self.pending = [JournalEntry.from_json(entry_id, text)
+                            async for entry_id, text in statement.stream("SELECT id, entry FROM journal ORDER BY id")]
+        if self.pending:
+            log.warning(f"Found {len(self.pending)} unflushed writes in the journal, flushing them!")
+            self._wake.set()
+        self._set_gauge()
+        self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self):
+        """ Stop the flusher after one last flush, whatever is still pending stays in the journal for the next run """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            # Wait for it to stop, a flush it was running would otherwise replay the same batch alongside this one
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            log.error(f"Unable to flush {len(self.pending)} journal writes before closing: {e}")
+        await self.local.close()
+
+    async def upsert(self, table, columns, rows, keys):
+        """
+        Journal an insert of rows, updating the existing rows whose unique key exists
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple
+            rows (Sequence[Tuple[Any]]): rows to insert, values must be JSON serializable
+            keys (Tuple[str]): unique key columns, the other columns are updated on conflict
+
+        Returns:
+            (int) number of journaled rows
+        """
+        await self._append("upsert", table, columns, keys, rows)
+        return len(rows)
+
+    async def delete(self, table, keys, rows):
+        """
+        Journal a delete of rows by their key
+
+        Args:
+            table (str): table name
+            keys (Tuple[str]): key columns
+            rows (Sequence[Tuple[Any]]): key values of the rows to delete, values must be JSON serializable
+        """
+        await self._append("delete", table, keys, keys, rows)
+
+    async def read(self, table, columns, keys, sql, data=None):
+        """
+        Query the database, then apply the writes of the journal that may not be in the result yet
+
+        Args:
+            table (str): table the query reads from
+            columns (Tuple[str]): columns selected by the query, in order
+            keys (Tuple[str]): unique key columns of the table, must be among "columns"
+            sql (str): SQL query statement, selecting whole rows of "table"
+            data (Tuple[Any]): query data (corresponds to query statement)
+
+        Returns:
+            (List[Tuple]) result rows
+        """
+        # Entries flushed while the query runs are in its result, applying them again does not change it
+        waiting = [entry for entry in self.pending if entry.table == table]
+        async with AsyncChainedStatement(await get_backend()) as statement:
+            rows = list(await statement.query(sql, data))
+        seen = {entry.id for entry in waiting}
+        waiting += [entry for entry in self.pending if entry.table == table and entry.id not in seen]
+        return overlay(rows, columns, keys, sorted(waiting, key=lambda a: a.id))
+
+    async def flush(self):
+        """ Replay pending entries to the database until the journal is empty, one batch per transaction """
+        while self.pending:
+            batch = self.pending[:DATABASE_JOURNAL_BATCH_SIZE]
+            start = time.perf_counter()
+            async with AsyncChainedStatement(await get_backend()) as statement, statement.transaction():
+                for entry in merge_upserts(batch):
+                    if entry.op == "upsert":
+                        await statement.upsert_many(entry.table, entry.columns, entry.rows, entry.keys)
+                    else:
+                        where = " AND ".join(f"{key}=%s" for key in entry.keys)
+                        await statement.executemany(build_delete_sql(entry.table, where), entry.rows)
+
+            # Flushed, drop them from the journal. If this fails, they are flushed again, which changes nothing
+            async with AsyncChainedStatement(self.local) as statement:
+                await statement.delete("journal", "id <= %s", data=(batch[-1].id,))
+            del self.pending[:len(batch)]
+            self._set_gauge()
+            metrics_util.inc("journal_flushed_total", len(batch))
+            metrics_util.observe("journal_flush_seconds", time.perf_counter() - start)
+
+    async def _append(self, op, table, columns, keys, rows):
+        if not rows:
+            return
+        entry = JournalEntry(None, op, table, columns, keys, rows)
+        async with AsyncChainedStatement(self.local) as statement:
+            await statement.insert("journal", ("entry",), (entry.to_json(),))
+            entry.id = next(await statement.query("SELECT last_insert_rowid()"))[0]
+        self.pending.append(entry)
+        self._set_gauge()
+        self._wake.set()
+
+    async def _flush_loop(self):
+        retry_delay = 1
+        while True:
+            await self._wake.wait()
+            # Let writes that arrive together go out in one batch
+            await asyncio.sleep(DATABASE_JOURNAL_FLUSH_DELAY)
+            self._wake.clear()
+            try:
+                await self.flush()
+                retry_delay = 1
+            except Exception as e:
+                # Entries stay in order at the head of the journal, nothing after them is flushed before they are
+                metrics_util.inc("journal_flush_failures_total")
+                log.error(f"Unable to flush the journal, retrying in {retry_delay}s: {e}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, DATABASE_JOURNAL_MAX_RETRY_DELAY)
+                self._wake.set()
+
+    def _set_gauge(self):
+        metrics_util.set_gauge("journal_pending", len(self.pending))
+
+
+def merge_upserts(entries):
+    """
+    Merge consecutive upserts of the same table & columns into one multi-row upsert, keeping the order of all writes
+
+    Args:
+        entries (List[JournalEntry]): entries in id order
+
+    Returns:
+        (List[JournalEntry]) merged entries
+    """
+    merged = []
+    for entry in entries:
+        previous = merged[-1] if merged else None
+        if entry.op == "upsert" and previous is not None and previous.op == "upsert" and \
+                (previous.table, previous.columns, previous.keys) == (entry.table, entry.columns, entry.keys):
+            merged[-1] = JournalEntry(previous.id, "upsert", entry.table, entry.columns, entry.keys,
+                                      previous.rows + entry.rows)
+        else:
+            merged.append(entry)
+    return merged
+
+
+def overlay(rows, columns, keys, entries):
+    """
+    Apply journal entries on top of query result rows
+
+    Args:
+        rows (List[Tuple]): result rows
+        columns (Tuple[str]): columns of the rows, in order
+        keys (Tuple[str]): unique key columns, must be among "columns"
+        entries (List[JournalEntry]): entries of the queried table in id order
+
+    Returns:
+        (List[Tuple]) result rows with the entries applied, new rows last
+    """
+    key_indexes = [columns.index(key) for key in keys]
+    result = {tuple(row[i] for i in key_indexes): tuple(row) for row in rows}
+    for entry in entries:
+        for values in entry.rows:
+            values = dict(zip(entry.columns, values))
+            key = tuple(values[key] for key in keys)
+            if entry.op == "delete":
+                result.pop(key, None)
+                continue
+            row = result.get(key, (None,) * len(columns))
+            result[key] = tuple(values.get(column, value) for column, value in zip(columns, row))
+    return list(result.values())
+
+
+async def get_journal():
+    """
+    Get the write-behind journal, opened on first use
+
+    Returns:
+        (WriteJournal) journal, None if settings.DATABASE_WRITE_BEHIND is off
+    """
+    global journal
+    if not DATABASE_WRITE_BEHIND:
+        return None
+    if journal is not None:
+        return journal
+    async with _journal_lock:
+        if journal is None:
+            opened = WriteJournal()
+            await opened.open()
+            journal = opened
+    return journal
+
+
+async def warm_up():
+    """ Open the journal at startup, so writes left over from the last run are flushed without waiting for a new one """
+    try:
+        await get_journal()
+    except Exception as e:
+        log.error(f"Unable to open the write-behind journal: {e}")
+
+
+async def close_journal():
+    global journal
+    if journal is not None:
+        await journal.close()
+        journal = None
+
+
+if __name__ == "__main__":
+    # Code for testing the journal against an in-memory SQLite database standing in for MySQL
+    import os
+    import tempfile
+
+    from src.utils.async_sql_util import set_backend
+
+    async def main():
+        set_backend(await SQLiteBackend.create(":memory:"))
+        async with AsyncChainedStatement() as statement:
+            with open("src/data/sql/genshin_mine.sql") as f:
+                await statement.execute(f.read())
+            await statement.insert("genshin_mine", ("player", "time_stamp"), ("Breeze", 100))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "journal.db")
+            test_journal = WriteJournal(path)
+            await test_journal.open()
+            start = time.perf_counter()
+            await test_journal.upsert("genshin_mine", ("player", "time_stamp"), [("Geoff", 200)], keys=("player",))
+            await test_journal.upsert("genshin_mine", ("player", "time_stamp"), [("Breeze", 300)], keys=("player",))
+            await test_journal.delete("genshin_mine", ("player",), [("Geoff",)])
+            print(f"3 writes acknowledged in {(time.perf_counter() - start) * 1000:.1f}ms")
+            sql = "SELECT player, time_stamp FROM genshin_mine"
+            print(f"Before flush: {await test_journal.read('genshin_mine', ('player', 'time_stamp'), ('player',), sql)}")
+            await asyncio.sleep(DATABASE_JOURNAL_FLUSH_DELAY + 0.1)
+            print(f"Pending after flush: {len(test_journal.pending)}")
+            async with AsyncChainedStatement() as statement:
+                print(f"Database after flush: {list(await statement.query(sql))}")
+            await test_journal.close()
+
+    asyncio.run(main())
+    print("done!")
@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import functools
+import os
+import time
+from collections import deque
+from typing import Dict, Tuple
+
+import src.utils.log_util as log
+from src.data.settings import METRICS_HISTOGRAM_WINDOW, METRICS_LOOP_LAG_INTERVAL, METRICS_PROMETHEUS_PATH, \
+    METRICS_PROMETHEUS_INTERVAL
+
+# Quantiles reported for every histogram
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Metric storage { (name, labels) => value }
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_gauges: Dict[Tuple[str, Tuple], float] = {}
+# Histogram storage { (name, labels) => Histogram }
+_histograms: Dict[Tuple[str, Tuple], "Histogram"] = {}
+
+
+class Histogram:
+    """ Latency histogram, keeps a window of recent samples for percentiles and totals for averages """
+
+    def __init__(self, window=METRICS_HISTOGRAM_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self, quantiles=QUANTILES):
+        """
+        Compute quantiles over the recent samples
+
+        Args:
+            quantiles (Tuple[float]): quantiles to compute, each in [0, 1]
+
+        Returns:
+            (Dict[float, float]) { quantile => value }, values are 0 if there are no samples
+        """
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {quantile: 0 for quantile in quantiles}
+        return {quantile: ordered[min(int(quantile * len(ordered)), len(ordered) - 1)] for quantile in quantiles}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """
+    Increment a counter
+
+    Args:
+        name (str): metric name
+        amount (float): how much to increment by, default = 1
+        **labels: metric labels
+    """
+    key = _key(name, labels)
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    """
+    Set a gauge to a value
+
+    Args:
+        name (str): metric name
+        value (float): current value
+        **labels: metric labels
+    """
+    _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    """
+    Record a sample in a histogram
+
+    Args:
+        name (str): metric name
+        value (float): sample value
+        **labels: metric labels
+    """
+    key = _key(name, labels)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(value)
+
+
+def get_counter(name, **labels):
+    return _counters.get(_key(name, labels), 0)
+
+
+def get_gauge(name, **labels):
+    return _gauges.get(_key(name, labels), 0)
+
+
+def get_histograms(name):
+    """
+    Get all histograms of a metric
+
+    Args:
+        name (str): metric name
+
+    Returns:
+        (Dict[Tuple[Tuple[str, str]], Histogram]) { labels as sorted (label, value) pairs => histogram }
+    """
+    return {labels: histogram for (metric, labels), histogram in _histograms.items() if metric == name}
+
+
+def snapshot():
+    """
+    Copy the current values of all metrics
+
+    Returns:
+        (Dict[str, Dict]) { "counters" / "gauges" / "histograms" => { (name, labels) => value } }
+    """
+    return {
+        "counters": dict(_counters),
+        "gauges": dict(_gauges),
+        "histograms": {key: histogram.quantiles() for key, histogram in _histograms.items()}
+    }
+
+
+@contextlib.contextmanager
+def measure(name, **labels):
+    """
+    Time the enclosed block into a latency histogram, exceptions also increment "<name>_errors_total"
+
+    Args:
+        name (str): histogram name
+        **labels: metric labels
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc(f"{name}_errors_total", **labels)
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    """
+    Decorator version of "measure" for coroutine functions, adds the function's name as the "function" label
+
+    Args:
+        name (str): histogram name
+        **labels: metric labels
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with measure(name, function=func.__qualname__, **labels):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def monitor_loop_lag(interval=METRICS_LOOP_LAG_INTERVAL):
+    """ Measures how late the event loop wakes up from a sleep, which is how long it was blocked """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        observe("event_loop_lag_seconds", max(time.perf_counter() - start - interval, 0))
+
+
+def _format_labels(labels, extra=()):
+    labels = (*labels, *extra)
+    if not labels:
+        return ""
+    return "{" + ",".join(f"{name}=\"{_escape(value)}\"" for name, value in labels) + "}"
+
+
+def _escape(value):
+    # Label values such as SQL fingerprints may contain characters that are special in the text format
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def to_prometheus():
+    """
+    Format all metrics in the Prometheus text exposition format, histograms are exposed as summaries
+
+    Returns:
+        (str) metrics text
+    """
+    lines = []
+    for metric_type, metrics in (("counter", _counters), ("gauge", _gauges)):
+        declared = set()
+        for (name, labels), value in sorted(metrics.items()):
+            if name not in declared:
+                lines.append(f"# TYPE {name} {metric_type}")
+                declared.add(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    declared = set()
+    for (name, labels), histogram in sorted(_histograms.items(), key=lambda a: a[0]):
+        if name not in declared:
+            lines.append(f"# TYPE {name} summary")
+            declared.add(name)
+        for quantile, value in histogram.quantiles().items():
+            lines.append(f"{name}{_format_labels(labels, (('quantile', quantile),))} {value}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=METRICS_PROMETHEUS_PATH):
+    """ Write all metrics to a Prometheus text file, replaced atomically so scrapers never read half a file """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(to_prometheus())
+    os.replace(temp_path, path)
+
+
+async def write_prometheus_periodically(path=METRICS_PROMETHEUS_PATH, interval=METRICS_PROMETHEUS_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            write_prometheus(path)
+        except OSError as e:
+            log.error(f"Unable to write metrics to \"{path}\": {e}")
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from collections import deque
+
+import discord
+
+import src.utils.log_util as log
+from src.data.settings import OUTBOUND_MAX_CONCURRENCY, OUTBOUND_MAX_RETRIES, OUTBOUND_MAX_MESSAGE_LENGTH
+from src.utils import metrics_util
+
+
+class OutboundCall:
+    """ A queued Discord REST call """
+
+    def __init__(self, func, args, kwargs, mergeable_content=None):
+        """
+        Args:
+            func (function): coroutine function doing the REST call
+            args (Tuple[Any]): positional arguments for the function
+            kwargs (Dict[str, Any]): keyword arguments for the function
+            mergeable_content (str): text of a plain text send, merged with neighbouring plain text sends
+        """
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.mergeable_content = mergeable_content
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class OutboundQueue:
+    """
+    Outbound Discord REST call scheduler
+    - calls on the same route run one at a time in order, calls on different routes run concurrently
+    - a route is blocked for the time Discord asks for whenever it answers with 429 Too Many Requests
+    """
+
+    def __init__(self, max_concurrency=OUTBOUND_MAX_CONCURRENCY):
+        # Pending calls { route => deque of calls }
+        self.routes = {}
+        # Worker tasks draining the routes { route => task }
+        self.workers = {}
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.depth = 0
+
+    async def submit(self, route, func, *args, mergeable_content=None, **kwargs):
+        """
+        Queue a REST call and wait for its result
+
+        Args:
+            route (Hashable): calls with the same route run in order
+            func (function): coroutine function doing the REST call
+            *args: positional arguments for the function
+            mergeable_content (str): see OutboundCall
+            **kwargs: keyword arguments for the function
+
+        Returns:
+            (Any) return value of the function
+        """
+        call = OutboundCall(func, args, kwargs, mergeable_content=mergeable_content)
+        self.routes.setdefault(route, deque()).append(call)
+        self._set_depth(1)
+        if route not in self.workers:
+            self.workers[route] = asyncio.ensure_future(self._drain(route))
+        return await call.future
+
+    async def send(self, channel, content=None, embed=None, view=None, reference=None, mention_author=None):
+        """
+        Queue a message send, plain text sends to the same channel are merged while they wait
+
+        Args:
+            channel (discord.abc.Messageable): channel to send to
+            content (str): message text
+            embed (discord.Embed): embedded message
+            view (discord.ui.View): message components
+            reference (discord.Message): message to reply to
+            mention_author (bool): whether the reply mentions the author of the referenced message
+
+        Returns:
+            (discord.Message) sent message
+        """
+        mergeable = content is not None and embed is None and view is None and reference is None
+        return await self.submit(("channel", channel.id), channel.send, mergeable_content=content if mergeable else None,
+                                 content=content, embed=embed, view=view, reference=reference,
+                                 mention_author=mention_author)
+
+    async def add_reaction(self, message, emoji):
+        """
+        Queue a reaction, reactions of different emojis run concurrently
+
+        Args:
+            message (discord.Message): message to react to
+            emoji (Union[discord.Emoji, str]): reaction emoji
+        """
+        return await self.submit(("reaction", message.id, str(emoji)), message.add_reaction, emoji)
+
+    async def _drain(self, route):
+        calls = self.routes[route]
+        while calls:
+            call = calls.popleft()
+            merged = [call]
+            if call.mergeable_content is not None:
+                content = call.mergeable_content
+                while calls and calls[0].mergeable_content is not None and \
+                        len(content) + 1 + len(calls[0].mergeable_content) <= OUTBOUND_MAX_MESSAGE_LENGTH:
+                    content += "\n" + calls[0].mergeable_content
+                    merged.append(calls.popleft())
+                if len(merged) > 1:
+                    metrics_util.inc("outbound_coalesced_total", len(merged) - 1)
+                    call = OutboundCall(call.func, call.args, {**call.kwargs, "content": content})
+            self._set_depth(-len(merged))
+
+            try:
+                result = await self._call_with_retry(route, call)
+            except Exception as e:
+                for waiting in merged:
+                    if not waiting.future.done():
+                        waiting.future.set_exception(e)
+            else:
+                for waiting in merged:
+                    if not waiting.future.done():
+                        waiting.future.set_result(result)
+
+        del self.routes[route]
+        del self.workers[route]
+
+    async def _call_with_retry(self, route, call):
+        for attempt in range(OUTBOUND_MAX_RETRIES + 1):
+            async with self.semaphore:
+                try:
+                    return await call.func(*call.args, **call.kwargs)
+                except discord.HTTPException as e:
+                    if e.status != 429 or attempt == OUTBOUND_MAX_RETRIES:
+                        raise
+                    retry_after = float(e.response.headers.get("Retry-After", 1))
+
+            # Only this route waits, other routes keep going
+            metrics_util.inc("discord_429_total")
+            log.warning(f"Route {route} is rate limited, retrying in {retry_after:.2f}s!")
+            await asyncio.sleep(retry_after)
+
+    def _set_depth(self, delta):
+        self.depth += delta
+        metrics_util.set_gauge("outbound_queue_depth", self.depth)
+
+
+class RateLimitLogCounter(logging.Handler):
+    """ Counts the 429 responses the Discord library retries internally, it only reports them through its logger """
+
+    def emit(self, record):
+        if "rate limit" in record.getMessage().lower():
+            metrics_util.inc("discord_429_total")
+
+
+def count_library_rate_limits():
+    """ Start counting the 429 responses retried by the Discord library into "discord_429_total" """
+    logger = logging.getLogger("discord.http")
+    if not any(isinstance(handler, RateLimitLogCounter) for handler in logger.handlers):
+        logger.addHandler(RateLimitLogCounter(level=logging.WARNING))
@@ -0,0 +1,131 @@
+import time
+
+from src.data.settings import RATE_LIMIT_USER, RATE_LIMIT_GUILD, RATE_LIMIT_USER_COMMANDS, \
+    RATE_LIMIT_GUILD_COMMANDS, RATE_LIMIT_GUILD_OVERRIDES
+from src.utils import metrics_util
+
+# How many checks between sweeps of idle buckets
+PRUNE_INTERVAL = 1000
+
+
+class TokenBucket:
+    """ Token bucket, refills continuously up to its capacity """
+
+    def __init__(self, capacity, refill_rate):
+        """
+        Args:
+            capacity (float): maximum number of tokens
+            refill_rate (float): tokens refilled per second
+        """
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def retry_after(self):
+        """
+        Returns:
+            (float) seconds until the next token is available, 0 if one is available now
+        """
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.refill_rate
+
+    def is_full(self):
+        return self.tokens >= self.capacity
+
+
+class BucketStore:
+    """ Storage of token buckets, spends tokens of several buckets at once """
+
+    def __init__(self):
+        # Buckets { key => bucket }
+        self.buckets = {}
+        self._take_count = 0
+
+    def _get_bucket(self, key, limit, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(*limit)
+        bucket.refill(now)
+        return bucket
+
+    def take(self, specs):
+        """
+        Spend one token of every bucket, only if all of them have a token available
+
+        Args:
+            specs (List[Tuple[Hashable, Tuple[float, float]]]): list of (bucket key, (capacity, refill rate))
+
+        Returns:
+            (float) 0 if the tokens were spent, otherwise seconds until all buckets have a token
+        """
+        now = time.monotonic()
+        buckets = [self._get_bucket(key, limit, now) for key, limit in specs]
+
+        retry_after = max(bucket.retry_after() for bucket in buckets)
+        if retry_after == 0:
+            for bucket in buckets:
+                bucket.tokens -= 1
+
+        # Only after spending, a full bucket pruned before would take the spent token with it
+        self._take_count += 1
+        if self._take_count % PRUNE_INTERVAL == 0:
+            self._prune(now)
+        return retry_after
+
+    def _prune(self, now):
+        """ Drop buckets that refilled completely, they behave exactly like new buckets """
+        for key, bucket in list(self.buckets.items()):
+            bucket.refill(now)
+            if bucket.is_full():
+                del self.buckets[key]
+        metrics_util.set_gauge("rate_limit_buckets", len(self.buckets))
+
+
+class RateLimiter:
+    """ Per-user and per-guild token bucket rate limiter, configured per command """
+
+    def __init__(self, state):
+        """
+        Args:
+            state (SharedState): state holding the token buckets, shared by all workers in sharded mode
+        """
+        self.state = state
+
+    @staticmethod
+    def get_user_limit(command):
+        return RATE_LIMIT_USER_COMMANDS.get(command, RATE_LIMIT_USER)
+
+    @staticmethod
+    def get_guild_limit(command, guild_id):
+        overrides = RATE_LIMIT_GUILD_OVERRIDES.get(guild_id, {})
+        if command in overrides:
+            return overrides[command]
+        return RATE_LIMIT_GUILD_COMMANDS.get(command, RATE_LIMIT_GUILD)
+
+    def check(self, command, user_id, guild_id=None):
+        """
+        Try to spend one token of the user's and the guild's bucket of a command
+        - tokens are only spent if both buckets allow the use
+
+        Args:
+            command (str): command name (not alias)
+            user_id (int): ID of the user using the command
+            guild_id (int): ID of the guild the command is used in, None for DMs
+
+        Returns:
+            (float) 0 if the command is allowed, otherwise seconds until it is allowed again
+        """
+        specs = [(("user", user_id, command), self.get_user_limit(command))]
+        if guild_id is not None:
+            specs.append((("guild", guild_id, command), self.get_guild_limit(command, guild_id)))
+
+        retry_after = self.state.take_tokens(specs)
+        if retry_after > 0:
+            metrics_util.inc("rate_limited_total", command=command)
+        return retry_after
@@ -0,0 +1,155 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+import src.utils.log_util as log
+from src.utils import metrics_util
+
+
+class ReactionRegistry:
+    """ Registry of dynamic reaction handlers, indexed by (message id, emoji) and expired by a timer """
+
+    def __init__(self):
+        # Lookup table { (message id, emoji) => [handlers] }, newest handler last
+        self.index = {}
+        # Min-heap of (expire time, sequence, handler), entries of removed handlers are dropped lazily
+        self.expiry_heap = []
+        # Handlers that have not fired or expired yet
+        self.active = set()
+
+        self._sequence = itertools.count()
+        self._stale_count = 0
+        self._expiry_task = None
+        self._wakeup = None
+        # Timeout callbacks running in the background, referenced until they finish
+        self._timeouts = set()
+
+    @staticmethod
+    def _index_key(message, emoji):
+        # Custom emojis stringify to "<:name:id>", which is stable across Emoji and PartialEmoji instances
+        return message.id, str(emoji)
+
+    def register(self, handler):
+        """
+        Register a reaction handler and schedule its expiry
+
+        Args:
+            handler (ReactionHandler): reaction handler
+        """
+        self.active.add(handler)
+        for emoji in handler.emojis:
+            self.index.setdefault(self._index_key(handler.message, emoji), []).append(handler)
+        heapq.heappush(self.expiry_heap, (handler.expire_time, next(self._sequence), handler))
+        self._update_metrics()
+
+        self._ensure_expiry_task()
+        # Wake the timer up if this handler expires before every other handler
+        if self.expiry_heap[0][2] is handler:
+            self._wakeup.set()
+
+    def pop(self, message, emoji):
+        """
+        Find and unregister the newest live handler listening to an emoji on a message
+
+        Args:
+            message (discord.Message): message that was reacted to
+            emoji (Union[discord.Emoji, str]): emoji that was added
+
+        Returns:
+            (ReactionHandler) matching handler, otherwise None
+        """
+        handlers = self.index.get(self._index_key(message, emoji))
+        if not handlers:
+            return None
+
+        now = time.time()
+        for handler in reversed(handlers):
+            # Expired handlers are left for the timer, which fires their on_timeout
+            if now > handler.expire_time:
+                continue
+            self.remove(handler)
+            return handler
+        return None
+
+    def remove(self, handler):
+        """
+        Unregister a handler without firing any of its callbacks
+
+        Args:
+            handler (ReactionHandler): reaction handler
+        """
+        if handler not in self.active:
+            return
+        self._unindex(handler)
+
+        # Its heap entry is now stale, rebuild the heap once stale entries dominate it
+        self._stale_count += 1
+        if self._stale_count > len(self.expiry_heap) // 2:
+            self.expiry_heap = [entry for entry in self.expiry_heap if entry[2] in self.active]
+            heapq.heapify(self.expiry_heap)
+            self._stale_count = 0
+        self._update_metrics()
+
+    def _unindex(self, handler):
+        self.active.discard(handler)
+        for emoji in handler.emojis:
+            key = self._index_key(handler.message, emoji)
+            handlers = self.index.get(key)
+            if handlers is None:
+                continue
+            if handler in handlers:
+                handlers.remove(handler)
+            if not handlers:
+                del self.index[key]
+
+    def _ensure_expiry_task(self):
+        if self._expiry_task is not None and not self._expiry_task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._expiry_task = asyncio.get_event_loop().create_task(self._expiry_loop())
+
+    async def _expiry_loop(self):
+        """ Sleeps until the next handler expires, fires its on_timeout and frees it """
+        while True:
+            self._wakeup.clear()
+            if not self.expiry_heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self.expiry_heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            expire_time, _, handler = heapq.heappop(self.expiry_heap)
+            if handler not in self.active:
+                self._stale_count = max(self._stale_count - 1, 0)
+                continue
+            self._unindex(handler)
+
+            lag = time.time() - expire_time
+            metrics_util.set_gauge("reaction_expiry_lag_seconds", lag)
+            metrics_util.inc("reaction_handlers_expired_total")
+            self._update_metrics()
+
+            # Run the callback separately so a slow timeout edit does not delay other expiries
+            task = asyncio.ensure_future(self._fire_timeout(handler))
+            self._timeouts.add(task)
+            task.add_done_callback(self._timeouts.discard)
+
+    @staticmethod
+    async def _fire_timeout(handler):
+        try:
+            await handler.on_timeout()
+        except Exception as e:
+            log.error(f"Timeout callback of {handler} failed: {e}")
+
+    def _update_metrics(self):
+        metrics_util.set_gauge("reaction_handlers", len(self.active))
+
+    def __len__(self):
+        return len(self.active)
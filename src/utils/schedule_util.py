@@ -1,32 +1,208 @@
+import asyncio
+import heapq
 import time
 
-from src.utils.sql_util import ChainedStatement, SQLError
-from src.data.settings import SCHEDULER_LOOP_INTERVAL, SCHEDULER_DATABASE_INTERVAL
+import src.utils.log_util as log
+from src.data.settings import SCHEDULER_DATABASE_INTERVAL, SCHEDULER_LOOKAHEAD, SCHEDULER_MAX_CONCURRENCY, \
+    SCHEDULER_MESSAGE_EXPIRY, DATABASE_BATCH_SIZE
+from src.utils import metrics_util
+from src.utils.async_sql_util import AsyncChainedStatement
+from src.utils.sql_builder import batches, named_row
 
-# Database ping variables
-ping_count = 0
+# Row of the "scheduled_messages" table
+ScheduledMessage = named_row("ScheduledMessage", ("id", "channel", "message", "timestamp"))
 
 
-def tick():
-    """ Should be called every 10 seconds """
-    global ping_count
+class MessageScheduler:
+    """
+    Delivers the rows of "scheduled_messages" when they are due
+    - upcoming rows are loaded into a min-heap by timestamp, the scheduler sleeps until the earliest one is due
+    - the database is only pinged every SCHEDULER_DATABASE_INTERVAL, with an indexed range query on "timestamp"
+    - a message is only loaded by the worker that can see its channel, so sharded workers don't send it twice
+    - a message no worker delivered within SCHEDULER_MESSAGE_EXPIRY is deleted
+    """
 
-    # To ping or not to ping
-    if ping_count * SCHEDULER_LOOP_INTERVAL < SCHEDULER_DATABASE_INTERVAL:
-        ping_count += 1
-        return
+    def __init__(self, bot, refresh_interval=SCHEDULER_DATABASE_INTERVAL, lookahead=SCHEDULER_LOOKAHEAD,
+                 max_concurrency=SCHEDULER_MAX_CONCURRENCY, expiry=SCHEDULER_MESSAGE_EXPIRY):
+        """
+        Args:
+            bot (BotClient): bot to deliver the messages with
+            refresh_interval (float): seconds between database pings
+            lookahead (float): how many seconds ahead each ping loads
+            max_concurrency (int): maximum number of messages being delivered at the same time
+            expiry (float): seconds overdue after which an undelivered message is deleted
+        """
+        self.bot = bot
+        self.refresh_interval = refresh_interval
+        self.lookahead = lookahead
+        self.expiry = expiry
+        # Upcoming messages as (timestamp, id, message), earliest first
+        self.heap = []
+        # Ids that are in the heap or being delivered
+        self.known = set()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.next_refresh = 0
+        self._wake = asyncio.Event()
+        self._task = None
+        self._deliveries = set()
 
-    now = time.time()
-    # Query database & retrieve data
-    with ChainedStatement() as statement:
-        # Query all messages within the time interval of [now, now + interval]
-        result = statement.query(f"SELECT * FROM scheduled_messages WHERE timestamp > {now} AND timestamp < {now + SCHEDULER_DATABASE_INTERVAL}")
-        # Delete all messages before now
-        statement.delete(table="scheduled_messages", where=f"timestamp < {now}")
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
 
-    for row in result:
-        _, channel, message, timestamp = row
-        # TODO: add message to broadcast
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
 
-    # Reset ping count
-    ping_count = 0
+    async def schedule(self, channel_id, message, timestamp):
+        """
+        Schedule a message
+
+        Args:
+            channel_id (int): channel to send to
+            message (str): message text
+            timestamp (float): when to send it, in seconds since the epoch
+        """
+        async with AsyncChainedStatement() as statement:
+            await statement.insert("scheduled_messages", ("channel", "message", "timestamp"),
+                                   (channel_id, message, int(timestamp)))
+        if timestamp <= time.time() + self.lookahead:
+            # Due before the next ping would load it
+            self.next_refresh = 0
+            self._wake.set()
+
+    async def refresh(self, now):
+        """
+        Load the messages due within the lookahead into the heap, and delete the expired ones
+        - messages of channels this worker can't see are left to the worker that can
+
+        Args:
+            now (float): current time, in seconds since the epoch
+        """
+        expired_before = int(now - self.expiry)
+        sql = "SELECT id, channel, message, timestamp FROM scheduled_messages WHERE timestamp > %s AND timestamp <= %s"
+        async with AsyncChainedStatement() as statement:
+            async for row in statement.stream(sql, data=(expired_before, now + self.lookahead),
+                                              row_type=ScheduledMessage):
+                if row.id not in self.known and self.bot.get_channel(row.channel) is not None:
+                    self.known.add(row.id)
+                    heapq.heappush(self.heap, (row.timestamp, row.id, row))
+            expired = await statement.delete("scheduled_messages", "timestamp <= %s", data=(expired_before,))
+        metrics_util.set_gauge("scheduler_pending", len(self.heap))
+        if expired > 0:
+            metrics_util.inc("scheduled_messages_expired_total", expired)
+            log.warning(f"Deleted {expired} scheduled messages no worker delivered within {self.expiry}s!")
+
+    async def deliver(self, due):
+        """
+        Deliver due messages concurrently, then delete the delivered rows in batches
+
+        Args:
+            due (List[ScheduledMessage]): messages to deliver
+        """
+        results = await asyncio.gather(*(self._deliver(row) for row in due))
+        delivered = [row.id for row, result in zip(due, results) if result is True]
+        # Failed messages, and those of channels this worker no longer sees, are loaded again by the next ping
+        self.known.difference_update(row.id for row, result in zip(due, results) if result is not True)
+        try:
+            async with AsyncChainedStatement() as statement, statement.transaction():
+                for batch in batches(delivered, DATABASE_BATCH_SIZE):
+                    await statement.delete("scheduled_messages", f"id IN ({', '.join(['%s'] * len(batch))})",
+                                           data=tuple(batch))
+        except Exception as e:
+            # Still known, so this worker won't send them again
+            log.error(f"Unable to delete {len(delivered)} delivered scheduled messages: {e}")
+            return
+        self.known.difference_update(delivered)
+
+    async def _deliver(self, row):
+        # True if delivered, False if it failed, None if the channel is not visible to this worker
+        channel = self.bot.get_channel(row.channel)
+        if channel is None:
+            return None
+        async with self.semaphore:
+            try:
+                await self.bot.outbound.send(channel, content=row.message)
+            except Exception as e:
+                metrics_util.inc("scheduled_messages_failed_total")
+                log.error(f"Unable to deliver scheduled message {row.id} to channel {row.channel}: {e}")
+                return False
+        metrics_util.inc("scheduled_messages_delivered_total")
+        metrics_util.observe("scheduled_message_lateness_seconds", max(time.time() - row.timestamp, 0))
+        return True
+
+    async def _run(self):
+        while True:
+            now = time.time()
+            if now >= self.next_refresh:
+                self.next_refresh = now + self.refresh_interval
+                try:
+                    await self.refresh(now)
+                except Exception as e:
+                    log.error(f"Unable to load scheduled messages: {e}")
+
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                due.append(heapq.heappop(self.heap)[2])
+            if due:
+                metrics_util.set_gauge("scheduler_pending", len(self.heap))
+                # Deliver in the background, later messages keep their schedule
+                task = asyncio.ensure_future(self.deliver(due))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+
+            # Sleep until the next message is due, the next ping, or a new message is scheduled
+            timeout = self.next_refresh - now
+            if self.heap:
+                timeout = min(timeout, self.heap[0][0] - now)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+
+if __name__ == "__main__":
+    # Code for testing the scheduler against an in-memory SQLite database, with a stand-in for the bot
+    from src.utils.async_sql_util import SQLiteBackend, set_backend
+
+    class TestChannel:
+        def __init__(self, channel_id):
+            self.id = channel_id
+
+    class TestOutbound:
+        async def send(self, channel, content=None):
+            print(f"{time.time() % 100:6.2f}s >> #{channel.id}: {content}")
+
+    class TestBot:
+        outbound = TestOutbound()
+
+        @staticmethod
+        def get_channel(channel_id):
+            # Channel 2 belongs to another worker
+            return TestChannel(channel_id) if channel_id != 2 else None
+
+    async def main():
+        set_backend(await SQLiteBackend.create(":memory:"))
+        async with AsyncChainedStatement() as statement:
+            await statement.execute("CREATE TABLE scheduled_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                                    "channel BIGINT NOT NULL, message VARCHAR(500) NOT NULL, timestamp BIGINT NOT NULL)")
+            with open("src/data/sql/migrations/001_scheduled_messages_timestamp_index.sql") as f:
+                await statement.execute(f.read())
+            now = time.time()
+            await statement.insert_many("scheduled_messages", ("channel", "message", "timestamp"),
+                                        [(1, f"message {i}", int(now) + i % 3) for i in range(6)] +
+                                        [(2, "someone else's", int(now)), (3, "expired", int(now) - 2 * 86400)])
+
+        scheduler = MessageScheduler(TestBot())
+        scheduler.start()
+        print(f"{time.time() % 100:6.2f}s >> started")
+        await scheduler.schedule(1, "scheduled through the bot", now + 1)
+        await asyncio.sleep(3.5)
+        scheduler.stop()
+        async with AsyncChainedStatement() as statement:
+            print(f"Rows left: {list(await statement.query('SELECT id, channel, message FROM scheduled_messages'))}")
+
+    asyncio.run(main())
+    print("done!")
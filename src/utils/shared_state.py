@@ -0,0 +1,159 @@
+import threading
+from multiprocessing.managers import BaseManager
+
+import src.utils.log_util as log
+from src.utils.rate_limit_util import BucketStore
+
+# State of this process, see get_state
+state = None
+
+
+class SharedState:
+    """
+    State that has to be global across all bot workers
+    - values must be picklable, since the socket implementation sends them to another process
+    """
+
+    def get(self, namespace, key, default=None):
+        """
+        Get a value
+
+        Args:
+            namespace (str): namespace of the value, e.g. "botworld"
+            key (Hashable): key of the value in its namespace
+            default (Any): returned if the key does not exist
+
+        Returns:
+            (Any) stored value, otherwise default
+        """
+        raise NotImplementedError
+
+    def set(self, namespace, key, value):
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def take_tokens(self, specs):
+        """
+        Spend one token of every rate limit bucket, only if all of them have a token available
+
+        Args:
+            specs (List[Tuple[Hashable, Tuple[float, float]]]): list of (bucket key, (capacity, refill rate))
+
+        Returns:
+            (float) 0 if the tokens were spent, otherwise seconds until all buckets have a token
+        """
+        raise NotImplementedError
+
+
+class LocalSharedState(SharedState):
+    """ In-process state, used by single-process mode and as the store behind SocketSharedState """
+
+    def __init__(self):
+        # Values { namespace => { key => value } }
+        self.values = {}
+        self.buckets = BucketStore()
+        # The socket server handles every worker connection on its own thread
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            return self.values.get(namespace, {}).get(key, default)
+
+    def set(self, namespace, key, value):
+        with self._lock:
+            self.values.setdefault(namespace, {})[key] = value
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self.values.get(namespace, {}).pop(key, None)
+
+    def take_tokens(self, specs):
+        with self._lock:
+            return self.buckets.take(specs)
+
+
+class SocketSharedState(SharedState):
+    """ Client of a LocalSharedState served by the launcher process over a local socket """
+
+    def __init__(self, address, authkey):
+        """
+        Args:
+            address (Tuple[str, int]): address of the state server
+            authkey (bytes): authentication key of the state server
+        """
+        manager = SharedStateManager(address=address, authkey=authkey)
+        manager.connect()
+        self._remote = manager.get_state()
+        log.info(f"Connected to the shared state server at {address}!")
+
+    def get(self, namespace, key, default=None):
+        return self._remote.get(namespace, key, default)
+
+    def set(self, namespace, key, value):
+        self._remote.set(namespace, key, value)
+
+    def delete(self, namespace, key):
+        self._remote.delete(namespace, key)
+
+    def take_tokens(self, specs):
+        return self._remote.take_tokens(specs)
+
+
+class SharedStateManager(BaseManager):
+    """ Serves a single LocalSharedState to every worker process """
+
+
+_server_state = None
+
+
+def _get_server_state():
+    global _server_state
+    if _server_state is None:
+        _server_state = LocalSharedState()
+    return _server_state
+
+
+SharedStateManager.register("get_state", callable=_get_server_state)
+
+
+def start_server(address, authkey):
+    """
+    Start the shared state server in a child process
+
+    Args:
+        address (Tuple[str, int]): local address to listen on, port 0 picks a free port
+        authkey (bytes): authentication key workers must present
+
+    Returns:
+        (SharedStateManager) started manager, "address" holds the actual listening address
+    """
+    manager = SharedStateManager(address=address, authkey=authkey)
+    manager.start()
+    log.info(f"Shared state server is listening at {manager.address}!")
+    return manager
+
+
+def get_state():
+    """
+    Get the shared state of this process, a LocalSharedState unless set_state was called
+
+    Returns:
+        (SharedState) shared state
+    """
+    global state
+    if state is None:
+        state = LocalSharedState()
+    return state
+
+
+def set_state(new_state):
+    """
+    Replace the shared state of this process, e.g. with a SocketSharedState in a sharded worker
+
+    Args:
+        new_state (SharedState): state to use from now on
+    """
+    global state
+    state = new_state
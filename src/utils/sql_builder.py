@@ -0,0 +1,164 @@
+import collections
+import functools
+
+# Supported SQL dialects
+MYSQL = "mysql"
+SQLITE = "sqlite"
+
+# Transaction isolation levels
+ISOLATION_LEVELS = ("READ UNCOMMITTED", "READ COMMITTED", "REPEATABLE READ", "SERIALIZABLE")
+
+
+class SQLError(IOError):
+    """ Incorrect use of a statement, raised alike by the sync & async SQL layers """
+
+    def __init__(self, message):
+        super().__init__(message)
+
+# Every builder is cached by its arguments, so the SQL of a (table, columns, where template) is only built once
+# - column arguments must be tuples, since they are part of the cache key
+
+
+@functools.lru_cache(maxsize=64)
+def named_row(name, columns):
+    """
+    Get a lightweight row type for typed query results, one class per (name, columns)
+
+    Args:
+        name (str): class name, e.g. "MineRow"
+        columns (Tuple[str]): column names in the order of the selected columns
+
+    Returns:
+        (type) namedtuple class, constructed from the values of a row
+    """
+    return collections.namedtuple(name, columns)
+
+
+def check_isolation_level(isolation_level):
+    """
+    Check an isolation level before it is formatted into a statement
+
+    Args:
+        isolation_level (str): isolation level, one of ISOLATION_LEVELS or None
+
+    Returns:
+        (str) isolation level in upper case, None if not given
+    """
+    if isolation_level is None:
+        return None
+    if isolation_level.upper() not in ISOLATION_LEVELS:
+        raise ValueError(f"Unknown isolation level \"{isolation_level}\"!")
+    return isolation_level.upper()
+
+
+def batches(rows, size):
+    """
+    Split rows into batches for multi-row statements
+
+    Args:
+        rows (Sequence[Tuple[Any]]): rows to split
+        size (int): maximum number of rows per batch
+
+    Returns:
+        (Iterator[Sequence[Tuple[Any]]]) batches in order, only the last one may be smaller than "size"
+    """
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+@functools.lru_cache(maxsize=256)
+def build_insert_sql(table, columns, count, rows=1):
+    """
+    Build an INSERT statement
+
+    Args:
+        table (str): table name
+        columns (Tuple[str]): column names in a tuple (if empty, default to all columns)
+        count (int): number of values to insert per row
+        rows (int): number of rows to insert, default = 1
+
+    Returns:
+        (str) SQL statement with "%s" placeholders, the data of all rows is flattened in order
+    """
+    sql = f"INSERT INTO {table} "
+    if columns:
+        sql += "(" + ", ".join(columns) + ") "
+    row = "(" + ", ".join(["%s"] * count) + ")"
+    sql += "VALUES " + ", ".join([row] * rows) + ";"
+    return sql
+
+
+@functools.lru_cache(maxsize=256)
+def build_update_sql(table, columns, where):
+    """
+    Build an UPDATE statement
+
+    Args:
+        table (str): table name
+        columns (Tuple[str]): column names in a tuple
+        where (str): where to update
+
+    Returns:
+        (str) SQL statement with "%s" placeholders
+    """
+    return f"UPDATE {table} SET " + ", ".join(f"{column}=%s" for column in columns) + f" WHERE {where}"
+
+
+@functools.lru_cache(maxsize=256)
+def build_upsert_sql(dialect, table, columns, keys, rows=1):
+    """
+    Build an INSERT statement that updates the existing row on a key conflict
+
+    Args:
+        dialect (str): SQL dialect, one of {MYSQL, SQLITE}
+        table (str): table name
+        columns (Tuple[str]): column names in a tuple
+        keys (Tuple[str]): unique key columns, the other columns are updated on conflict
+        rows (int): number of rows to insert, default = 1
+
+    Returns:
+        (str) SQL statement with "%s" placeholders, the data of all rows is flattened in order
+    """
+    updated = [column for column in columns if column not in keys]
+    sql = build_insert_sql(table, columns, len(columns), rows)[:-1]
+    if dialect == MYSQL:
+        return sql + " ON DUPLICATE KEY UPDATE " + ", ".join(f"{column}=VALUES({column})" for column in updated) + ";"
+    if dialect == SQLITE:
+        return sql + f" ON CONFLICT ({', '.join(keys)}) DO UPDATE SET " + \
+               ", ".join(f"{column}=excluded.{column}" for column in updated) + ";"
+    raise ValueError(f"Unknown SQL dialect \"{dialect}\"!")
+
+
+@functools.lru_cache(maxsize=256)
+def build_delete_sql(table, where=None):
+    """
+    Build a DELETE statement
+
+    Args:
+        table (str): table name
+        where (str): where to delete (if empty, delete all rows)
+
+    Returns:
+        (str) SQL statement
+    """
+    if not where:
+        return f"DELETE FROM {table}"
+    return f"DELETE FROM {table} WHERE {where}"
+
+
+def build_explain_sql(dialect, sql):
+    """
+    Build a statement that describes the query plan of another statement
+
+    Args:
+        dialect (str): SQL dialect, one of {MYSQL, SQLITE}
+        sql (str): statement to describe, takes the same data
+
+    Returns:
+        (str) SQL statement
+    """
+    if dialect == MYSQL:
+        return f"EXPLAIN {sql}"
+    if dialect == SQLITE:
+        return f"EXPLAIN QUERY PLAN {sql}"
+    raise ValueError(f"Unknown SQL dialect \"{dialect}\"!")
@@ -0,0 +1,118 @@
+import functools
+import re
+import time
+from collections import deque
+
+import src.utils.log_util as log
+from src.data.settings import DATABASE_SLOW_QUERY_SECONDS, DATABASE_SLOW_QUERY_LOG_SIZE
+from src.utils import metrics_util
+
+# String & number literals and placeholders, replaced by "?" in fingerprints
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b|%s|\?")
+# Rows of a multi-row VALUES list, and the values of an IN list
+_VALUE_ROWS = re.compile(r"(\([?, ]+\))(?:, \([?, ]+\))+")
+_IN_LISTS = re.compile(r"\bIN \([?, ]+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements EXPLAIN can describe
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE")
+
+# Recent slow queries, oldest first
+slow_queries = deque(maxlen=DATABASE_SLOW_QUERY_LOG_SIZE)
+
+
+class SlowQuery:
+    """ A statement that took longer than settings.DATABASE_SLOW_QUERY_SECONDS """
+
+    __slots__ = ("fingerprint", "seconds", "time", "plan")
+
+    def __init__(self, fingerprint, seconds, plan=None):
+        """
+        Args:
+            fingerprint (str): normalized statement, see "fingerprint"
+            seconds (float): how long it took
+            plan (str): EXPLAIN output, if captured
+        """
+        self.fingerprint = fingerprint
+        self.seconds = seconds
+        self.time = time.time()
+        self.plan = plan
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """
+    Normalize a statement, so every execution of the same statement aggregates under one name
+    - literals & placeholders become "?", multi-row VALUES and IN lists collapse to one entry
+
+    Args:
+        sql (str): SQL statement
+
+    Returns:
+        (str) fingerprint, e.g. "SELECT * FROM genshin_mine WHERE player = ?"
+    """
+    sql = _WHITESPACE.sub(" ", sql.strip().rstrip(";"))
+    sql = _LITERALS.sub("?", sql)
+    sql = _VALUE_ROWS.sub(r"\1, ...", sql)
+    return _IN_LISTS.sub("IN (...)", sql)
+
+
+def is_explainable(sql):
+    return sql.lstrip()[:6].upper() in _EXPLAINABLE
+
+
+def record(sql, seconds, rows_returned=0, rows_affected=0):
+    """
+    Record the timing & row counts of a statement under its fingerprint
+
+    Args:
+        sql (str): SQL statement
+        seconds (float): how long it took
+        rows_returned (int): number of rows read
+        rows_affected (int): number of rows written
+
+    Returns:
+        (bool) whether it was a slow query, the caller may then capture a plan and call "log_slow"
+    """
+    name = fingerprint(sql)
+    metrics_util.observe("db_statement_seconds", seconds, statement=name)
+    if rows_returned > 0:
+        metrics_util.inc("db_rows_returned_total", rows_returned, statement=name)
+    if rows_affected > 0:
+        metrics_util.inc("db_rows_affected_total", rows_affected, statement=name)
+    return seconds >= DATABASE_SLOW_QUERY_SECONDS
+
+
+def log_slow(sql, seconds, plan=None):
+    """
+    Log a slow query and keep it for "~dbstats"
+
+    Args:
+        sql (str): SQL statement
+        seconds (float): how long it took
+        plan (str): EXPLAIN output, if captured
+    """
+    name = fingerprint(sql)
+    metrics_util.inc("db_slow_queries_total", statement=name)
+    slow_queries.append(SlowQuery(name, seconds, plan))
+    log.warning(f"Slow query took {seconds * 1000:.1f}ms: {name}" + (f"\n{plan}" if plan else ""))
+
+
+def format_plan(rows):
+    """
+    Format the rows of an EXPLAIN result
+
+    Args:
+        rows (List[Tuple]): EXPLAIN result rows
+
+    Returns:
+        (str) one line per row
+    """
+    return "\n".join(" | ".join(str(value) for value in row) for row in rows)
+
+
+if __name__ == "__main__":
+    # Code for testing the fingerprints
+    print(fingerprint("SELECT * FROM genshin_mine WHERE player='Breeze' AND time_stamp > 100"))
+    print(fingerprint("INSERT INTO genshin_mine (player, time_stamp) VALUES (%s, %s), (%s, %s), (%s, %s);"))
+    print(fingerprint("DELETE FROM scheduled_messages WHERE id IN (%s, %s, %s)"))
@@ -1,69 +1,358 @@
+import contextlib
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
 from typing import Tuple
 
-import mysql.connector.pooling as pooling
+import mysql.connector
 
 import src.utils.log_util as log
 from src.data.environment import *
+from src.data.settings import DATABASE_STATEMENT_CACHE_SIZE, DATABASE_BATCH_SIZE, DATABASE_ISOLATION_LEVEL, \
+    DATABASE_FETCH_SIZE, DATABASE_POOL_SIZE, DATABASE_POOL_TIMEOUT, DATABASE_POOL_RECYCLE, DATABASE_POOL_PING_INTERVAL, \
+    DATABASE_SLOW_QUERY_EXPLAIN
+from src.utils import metrics_util, sql_stats_util
+from src.utils.sql_builder import MYSQL, SQLError, batches, check_isolation_level, build_insert_sql, \
+    build_update_sql, build_upsert_sql, build_delete_sql, build_explain_sql
 
 pool = None
+_pool_lock = threading.Lock()
 
 
-class ConnectionPool:
-    """ Connection pool to the database """
+class PooledConnection:
+    """ Connection checked out of a ConnectionPool, "close" returns it to the pool instead of closing it """
+
+    def __init__(self, connection_pool, connection):
+        self._pool = connection_pool
+        self._cnx = connection
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def close(self):
+        if self._cnx is None:
+            return
+        connection, self._cnx = self._cnx, None
+        self._pool.release(connection)
+
+
+class _Waiter:
+    """ A thread waiting in a ConnectionPool's queue """
+
+    __slots__ = ("event", "connection", "may_connect")
 
     def __init__(self):
-        self.pool = pooling.MySQLConnectionPool(
-            host=DATABASE_URL,
-            user=DATABASE_USERNAME,
-            password=DATABASE_PASSWORD,
-            pool_name="dodoco",
-            db=DATABASE_NAME
-        )
-        log.info(f"MySQL connection pool is established!")
+        self.event = threading.Event()
+        # Handed over by "release"
+        self.connection = None
+        # Set instead of a connection when a slot frees up, the waiter opens a new connection itself
+        self.may_connect = False
 
-    def get_connection(self):
+
+class ConnectionPool:
+    """
+    Connection pool to the database
+    - when all connections are in use, callers wait in a first come, first served queue up to a timeout
+    - connections are pinged after being idle for a while and reopened when they get old
+    """
+
+    def __init__(self, size=DATABASE_POOL_SIZE, timeout=DATABASE_POOL_TIMEOUT, recycle=DATABASE_POOL_RECYCLE,
+                 ping_interval=DATABASE_POOL_PING_INTERVAL):
+        """
+        Args:
+            size (int): maximum number of connections
+            timeout (float): seconds to wait for a free connection
+            recycle (float): connections older than this many seconds are reopened on checkout
+            ping_interval (float): connections idle for longer than this many seconds are pinged on checkout
         """
-        Get a connection from this connection pool
-        - None if the connection pool is exhausted
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        # Idle connections as (connection, idle since), the most recently used last
+        self.idle = deque()
+        # Opening times { connection => opened at }
+        self.opened_at = {}
+        # Number of connections open or being opened
+        self.opened = 0
+        self.waiters = deque()
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """ Open all connections up front, so the first statements don't wait for a handshake """
+        with self._lock:
+            count = self.size - self.opened
+            self.opened += count
+        for i in range(count):
+            try:
+                connection = self._connect()
+            except mysql.connector.Error as err:
+                log.error(f"Unable to open a pooled connection: {err}")
+                for _ in range(count - i):
+                    self._free_slot()
+                return
+            self.release(connection)
+        log.info(f"MySQL connection pool is warmed up with {self.size} connections!")
+
+    def get_connection(self, timeout=None):
+        """
+        Get a connection from this connection pool, waits in line if all connections are in use
+        - None if no connection was freed up in time
+
+        Args:
+            timeout (float): seconds to wait, default = the pool's timeout
 
         Returns:
-            (pooling.PooledMySQLConnection) connection if pool is not exhausted, otherwise None
+            (PooledConnection) connection if one was available in time, otherwise None
         """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
         try:
-            return self.pool.get_connection()
-        except pooling.errors.PoolError as err:
-            log.error(f"{err.msg}", flush=True)
+            connection = self._acquire(timeout)
+            if connection is None:
+                metrics_util.inc("db_pool_timeouts_total", pool="sync")
+                log.error(f"No pooled connection was freed up within {timeout}s!")
+                return None
+            return PooledConnection(self, self._check(connection))
+        except mysql.connector.Error as err:
+            log.error(f"Unable to open a pooled connection: {err}")
             return None
+        finally:
+            metrics_util.observe("db_pool_acquire_seconds", time.perf_counter() - start, pool="sync")
 
+    def release(self, connection):
+        """
+        Return a connection to the pool, handing it straight to the first waiter if there is one
 
-def init_connection_pool():
+        Args:
+            connection (mysql.connector.MySQLConnection): connection from "get_connection"
+        """
+        try:
+            # Discard whatever the user left uncommitted, like a session reset would
+            if connection.in_transaction:
+                connection.rollback()
+        except mysql.connector.Error:
+            self._close(connection)
+            self._free_slot()
+            return
+
+        with self._lock:
+            if self.waiters:
+                waiter = self.waiters.popleft()
+                waiter.connection = connection
+                waiter.event.set()
+            else:
+                self.idle.append((connection, time.monotonic()))
+            self._update_gauges()
+
+    def _acquire(self, timeout):
+        with self._lock:
+            # Idle connections go to the waiters first, keeping the queue fair
+            if self.idle and not self.waiters:
+                connection, idle_since = self.idle.pop()
+                self._update_gauges()
+                return connection, idle_since
+            waiter = None
+            if self.opened < self.size:
+                self.opened += 1
+            else:
+                waiter = _Waiter()
+                self.waiters.append(waiter)
+            self._update_gauges()
+
+        if waiter is not None:
+            if not waiter.event.wait(timeout):
+                with self._lock:
+                    # Otherwise it was handed a connection right as the wait timed out
+                    if not waiter.event.is_set():
+                        self.waiters.remove(waiter)
+                        self._update_gauges()
+                        return None
+            if waiter.connection is not None:
+                return waiter.connection, None
+
+        try:
+            return self._connect(), None
+        except mysql.connector.Error:
+            self._free_slot()
+            raise
+
+    def _check(self, checked_out):
+        connection, idle_since = checked_out
+        now = time.monotonic()
+        if now - self.opened_at.get(connection, now) > self.recycle:
+            metrics_util.inc("db_pool_recycled_total", pool="sync")
+        elif idle_since is not None and now - idle_since > self.ping_interval:
+            try:
+                connection.ping()
+                return connection
+            except mysql.connector.Error:
+                metrics_util.inc("db_pool_stale_total", pool="sync")
+        else:
+            return connection
+
+        # Reopen in the same slot
+        self._close(connection)
+        try:
+            return self._connect()
+        except mysql.connector.Error:
+            self._free_slot()
+            raise
+
+    def _connect(self):
+        connection = mysql.connector.connect(
+            host=DATABASE_URL,
+            user=DATABASE_USERNAME,
+            password=DATABASE_PASSWORD,
+            db=DATABASE_NAME
+        )
+        self.opened_at[connection] = time.monotonic()
+        return connection
+
+    def _close(self, connection):
+        self.opened_at.pop(connection, None)
+        # Its prepared statements go with it
+        cache = _statement_caches.pop(connection, None)
+        if cache is not None:
+            cache.close()
+        try:
+            connection.close()
+        except mysql.connector.Error:
+            pass
+
+    def _free_slot(self):
+        # A connection was closed for good, let the first waiter open a new one instead of waiting for a release
+        with self._lock:
+            if self.waiters:
+                waiter = self.waiters.popleft()
+                waiter.may_connect = True
+                waiter.event.set()
+            else:
+                self.opened -= 1
+            self._update_gauges()
+
+    def _update_gauges(self):
+        metrics_util.set_gauge("db_pool_open", self.opened, pool="sync")
+        metrics_util.set_gauge("db_pool_in_use", self.opened - len(self.idle), pool="sync")
+        metrics_util.set_gauge("db_pool_waiters", len(self.waiters), pool="sync")
+
+
+def get_pool():
+    """
+    Get the shared connection pool, created on first use
+    - safe to call from multiple threads, only one pool is ever created
+
+    Returns:
+        (ConnectionPool) shared pool
+    """
     global pool
+    if pool is None:
+        with _pool_lock:
+            if pool is None:
+                pool = ConnectionPool()
+                log.info("MySQL connection pool is established!")
+    return pool
+
+
+def init_connection_pool():
+    """ Create the shared connection pool and open its connections, call at startup to keep it off the first query """
     if pool is not None:
         log.error("A connection pool already exists, ignoring this init request!")
         return
-    pool = ConnectionPool()
+    get_pool().warm_up()
     log.info("MySQL connection pool initialized successfully!")
 
 
+class StatementCache:
+    """ LRU cache of the prepared cursors of one connection, so each statement is only parsed once by the server """
+
+    def __init__(self, connection, size=DATABASE_STATEMENT_CACHE_SIZE):
+        """
+        Args:
+            connection (mysql.connector.MySQLConnection): connection that owns the cursors
+            size (int): maximum number of prepared statements kept open
+        """
+        # Weak, the cache is a value of _statement_caches, which is keyed by this connection
+        self.connection = weakref.ref(connection)
+        self.size = size
+        # Prepared cursors { sql => cursor }, least recently used first
+        self.cursors = OrderedDict()
+
+    def get_cursor(self, sql):
+        """
+        Get the prepared cursor of a statement, the statement is prepared on its first execution
+
+        Args:
+            sql (str): SQL statement with "%s" placeholders
+
+        Returns:
+            (mysql.connector.cursor.MySQLCursorPrepared) prepared cursor
+        """
+        cursor = self.cursors.get(sql)
+        if cursor is not None:
+            self.cursors.move_to_end(sql)
+            return cursor
+
+        cursor = self.connection().cursor(prepared=True)
+        self.cursors[sql] = cursor
+        if len(self.cursors) > self.size:
+            # Closing a prepared cursor deallocates its statement on the server
+            _, evicted = self.cursors.popitem(last=False)
+            evicted.close()
+        return cursor
+
+    def close(self):
+        """ Close every prepared cursor """
+        cursors, self.cursors = self.cursors, OrderedDict()
+        for cursor in cursors.values():
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+
+
+# Statement caches of the pooled connections { connection => cache }
+_statement_caches = weakref.WeakKeyDictionary()
+
+
+def get_statement_cache(connection):
+    """
+    Get the statement cache of a connection, the cache lives as long as the underlying connection
+
+    Args:
+        connection (PooledConnection): connection from the pool
+
+    Returns:
+        (StatementCache) statement cache
+    """
+    # Pooled connections are wrappers, only the underlying connection is reused across checkouts
+    raw_connection = getattr(connection, "_cnx", connection)
+    cache = _statement_caches.get(raw_connection)
+    if cache is None:
+        cache = _statement_caches[raw_connection] = StatementCache(raw_connection)
+    return cache
+
+
 class ChainedStatement:
     """ A short-cut for executing multiple SQL statements in order """
 
     def __init__(self):
         # To ensure connection is closed properly, use "with" statements
         self._enabled = False
+        # Number of open "transaction" blocks, statements are not committed on their own while any is open
+        self._transaction_depth = 0
+        # Whether statements run with commit=False are waiting for a commit, outside of any transaction block
+        self._uncommitted = False
 
     def __enter__(self):
-        # Set-up connection
-        global pool
-        if pool is None:
-            init_connection_pool()
-            # raise ConnectionError("Connection pool does not exist!")
-
-        self._connection = pool.get_connection()
+        # Set-up connection, waits in line if the pool is busy
+        self._connection = get_pool().get_connection()
         if self._connection is None:
             raise ConnectionError("Connection pool refused connection attempt!")
 
         self.cursor = self._connection.cursor(buffered=True)
+        self.statements = get_statement_cache(self._connection)
         self._enabled = True
         return self
 
@@ -84,6 +373,52 @@ class ChainedStatement:
             return
         raise ConnectionError("Connection is not enabled! Are you using a \"with\" statement?")
 
+    @contextlib.contextmanager
+    def transaction(self, isolation_level=DATABASE_ISOLATION_LEVEL):
+        """
+        Run the statements of the "with" block in one transaction, committed once when the block exits
+        - rolled back instead if the block raises an exception
+        - nested blocks become savepoints, only their own statements are rolled back on an exception
+
+        Args:
+            isolation_level (str): isolation level of the transaction, only for the outermost block
+
+        Returns:
+            (ChainedStatement) this statement
+        """
+        self._check_enabled()
+        isolation_level = check_isolation_level(isolation_level)
+        if self._transaction_depth:
+            savepoint = f"chain_savepoint_{self._transaction_depth}"
+            self.cursor.execute(f"SAVEPOINT {savepoint}")
+            self._transaction_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                raise
+            else:
+                self.cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self._check_uncommitted()
+        # Without autocommit, earlier queries implicitly opened a (read-only) transaction, end it first
+        if self._connection.in_transaction:
+            self._connection.commit()
+        self._connection.start_transaction(isolation_level=isolation_level)
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._connection.rollback()
+            raise
+        else:
+            self._commit_now()
+        finally:
+            self._transaction_depth -= 1
+
     # Specialized SQL methods
     def insert(self, table, columns, values):
         """
@@ -97,13 +432,9 @@ class ChainedStatement:
         Returns:
             (int) affected row count
         """
-        sql = f"INSERT INTO {table} "
-        if columns:
-            sql += "(" + ", ".join(columns) + ") "
-        sql += "VALUES (" + ("%s, " * len(values))[:-2] + ");"
-        return self.execute(sql, data=values)
+        return self.execute(build_insert_sql(table, tuple(columns), len(values)), data=values)
 
-    def update(self, table, columns, values, where):
+    def update(self, table, columns, values, where, where_data=None):
         """
         Update certain parts of the table with new data
 
@@ -111,29 +442,77 @@ class ChainedStatement:
             table (str): table name
             columns (Tuple[str]): column names in a tuple
             values (Tuple[Any]): values to update, must correspond to "columns"
-            where (str): where to update
+            where (str): where to update, use "%s" placeholders for values to keep the statement reusable
+            where_data (Tuple[Any]): values of the "%s" placeholders in "where"
+
+        Returns:
+            (int) affected row count
+        """
+        return self.execute(build_update_sql(table, tuple(columns), where), data=(*values, *(where_data or ())))
+
+    def insert_many(self, table, columns, rows, batch_size=DATABASE_BATCH_SIZE):
+        """
+        Insert many rows into table with multi-row statements, in one transaction
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple (if empty, default to all columns)
+            rows (Sequence[Tuple[Any]]): rows to insert, each must correspond to "columns"
+            batch_size (int): maximum number of rows per statement
+
+        Returns:
+            (int) affected row count
+        """
+        return self._execute_batches(
+            lambda count: build_insert_sql(table, tuple(columns), len(rows[0]), count), rows, batch_size)
+
+    def upsert_many(self, table, columns, rows, keys, batch_size=DATABASE_BATCH_SIZE):
+        """
+        Insert many rows into table with multi-row statements, updating the existing rows whose unique key exists
+        - in one transaction
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple
+            rows (Sequence[Tuple[Any]]): rows to insert, each must correspond to "columns"
+            keys (Tuple[str]): unique key columns, the other columns are updated on conflict
+            batch_size (int): maximum number of rows per statement
+
+        Returns:
+            (int) affected row count (MySQL counts an updated row twice)
+        """
+        return self._execute_batches(
+            lambda count: build_upsert_sql(MYSQL, table, tuple(columns), tuple(keys), count), rows, batch_size)
+
+    def update_many(self, table, columns, rows, where):
+        """
+        Run the same update for many rows in one "executemany" call, in one transaction
+
+        Args:
+            table (str): table name
+            columns (Tuple[str]): column names in a tuple
+            rows (Sequence[Tuple[Any]]): values to update followed by the values of the "%s" placeholders in "where"
+            where (str): where to update, with "%s" placeholders
 
         Returns:
             (int) affected row count
         """
-        sql = f"UPDATE {table} SET "
-        sql += ", ".join(f"{column}=%s" for column in columns) + " "
-        sql += f"WHERE {where}"
-        return self.execute(sql, data=values)
+        with self.transaction():
+            return self.executemany(build_update_sql(table, tuple(columns), where), rows)
 
-    def delete(self, table, where):
+    def delete(self, table, where, data=None):
         """
         Delete row(s) from the table
 
         Args:
             table (str): table name
             where (str): where to delete
+            data (Tuple[Any]): values of the "%s" placeholders in "where"
 
         Returns:
             (int) affected row count
         """
-        sql = f"DELETE FROM {table} WHERE {where}"
-        return self.execute(sql)
+        return self.execute(build_delete_sql(table, where), data=data)
 
     def delete_all(self, table):
         """
@@ -145,28 +524,80 @@ class ChainedStatement:
         Returns:
             (int) affected row count
         """
-        sql = f"DELETE FROM {table}"
-        return self.execute(sql)
+        return self.execute(build_delete_sql(table))
 
     # General SQL methods
-    def query(self, sql):
+    def query(self, sql, data=None):
         """
         Query the database, check "cursor" attribute for details
+        - queries with data run as prepared statements, cached on the connection
 
         Args:
             sql (str): SQL query statement
+            data (Tuple[Any]): query data (corresponds to query statement)
 
         Returns:
             (Iterator) iterator of the result set
         """
         self._check_enabled()
         self._check_empty(sql)
+        start = time.perf_counter()
+        if data:
+            cursor = self.statements.get_cursor(sql)
+            cursor.execute(sql, data)
+            # Prepared cursors are unbuffered, read the result so the cursor can be reused right away
+            rows = cursor.fetchall()
+            self._record(sql, data, start, rows_returned=len(rows))
+            return iter(rows)
         self.cursor.execute(sql)
+        self._record(sql, data, start, rows_returned=self.cursor.rowcount)
         return iter(self.cursor)
 
+    def stream(self, sql, data=None, row_type=None, fetch_size=DATABASE_FETCH_SIZE):
+        """
+        Query the database without buffering the result set, rows are fetched from the server in chunks
+        - memory stays constant no matter how large the result set is
+        - no other statement can run on this chain until the iteration finishes or the generator is closed
+
+        Args:
+            sql (str): SQL query statement
+            data (Tuple[Any]): query data (corresponds to query statement)
+            row_type (type): class constructed from the values of each row, e.g. from "named_row", default = tuples
+            fetch_size (int): number of rows fetched at a time
+
+        Returns:
+            (Iterator) iterator of the result set
+        """
+        self._check_enabled()
+        self._check_empty(sql)
+        start = time.perf_counter()
+        row_count = 0
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute(sql, data)
+        except BaseException:
+            # Nothing to read, don't hide the error behind the one fetching would raise
+            cursor.close()
+            raise
+        try:
+            while rows := cursor.fetchmany(fetch_size):
+                row_count += len(rows)
+                if row_type is None:
+                    yield from rows
+                else:
+                    yield from (row_type(*row) for row in rows)
+        finally:
+            # An unbuffered result must be read to the end before the connection can be used again
+            while cursor.fetchmany(fetch_size):
+                pass
+            cursor.close()
+            # Includes the time the caller spent between rows, which held the connection just the same
+            self._record(sql, data, start, rows_returned=row_count)
+
     def execute(self, sql, data=None, commit=True):
         """
         Modify the database, check "cursor" attribute for details
+        - statements with data run as prepared statements, cached on the connection
 
         Args:
             sql (str): SQL query statement
@@ -178,13 +609,91 @@ class ChainedStatement:
         """
         self._check_enabled()
         self._check_empty(sql)
+        start = time.perf_counter()
         if data:
-            self.cursor.execute(sql, data)
+            cursor = self.statements.get_cursor(sql)
+            cursor.execute(sql, data)
         else:
-            self.cursor.execute(sql)
+            cursor = self.cursor
+            cursor.execute(sql)
+        row_count = cursor.rowcount
+        self._record(sql, data, start, rows_affected=row_count)
         if commit:
-            self._connection.commit()
-        return self.cursor.rowcount
+            self._commit()
+        elif not self._transaction_depth:
+            self._uncommitted = True
+        return row_count
+
+    def executemany(self, sql, rows, commit=True):
+        """
+        Execute the same statement once for every row of data
+
+        Args:
+            sql (str): SQL statement with "%s" placeholders
+            rows (Sequence[Tuple[Any]]): statement data of every execution
+            commit (bool): whether to commit the changes (default True)
+
+        Returns:
+            (int) affected row count
+        """
+        self._check_enabled()
+        self._check_empty(sql)
+        if not rows:
+            return 0
+        start = time.perf_counter()
+        self.cursor.executemany(sql, rows)
+        row_count = self.cursor.rowcount
+        self._record(sql, rows[0], start, rows_affected=row_count)
+        if commit:
+            self._commit()
+        elif not self._transaction_depth:
+            self._uncommitted = True
+        return row_count
+
+    def _execute_batches(self, build_sql, rows, batch_size):
+        # One multi-row statement per batch, full batches share the same SQL and prepared statement
+        if not rows:
+            return 0
+        row_count = 0
+        with self.transaction():
+            for batch in batches(rows, batch_size):
+                row_count += self.execute(build_sql(len(batch)), data=tuple(value for row in batch for value in row))
+        return row_count
+
+    def _commit(self):
+        # Transactions commit once when their block exits
+        if not self._transaction_depth:
+            self._commit_now()
+
+    def _commit_now(self):
+        self._uncommitted = False
+        start = time.perf_counter()
+        self._connection.commit()
+        self._record("COMMIT", None, start)
+
+    def _check_uncommitted(self):
+        # Starting a transaction would commit them along, and a rollback of the transaction would then keep them
+        if self._uncommitted:
+            raise SQLError("Statements run with commit=False are still uncommitted, run the last one with "
+                           "commit=True before starting a transaction!")
+
+    def _record(self, sql, data, start, rows_returned=0, rows_affected=0):
+        seconds = time.perf_counter() - start
+        if sql_stats_util.record(sql, seconds, rows_returned, rows_affected):
+            sql_stats_util.log_slow(sql, seconds, self._explain(sql, data))
+
+    def _explain(self, sql, data):
+        if not DATABASE_SLOW_QUERY_EXPLAIN or not sql_stats_util.is_explainable(sql):
+            return None
+        # On its own cursor, the statement's cursor may still hold its result or row count
+        cursor = self._connection.cursor(buffered=True)
+        try:
+            cursor.execute(build_explain_sql(MYSQL, sql), data)
+            return sql_stats_util.format_plan(cursor.fetchall())
+        except mysql.connector.Error as err:
+            return f"EXPLAIN failed: {err}"
+        finally:
+            cursor.close()
 
     # Utility methods
     @staticmethod
@@ -193,11 +702,6 @@ class ChainedStatement:
             log.warning("SQL statement is empty!")
 
 
-class SQLError(IOError):
-    def __init__(self, message):
-        super().__init__(message)
-
-
 if __name__ == "__main__":
     # Code for testing this class
     print("hello (happy) world!")
@@ -209,7 +713,7 @@ if __name__ == "__main__":
         results = cs.query(f"SELECT * FROM genshin_mine")
         # results = cs.query(f"DESCRIBE genshin_mine")
         # row_count = cs.insert("receivers", ("display_name", "endpoint", "token"), ("test_receiver", "6_mdIcKwU4ysyfd9N4R4yDsK", "bvp4GejNrxuT6P386d-PZ2TG"))
-        # row_count = cs.update("genshin_mine", ("day_stamp",), (178,), "player=\"Geoff\"")
+        # row_count = cs.update("genshin_mine", ("day_stamp",), (178,), "player=%s", where_data=("Geoff",))
         # row_count = cs.delete_all("api")
         # row_count = cs.execute("DROP TABLE genshin_mine")
         # with open("../data/sql/genshin_mine.sql") as f: